@@ -3,10 +3,16 @@ import ast, json, re
 from pathlib import Path
 from typing import Dict, List, Tuple
 
-from langchain_openai       import AzureChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 
+from agents.utils.llm_usage import response_usage, add_usage
+from agents.utils.model_registry import count_tokens, OUTPUT_RATIO
+from agents.utils.concurrency import credential_key
+from agents.utils.llm_stream import invoke_llm
+from agents.utils.llm_clients import get_client
+from tasks.job_events import emit
+from services import chunk_cache, job_checkpoint
+
 # ───────────────────── targets & validators ─────────────────────
 PYTHON_TARGETS = {"pyspark", "snowpark","python"}
 SQL_TARGETS    = {"databricks", "snowflake", "bigquery"}
@@ -56,22 +62,7 @@ def validate_chunk(code: str, target: str) -> Tuple[bool, str]:
 
 # ───────────────────── LLM utils ────────────────────────────────
 def _load_llm(provider: str, cred: Dict):
-    if provider == "azureopenai":
-        return AzureChatOpenAI(
-            azure_endpoint     = cred["openai_api_base"],
-            openai_api_key     = cred["openai_api_key"],
-            openai_api_version = cred["openai_api_version"],
-            deployment_name    = cred["deployment_name"],
-            model_name         = cred["model_name"],
-            temperature        = 0.0,
-        )
-    if provider == "gemini":
-        return ChatGoogleGenerativeAI(
-            model          = cred["model_name"],
-            google_api_key = cred["google_api_key"],
-            temperature    = 0.0,
-        )
-    raise ValueError("Unsupported provider")
+    return get_client(provider, cred)      # shared, see agents/utils/llm_clients.py
 
 def _prompt(source: str, target: str, ddl: str) -> ChatPromptTemplate:
     return ChatPromptTemplate.from_messages([
@@ -87,6 +78,29 @@ def _prompt(source: str, target: str, ddl: str) -> ChatPromptTemplate:
          f"### Fixed {target.upper()} Code ###")
     ])
 
+def fix_chunk(llm, tmpl: ChatPromptTemplate, ch: Dict, *, target: str,
+              model_name: str, cred_key: str | None = None,
+              job_id: str | None = None) -> Tuple[bool, str, str, Dict]:
+    """One feedback attempt: ``(ok, new_code, reason, usage)``; LLM errors raise."""
+    prompt = tmpl.format_prompt(
+        error     = ch["reason"],
+        src_code  = ch.get("source_code") or ch.get("sas_code", ""),
+        gen_code  = ch.get("generated_code") or ch.get("pyspark_code", "")
+    ).to_messages()
+
+    est_in = sum(count_tokens(model_name, m.content) for m in prompt)
+    resp = invoke_llm(llm, prompt, job_id=job_id,
+                      stage="feedback", chunk_id=ch["id"], cred_key=cred_key,
+                      est_tokens=est_in + int(est_in * OUTPUT_RATIO / 2))
+    new_code = resp.content.strip()
+    usage = response_usage(resp) or {
+        "input":  est_in,
+        "output": count_tokens(model_name, new_code),
+        "cached": 0,
+    }
+    ok, reason = validate_chunk(new_code, target)
+    return ok, new_code, reason, usage
+
 # ───────────────────── main node ────────────────────────────────
 def feedback_node(state: Dict) -> Dict:
     print("🩹  Feedback Agent …")
@@ -112,29 +126,51 @@ def feedback_node(state: Dict) -> Dict:
     llm = _load_llm(state["llm_provider"], state["llm_cred"])
     tmpl = _prompt(source, target, ddl_type)
 
+    model_name = state["llm_cred"].get("model_name", "").lower()
+    tok_usage  = state.get("token_usage", {})
+    stage      = tok_usage.setdefault("feedback", add_usage({"model": model_name}, 0, 0))
+    cred_key   = credential_key(state["llm_cred"])
+    job_id     = state.get("job_id")
+    previous   = job_checkpoint.load_chunks(job_id)     # fixes made before a restart
+
     fixed, manual = [], []
     for ch in failed_chunks:
-        prompt = tmpl.format_prompt(
-            error     = ch["reason"],
-            src_code  = ch.get("source_code") or ch.get("sas_code", ""),
-            gen_code  = ch.get("generated_code") or ch.get("pyspark_code", "")
-        ).to_messages()
+        cp = previous.get(ch["id"]) or {}
+        if cp.get("stage") in ("fixed", "manual"):
+            if cp["stage"] == "fixed":
+                fixed.append({"id": ch["id"], "code": cp["fixed_code"]})
+            else:
+                ch.update({"fixed_code": cp["fixed_code"] or "", "reason": cp["reason"]})
+                manual.append(ch)
+            emit(job_id, "chunk", id=ch["id"], state="cached", via="resumed")
+            continue
 
+        ok = False
         try:
-            resp = llm.invoke(prompt)
-            new_code = resp.content.strip()
-            ok, reason = validate_chunk(new_code, target)
+            ok, new_code, reason, usage = fix_chunk(llm, tmpl, ch, target=target,
+                                                    model_name=model_name,
+                                                    cred_key=cred_key, job_id=job_id)
+            add_usage(stage, usage["input"], usage["output"], usage["cached"])
 
             if ok:
                 fixed.append({"id": ch["id"], "code": new_code})
+                pending = (state.get("cache_pending") or {}).pop(ch["id"], None)
+                if pending and not pending["split"]:
+                    chunk_cache.promote(pending, new_code)
             else:
                 ch.update({"fixed_code": new_code, "reason": reason})
                 manual.append(ch)
+            job_checkpoint.save_chunk(job_id, ch["id"], "fixed" if ok else "manual",
+                                      fixed_code=new_code, reason=reason)
 
         except Exception as e:
             ch.update({"fixed_code": "", "reason": f"LLM error: {e}"})
             manual.append(ch)
 
+        emit(job_id, "chunk", id=ch["id"],
+             state="validated" if ok else "failed",
+             reason="fixed by feedback" if ok else f"manual review: {ch['reason']}")
+
     # save manual review list
     if manual:
         with manual_path.open("w", encoding="utf-8") as f:
@@ -149,6 +185,7 @@ def feedback_node(state: Dict) -> Dict:
     ]
 
     state["pyspark_chunks"] = updated
+    state["token_usage"]    = tok_usage
     state["logs"].append(f"Feedback agent retried {len(fixed) + len(manual)} chunks: fixed={len(fixed)}, manual_review={len(manual)}")
     state["graph_trace"] = state.get("graph_trace", []) + ["feedback"]
 
@@ -1,20 +1,43 @@
 from __future__ import annotations
 import uuid
 from pathlib import Path
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Tuple
 import pandas as pd
 import json
 import re
+import time
 
-from langchain_openai       import AzureChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage
+
+from config import settings
+from agents.utils.concurrency import bounded_map, credential_key, credential_slot
+from agents.utils.model_registry import count_tokens, OUTPUT_RATIO
+from agents.utils.llm_usage import response_usage
+from agents.utils.llm_stream import invoke_llm
+from agents.utils.hedging import take_job_stats, prior_latency
+from agents.utils.credential_pool import pool_members, breaker_snapshots
+from agents.utils import credential_pool
+from agents.utils.llm_clients import get_client
+from tasks.job_events import emit
+from agents.utils.chunk_templating import instantiate
+from agents.utils.incremental import plan_reuse
+from agents.utils.sas_rules import convert_sas
+from agents.utils import sql_transpile
+from agents.utils.chunk_routing import STANDARD, routed_cred
+from agents.utils.chunk_packing import (pack_chunks, build_batch_message,
+                                        split_batch_response)
+from services import chunk_cache, job_checkpoint
 
 # ───────────────────────────────────────────────────────────────────
 BASE_DIR = Path(__file__).resolve().parent.parent
 RULE_DIR = BASE_DIR / "rule_outputs"
 RULE_DIR.mkdir(exist_ok=True)
 
+# bump whenever _prompt_text changes so cached conversions are not reused
+PROMPT_VERSION = "v2"
+
 # SYSTEM_PROMPT = (
 #     "You are an expert migration engineer.\n"
 #     "Convert the given SAS code block to equivalent PySpark"
@@ -30,37 +53,16 @@ RULE_DIR.mkdir(exist_ok=True)
 
 # ───────────────────────────────────────────────────────────────────
 def _count_tokens(model_name: str, text: str) -> int:
-    try:
-        import tiktoken
-        enc = tiktoken.encoding_for_model(model_name)
-        return len(enc.encode(text))
-    except Exception:
-        return len(text.split())
+    return count_tokens(model_name, text)
 
 def _init_llm(provider: str, cred: Dict):
-    if provider == "azureopenai":
-        return AzureChatOpenAI(
-            azure_endpoint     = cred["openai_api_base"],
-            openai_api_key     = cred["openai_api_key"],
-            openai_api_version = cred["openai_api_version"],
-            deployment_name    = cred["deployment_name"],
-            model_name         = cred["model_name"],
-            temperature        = 0.0,
-        )
-    if provider == "gemini":
-        return ChatGoogleGenerativeAI(
-            model          = cred["model_name"],
-            google_api_key = cred["google_api_key"],
-            temperature    = 0.0,
-        )
-    raise ValueError("Unsupported LLM provider")
+    return get_client(provider, cred)      # shared, see agents/utils/llm_clients.py
 
 
 # dynamic prompt builder -------------------------------------------------------
-def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
-                  source: str, target: str, ddl_type: str) -> ChatPromptTemplate:
+def _prompt_text(chunk_id: str, chunk_type: str, src_code: str,
+                 source: str, target: str, ddl_type: str) -> Tuple[str, str]:
     if target.lower() == "snowpark" and source.lower() not in ("informatica", "datastage"):
-        print("Solo Snowpark Enabled")
         system_msg = (
             "You are an expert in Snowpark (Python) API.\n"
             f"Convert the following {ddl_type.upper()} code from {source.upper()} "
@@ -68,11 +70,10 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             "Do NOT return plain SQL; produce executable Python code that uses Snowpark constructs."
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### SNOWPARK PYTHON equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### SNOWPARK PYTHON equivalent ###")
     
     elif source.lower() == "informatica" and target.lower() == "snowpark":
-        print("Informatica - Snowpark ETL Prompt Enabled")
         system_msg = (
             """Convert this Informatica mapping (in XML format) into a production-grade PySpark script that writes to Snowflake, fully replicating the ETL logic. Follow these strict and detailed conversion instructions:
 
@@ -198,11 +199,10 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
                 """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### SNOWPARK equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### SNOWPARK equivalent ###")
     
     elif source.lower() == "informatica" and target.lower() == "snowflake":
-        print("Informatica - Snowflake ETL Prompt Enabled")
         system_msg = (
             """Convert this Informatica mapping (in XML format) into a fully functional, production-ready Snowflake SQL script that replicates the complete ETL logic. Follow these detailed and strict instructions:
 
@@ -325,8 +325,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
                 """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### SNOWFLAKE SQL equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### SNOWFLAKE SQL equivalent ###")
 
     elif source.lower() == "informatica" and target.lower() == "matallion":
         system_msg = (
@@ -376,8 +376,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
                 """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### Matillion equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### Matillion equivalent ###")
         
     elif source.lower() == "informatica" and target.lower() == "dbt":
         system_msg = (
@@ -438,11 +438,10 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### DBT equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### DBT equivalent ###")
 
     elif source.lower() == "datastage" and target.lower() == "snowpark":
-        print("Datastage - Snowpark ETL Prompt Enabled")
         system_msg = (
             """Convert this IBM DataStage job (in XML format) into a production-grade PySpark script that writes to Snowflake, fully replicating the ETL logic. Follow these detailed instructions:
 
@@ -568,11 +567,10 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
                 """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### SNOWPARK PYTHON equivalent ###")   
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### SNOWPARK PYTHON equivalent ###")   
     
     elif source.lower() == "datastage" and target.lower() == "snowflake":
-        print("Datastage - Snowflake ETL Prompt Enabled")
         system_msg = (
             """Convert this IBM DataStage job (in XML format) into a complete, production-grade Snowflake SQL script that fully replicates the ETL logic. Follow the detailed instructions below:
 
@@ -685,8 +683,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
                 """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### SNOWFLAKE SQL equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### SNOWFLAKE SQL equivalent ###")
     
     elif source.lower() == "datastage" and target.lower() == "matallion":
         system_msg = (
@@ -729,8 +727,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
         """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### Matillion equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### Matillion equivalent ###")
 
     elif source.lower() == "datastage" and target.lower() == "dbt":
         system_msg = (
@@ -791,11 +789,10 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             """
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n### DBT equivalent ###")
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### DBT equivalent ###")
     
     elif source.lower() == "sas" and target.lower() == "dbt":
-        print("SAS DBT Applied")
         system_msg = (
             """You are an expert SAS-to-dbt migration engineer.\n
     Your task is to convert SAS code into production-ready **dbt** assets while preserving
@@ -869,8 +866,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
        • Keep comments explaining any assumption or adapter-specific behavior.\n"""
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"""{src_code}\n\n### DBT equivalent ###
+            f"### {source.upper()} code ###\n"
+            f"""{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### DBT equivalent ###
             - Produce the dbt model SQL with a config block and ordered CTEs mirroring SAS steps.
             - Add a schema.yml snippet with tests and column documentation.
             - If the code reads raw tables, include a sources.yml snippet.
@@ -878,7 +875,6 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             Return your answer using the exact markers specified above.""")
             
     elif source.lower() == "cobol" and target.lower() == "dbt":
-        print("Cobol DBT Applied")
         system_msg = (
             """You are an expert COBOL-to-dbt migration engineer.
             Convert COBOL batch logic into production-ready dbt assets while preserving
@@ -965,8 +961,8 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             • Document all assumptions, REDEFINES/OCCURS handling, and data type decisions in comments."""
         )
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"""{src_code}\n\n### DBT equivalent ###
+            f"### {source.upper()} code ###\n"
+            f"""{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n### DBT equivalent ###
             - Produce the dbt model SQL with config block and ordered CTEs mirroring COBOL paragraph/step sequence..
             - Add a schema.yml snippet with tests and column documentation.
             - If raw datasets/tables are read, include a sources.yml snippet.
@@ -974,7 +970,6 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
             Return your answer using ONLY the EXACT markers specified above.""")
 
     else:
-        print("Else Applied in conversion")
         system_msg = (
             f"You are an expert migration engineer.\n"
             f"Convert the following {ddl_type.upper()} code from "
@@ -983,44 +978,130 @@ def _build_prompt(chunk_id: str, chunk_type: str, src_code: str,
         )
 
         user_msg = (
-            f"### {source.upper()} code (chunk {chunk_id}, type={chunk_type}) ###\n"
-            f"{src_code}\n\n"
+            f"### {source.upper()} code ###\n"
+            f"{src_code}\n\n### chunk {chunk_id}, type={chunk_type} ###\n"
             f"### {target.upper()} equivalent ###"
         )
 
-    return ChatPromptTemplate.from_messages([
-        ("system", system_msg),
-        ("user",   user_msg),
-    ])
+    return system_msg, user_msg
+
+
+# compiled prompt cache ---------------------------------------------------------
+# sentinels stand in for the per-chunk fields while a prompt is compiled
+_SLOTS = {"chunk_id": "\x00chunk_id\x00",
+          "chunk_type": "\x00chunk_type\x00",
+          "src_code": "\x00src_code\x00"}
+
+class CompiledPrompt:
+    """One precompiled prompt per (source, target, ddl_type, prompt_version)."""
+
+    def __init__(self, source: str, target: str, ddl_type: str):
+        system_tmpl, user_msg = _prompt_text(source=source, target=target,
+                                             ddl_type=ddl_type, **_SLOTS)
+        # system text is rendered once, exactly as the old per-chunk template did
+        self.system = ChatPromptTemplate.from_messages(
+            [("system", system_tmpl)]).format_messages()[0]
+        user_tmpl = user_msg.replace("{", "{{").replace("}", "}}")
+        for name, sentinel in _SLOTS.items():
+            user_tmpl = user_tmpl.replace(sentinel, "{" + name + "}")
+        self.user_static = user_msg
+        for sentinel in _SLOTS.values():
+            self.user_static = self.user_static.replace(sentinel, "")
+        self.template = ChatPromptTemplate.from_messages([self.system, ("user", user_tmpl)])
+        self._system_tokens: Dict[str, int] = {}
+        self._static_tokens: Dict[str, int] = {}
+
+    def messages(self, chunk_id: str, chunk_type: str, src_code: str):
+        return self.template.format_messages(
+            chunk_id=chunk_id, chunk_type=chunk_type, src_code=src_code)
+
+    def system_tokens(self, model_name: str) -> int:
+        """Tokens of the system message – counted once per model."""
+        if model_name not in self._system_tokens:
+            self._system_tokens[model_name] = _count_tokens(model_name, self.system.content)
+        return self._system_tokens[model_name]
+
+    def static_tokens(self, model_name: str) -> int:
+        """Tokens of everything but the chunk fields – counted once per model."""
+        if model_name not in self._static_tokens:
+            self._static_tokens[model_name] = (
+                self.system_tokens(model_name)
+                + _count_tokens(model_name, self.user_static))
+        return self._static_tokens[model_name]
+
+
+@lru_cache(maxsize=None)
+def _compiled_prompt(source: str, target: str, ddl_type: str,
+                     prompt_version: str = PROMPT_VERSION) -> CompiledPrompt:
+    return CompiledPrompt(source.lower(), target.lower(), ddl_type.lower())
+
+def get_prompt(source: str, target: str, ddl_type: str) -> CompiledPrompt:
+    return _compiled_prompt(source.lower(), target.lower(), ddl_type.lower(), PROMPT_VERSION)
+
+# selections offered by the UI (frontend/src/pages/UploadSAS.js)
+KNOWN_SOURCES   = ("ms sql server", "oracle", "teradata", "apache hive",
+                   "azure synapse analytics", "sap hana", "sas", "plsql",
+                   "informatica", "datastage", "snowflake", "cobol")
+KNOWN_DDL_TYPES = ("tables", "views", "procedures", "functions", "general")
+KNOWN_TARGETS   = ("databricks", "snowflake", "snowpark", "bigquery", "pyspark",
+                   "dbt", "matillion", "python")
+
+def warm_prompt_cache() -> int:
+    """Compile every UI combination up front; returns the number compiled."""
+    n = 0
+    for src in KNOWN_SOURCES:
+        for tgt in KNOWN_TARGETS:
+            if src == tgt:
+                continue
+            for ddl in KNOWN_DDL_TYPES:
+                get_prompt(src, tgt, ddl)
+                n += 1
+    return n
 
 
 # LLM invocation per chunk -----------------------------------------------------
 def _convert_chunk(llm, blk: Dict, model_name: str,
-                   source: str, target: str, ddl_type: str) -> Dict:
-    prompt = _build_prompt(
-        blk["id"], blk["type"], blk["code"], source, target, ddl_type
-    ).format_prompt().to_messages()
-
+                   source: str, target: str, ddl_type: str,
+                   job_id: str | None = None, cred_key: str | None = None,
+                   hedge: Tuple | None = None) -> Dict:
+    compiled = get_prompt(source, target, ddl_type)
+    prompt   = compiled.messages(blk["id"], blk["type"], blk["code"])
+    code_tok = _count_tokens(model_name, blk["code"])
+    est_in   = compiled.static_tokens(model_name) + code_tok
+
+    emit(job_id, "chunk", id=blk["id"], state="converting")
     try:
-        resp   = llm.invoke(prompt)
-        output = resp.content.strip() or "# LLM returned empty"
-
-        if hasattr(resp, "usage"):
-            in_tok  = resp.usage.prompt_tokens
-            out_tok = resp.usage.completion_tokens
+        est_out = int(code_tok * OUTPUT_RATIO)
+        with credential_slot(cred_key, settings.LLM_MAX_CONCURRENCY_PER_CREDENTIAL):
+            resp = invoke_llm(llm, prompt, job_id=job_id, chunk_id=blk["id"],
+                              cred_key=cred_key, est_tokens=est_in + est_out,
+                              out_tokens=max(1, est_out), hedge=hedge)
+        output = resp.content.strip()
+
+        usage = response_usage(resp)
+        if usage:
+            in_tok, out_tok, cached = usage["input"], usage["output"], usage["cached"]
         else:
-            in_tok  = _count_tokens(model_name, prompt[-1].content)
+            in_tok  = est_in
             out_tok = _count_tokens(model_name, output)
+            cached  = 0
 
+        if output:
+            emit(job_id, "chunk", id=blk["id"], state="converted",
+                 input_tokens=in_tok, output_tokens=out_tok)
+        else:
+            emit(job_id, "chunk", id=blk["id"], state="failed", reason="LLM returned empty")
         return {
             "id":            blk["id"],
-            "ok":            True,
-            "code":          output,
+            "ok":            bool(output),
+            "code":          output or "# LLM returned empty",
             "input_tokens":  in_tok,
             "output_tokens": out_tok,
             "total_tokens":  in_tok + out_tok,
+            "cached_tokens": cached,
         }
     except Exception as e:
+        emit(job_id, "chunk", id=blk["id"], state="failed", reason=f"LLM error: {e}")
         return {
             "id":            blk["id"],
             "ok":            False,
@@ -1028,7 +1109,153 @@ def _convert_chunk(llm, blk: Dict, model_name: str,
             "input_tokens":  0,
             "output_tokens": 0,
             "total_tokens":  0,
+            "cached_tokens": 0,
+        }
+
+# several small chunks in one request ------------------------------------------
+def _convert_batch(llm, blocks: List[Dict], model_name: str,
+                   source: str, target: str, ddl_type: str,
+                   job_id: str | None = None, cred_key: str | None = None,
+                   hedge: Tuple | None = None) -> List[Dict] | None:
+    """One LLM call for a bin of small chunks; ``None`` if the answer can't be split."""
+    compiled = get_prompt(source, target, ddl_type)
+    user     = build_batch_message(blocks, source, target)
+    user_tok = _count_tokens(model_name, user)
+    for blk in blocks:
+        emit(job_id, "chunk", id=blk["id"], state="converting", batch_size=len(blocks))
+    try:
+        est_out = int(user_tok * OUTPUT_RATIO)
+        with credential_slot(cred_key, settings.LLM_MAX_CONCURRENCY_PER_CREDENTIAL):
+            resp = invoke_llm(llm, [compiled.system, HumanMessage(content=user)],
+                              job_id=job_id, chunk_id=blocks[0]["id"], cred_key=cred_key,
+                              est_tokens=compiled.system_tokens(model_name) + user_tok + est_out,
+                              out_tokens=max(1, est_out), hedge=hedge)
+    except Exception as e:
+        print(f"⚠️  batch of {len(blocks)} chunks failed: {e}")
+        return None
+
+    parts = split_batch_response(resp.content or "", [b["id"] for b in blocks])
+    if parts is None:
+        print(f"⚠️  batch of {len(blocks)} chunks returned unparseable output")
+        return None
+
+    # the shared prompt overhead is spread evenly over the packed chunks
+    code_tok = {b["id"]: _count_tokens(model_name, b["code"]) for b in blocks}
+    overhead = compiled.system_tokens(model_name) + max(
+        0, user_tok - sum(code_tok.values()))
+    usage    = response_usage(resp)
+    if usage:                       # provider totals win over the local estimate
+        overhead = max(0, usage["input"] - sum(code_tok.values()))
+    share    = overhead // len(blocks)
+    cached   = (usage["cached"] if usage else 0) // len(blocks)
+    rows = []
+    for blk in blocks:
+        in_tok  = code_tok[blk["id"]] + share
+        out_tok = _count_tokens(model_name, parts[blk["id"]])
+        rows.append({
+            "id":            blk["id"],
+            "ok":            True,
+            "code":          parts[blk["id"]],
+            "input_tokens":  in_tok,
+            "output_tokens": out_tok,
+            "total_tokens":  in_tok + out_tok,
+            "cached_tokens": cached,
+            "batch_size":    len(blocks),
+        })
+        emit(job_id, "chunk", id=blk["id"], state="converted",
+             input_tokens=in_tok, output_tokens=out_tok, batch_size=len(blocks))
+    return rows
+
+def _convert_packed(llm, blocks: List[Dict], model_name: str, source: str,
+                    target: str, ddl_type: str, tenant: str,
+                    run_all, pack_cfg: Dict, job_id: str | None = None,
+                    cred_key: str | None = None, hedge: Tuple | None = None,
+                    single=None) -> List[Dict]:
+    """Cache lookups first, then bin-pack the misses; bins that fail fall back
+    to single-chunk calls (*single*, default ``_convert_cached`` on this client)."""
+    done: Dict[str, Dict] = {}
+    misses = []
+    for blk in blocks:
+        hit = None
+        if settings.CHUNK_CACHE_ENABLED:
+            key = chunk_cache.cache_key(blk["code"], source, target, ddl_type,
+                                        model_name, PROMPT_VERSION)
+            try:
+                hit = chunk_cache.lookup(tenant, key)
+            except Exception as e:
+                print(f"⚠️  chunk cache lookup failed: {e}")
+        if hit is None:
+            misses.append(blk)
+            continue
+        done[blk["id"]] = {
+            "id": blk["id"], "ok": True, "code": hit["code"],
+            "input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+            "cache": "hit",
+            "saved_tokens": hit["input_tokens"] + hit["output_tokens"],
         }
+        emit(job_id, "chunk", id=blk["id"], state="cached", via="hit")
+
+    bins = pack_chunks(misses, lambda code: _count_tokens(model_name, code), **pack_cfg)
+    singles = [b[0] for b in bins if len(b) == 1]
+    batched = [b for b in bins if len(b) > 1]
+
+    fallback = []
+    for bin_blocks, rows in zip(batched, run_all(
+            lambda bb: _convert_batch(llm, bb, model_name, source, target,
+                                      ddl_type, job_id, cred_key, hedge),
+            batched)):
+        if rows is None:
+            fallback.extend(bin_blocks)
+            continue
+        meta = {"source": source, "target": target, "ddl_type": ddl_type,
+                "model_name": model_name, "prompt_version": PROMPT_VERSION}
+        for blk, row in zip(bin_blocks, rows):
+            if not settings.CHUNK_CACHE_ENABLED:
+                done[blk["id"]] = {**row, "cache": "off"}
+                continue
+            key = chunk_cache.cache_key(blk["code"], source, target, ddl_type,
+                                        model_name, PROMPT_VERSION)
+            done[blk["id"]] = {**row, "cache": "miss",
+                               "cache_entry": chunk_cache.entry(tenant, key, meta, row)}
+
+    single = single or (lambda blk: _convert_cached(llm, blk, model_name, source, target,
+                                                    ddl_type, tenant, job_id, cred_key, hedge))
+    for row in run_all(single, singles + fallback):
+        done[row["id"]] = row
+    return [done[b["id"]] for b in blocks]
+
+# cache-aware wrapper ----------------------------------------------------------
+def _convert_cached(llm, blk: Dict, model_name: str, source: str, target: str,
+                    ddl_type: str, tenant: str, job_id: str | None = None,
+                    cred_key: str | None = None, hedge: Tuple | None = None) -> Dict:
+    """_convert_chunk behind the persistent chunk cache; adds a ``cache`` field."""
+    convert = lambda: _convert_chunk(llm, blk, model_name, source, target,
+                                     ddl_type, job_id, cred_key, hedge)
+    if not settings.CHUNK_CACHE_ENABLED:
+        return {**convert(), "cache": "off"}
+
+    key  = chunk_cache.cache_key(blk["code"], source, target, ddl_type,
+                                 model_name, PROMPT_VERSION)
+    meta = {"source": source, "target": target, "ddl_type": ddl_type,
+            "model_name": model_name, "prompt_version": PROMPT_VERSION}
+    res, outcome = chunk_cache.get_or_convert(tenant, key, meta, convert)
+    if outcome == "miss":           # stored by validate/feedback once it passed
+        return {**res, "cache": outcome,
+                **({"cache_entry": chunk_cache.entry(tenant, key, meta, res)}
+                   if res["ok"] else {})}
+
+    # served without an LLM call of our own – no tokens spent for this chunk
+    emit(job_id, "chunk", id=blk["id"], state="cached", via=outcome)
+    return {
+        "id":            blk["id"],
+        "ok":            res.get("ok", True),
+        "code":          res["code"],
+        "input_tokens":  0,
+        "output_tokens": 0,
+        "total_tokens":  0,
+        "cache":         outcome,
+        "saved_tokens":  res.get("input_tokens", 0) + res.get("output_tokens", 0),
+    }
 
 # ───────────────────────────────────────────────────────────────────
 def llm_rule_node(state: Dict) -> Dict:
@@ -1039,16 +1266,14 @@ def llm_rule_node(state: Dict) -> Dict:
     target   = state.get("target").lower()
     ddl_type = state.get("ddl_type").lower()
 
-    print("LLM Input types:", source, target, ddl_type)
     ast_blocks: List[Dict] = state.get("ast_blocks", [])
     provider               = state["llm_provider"]
     cred                   = state["llm_cred"]
     model_name             = cred.get("model_name", "").lower()
-    print("Done..............")
 
     llm  = _init_llm(provider, cred)
     rows, status = [], []
-    total_in = total_out = 0
+    total_in = total_out = total_cached = 0
 
     code_lookup = {b["id"]: b["code"] for b in ast_blocks}
 
@@ -1056,19 +1281,290 @@ def llm_rule_node(state: Dict) -> Dict:
         matches = re.findall(r'\d+', chunk_id)
         return int(matches[0]) if matches else -1
 
+    # fan out: per-job pool size, per-credential cap shared across jobs
+    max_workers = int(state.get("max_concurrency")
+                      or settings.LLM_MAX_CONCURRENCY_PER_JOB)
+    tenant = str(state.get("user_id") or "anonymous")
+    job_id = state.get("job_id")
     for blk in ast_blocks:
-        res = _convert_chunk(llm, blk, model_name, source, target, ddl_type)
+        emit(job_id, "chunk", id=blk["id"], state="queued")
+    cred_key = credential_key(cred)
+    splits: Dict[str, Dict] = {}        # chunk id → sql_transpile plan, LLM converts a span
+
+    def _checkpoint(res):
+        """Persist finished conversions as they come back (single row or batch)."""
+        rows = res if isinstance(res, list) else [res] if res else []
+        for r in rows:                  # put locally transpiled statements back around the span
+            plan = splits.get(r["id"])
+            if plan and r.get("ok") and "statements" not in r:
+                r["code"] = sql_transpile.stitch(plan, r["code"])
+                r["statements"] = plan["statements"]
+        job_checkpoint.save_chunks(job_id, [
+            {"chunk_id": r["id"], "stage": "converted", "ok": True, "code": r["code"],
+             "input_tokens": r["input_tokens"], "output_tokens": r["output_tokens"]}
+            for r in rows if r.get("ok")])
+        return res
+
+    # the per-credential cap is taken around each LLM call, on the credential
+    # (tier / pool member) that call goes to
+    run_all = lambda fn, items: bounded_map(
+        lambda item: _checkpoint(fn(item)), items, max_workers=max_workers)
+
+    # model tier per chunk (routing_node); each tier has its own client and limiter
+    routes  = state.get("chunk_routes") or {}
+    tiers   = (state.get("routing_rules") or {}).get("tiers") or {}
+    targets = {STANDARD: (llm, model_name, cred_key)}
+    for tier, cfg in tiers.items():
+        tcred = routed_cred(cred, cfg)
+        targets[tier] = (_init_llm(provider, tcred), tcred.get("model_name", "").lower(),
+                         f"{cred_key}/{tcred.get('deployment_name') or tcred.get('model_name')}")
+
+    # slow calls are hedged to a second credential when the job names one
+    # (and LLM_HEDGE_ENABLED is set); never to the same deployment
+    hedge = None
+    if state.get("hedge_llm_cred"):
+        hcred = state["hedge_llm_cred"]
+        hedge = (_init_llm(state.get("hedge_llm_provider") or provider, hcred),
+                 credential_key(hcred))
+
+    def tier_of(blk) -> str:
+        tier = (routes.get(blk["id"]) or {}).get("tier", STANDARD)
+        return tier if tier in targets else STANDARD
+
+    # standard-tier chunks are spread over the job's credential pool, if any
+    members = {}
+    for m in pool_members(state):
+        m_key = credential_key(m["cred"])
+        members[m_key] = (_init_llm(m["provider"], m["cred"]),
+                          m["cred"].get("model_name", "").lower(), m["provider"])
+    pooled = len(members) > 1
+
+    def _convert_pooled(blk):
+        """Weighted pick, failing over to the next member when a call fails."""
+        tried, res = [], None
+        while (m_key := credential_pool.pick(list(members), exclude=tried)) is not None:
+            m_llm, m_model, m_provider = members[m_key]
+            t0  = time.monotonic()
+            res = _convert_cached(m_llm, blk, m_model, source, target,
+                                  ddl_type, tenant, job_id, m_key, hedge)
+            if res["cache"] in ("miss", "off"):
+                credential_pool.record(m_key, res["ok"], (time.monotonic() - t0)
+                                       / prior_latency(res["output_tokens"]))
+            else:
+                credential_pool.release(m_key)
+            res = {**res, "provider": m_provider, "model": m_model}
+            if res["ok"]:
+                break
+            tried.append(m_key)
+        return res
+
+    def _convert_one(blk):
+        tier = tier_of(blk)
+        if pooled and tier == STANDARD:
+            return _convert_pooled(blk)
+        t_llm, t_model, t_key = targets[tier]
+        res = _convert_cached(t_llm, blk, t_model, source, target,
+                              ddl_type, tenant, job_id, t_key, hedge)
+        return {**res, "provider": provider, "model": t_model}
+
+    fan_out = lambda blocks: run_all(_convert_one, blocks)
+
+    # optional packing of tiny chunks into shared requests
+    pack = state.get("pack_chunks")
+    if pack is None:
+        pack = settings.LLM_PACK_SMALL_CHUNKS
+    pack_cfg = {
+        "budget":        settings.LLM_PACK_TOKEN_BUDGET,
+        "small_limit":   settings.LLM_PACK_SMALL_CHUNK_TOKENS,
+        "max_per_batch": settings.LLM_PACK_MAX_CHUNKS,
+    }
+
+    # chunks converted before a restart come back from the job checkpoint
+    resumed = {}
+    for cid, cp in job_checkpoint.load_chunks(job_id).items():
+        if cp["ok"] and cp["code"] is not None and cid in code_lookup:
+            resumed[cid] = {
+                "id": cid, "ok": True, "code": cp["code"],
+                "input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                "cache": "resumed", "provider": "", "model": "",   # not checkpointed
+                "saved_tokens": (cp["input_tokens"] or 0) + (cp["output_tokens"] or 0),
+            }
+            emit(job_id, "chunk", id=cid, state="cached", via="resumed")
+
+    # incremental run: unchanged chunks take the prior job's validated output
+    reused, diff, prior_id = {}, None, state.get("incremental_from")
+    if prior_id and not settings.JOB_CHECKPOINT_ENABLED:
+        print("⚠️  incremental: checkpointing is disabled – converting everything")
+        prior_id = None
+    prior = job_checkpoint.prior_job(prior_id) if prior_id else None
+    if prior_id and prior is None:
+        print(f"⚠️  incremental: job {prior_id} has no checkpoint – converting everything")
+    if prior and tuple((prior[k] or "").lower() for k in ("source", "target", "ddl_type")) \
+            != (source, target, ddl_type):
+        print(f"⚠️  incremental: job {prior_id} converted {prior['source']}→{prior['target']}"
+              f" ({prior['ddl_type']}) – converting everything")
+        prior = None
+    if prior:
+        plan, diff = plan_reuse(prior["ast_blocks"], prior["chunks"],
+                                [b for b in ast_blocks if b["id"] not in resumed])
+        for cid, hit in plan.items():
+            reused[cid] = {
+                "id": cid, "ok": True, "code": hit["code"],
+                "input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                "cache": "reused", "reused_from": hit["from"],
+                "provider": "", "model": "",
+                "saved_tokens": hit["tokens"],
+            }
+            emit(job_id, "chunk", id=cid, state="cached", via="reused")
+        _checkpoint(list(reused.values()))
+
+    # deterministic fast path: chunks inside the rule subset never reach the LLM;
+    # SQL sources are transpiled statement by statement, the rest goes to the LLM
+    ruled, fast = {}, state.get("rule_fast_path")
+    if fast is None:
+        fast = settings.RULE_FAST_PATH_ENABLED
+    engine = ("sas_rules" if source == "sas" else
+              "sqlglot" if sql_transpile.supported(source, target) else None)
+    fast = bool(fast and engine)
+    if fast:
+        t0 = time.perf_counter()
+        templated_ids = state.get("chunk_templates") or {}
+        for blk in ast_blocks:
+            if blk["id"] in resumed or blk["id"] in reused:
+                continue
+            plan = None
+            if engine == "sas_rules":
+                code = convert_sas(blk["code"], target)
+            else:
+                plan = sql_transpile.plan_chunk(blk["code"], source, target)
+                code = (plan or {}).get("code")
+                if plan and plan["llm"] is not None and blk["id"] not in templated_ids:
+                    splits[blk["id"]] = plan
+            if code is None:
+                continue
+            ruled[blk["id"]] = {
+                "id": blk["id"], "ok": True, "code": code,
+                "input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                "cache": "rule", "provider": "rules", "model": engine,
+                "saved_tokens": 0,
+                **({"statements": plan["statements"]} if plan else {}),
+            }
+            emit(job_id, "chunk", id=blk["id"], state="cached", via="rule")
+        rule_ms = (time.perf_counter() - t0) * 1000
+        _checkpoint(list(ruled.values()))
+    settled = {**ruled, **reused, **resumed}
+
+    # near-duplicates (template_node) are rebuilt from their representative
+    templates = state.get("chunk_templates") or {}
+    primary   = [{**b, "code": splits[b["id"]]["llm"]} if b["id"] in splits else b
+                 for b in ast_blocks if b["id"] not in templates and b["id"] not in settled]
+    if pack:                    # bins never mix tiers (or pool members)
+        groups = []
+        for tier, (t_llm, t_model, t_key) in targets.items():
+            group = [b for b in primary if tier_of(b) == tier]
+            if not (pooled and tier == STANDARD):
+                groups.append((t_llm, t_model, t_key, provider, group))
+                continue
+            picks = {b["id"]: credential_pool.pick(list(members)) for b in group}
+            for m_key, (m_llm, m_model, m_provider) in members.items():
+                credential_pool.release(m_key)
+                groups.append((m_llm, m_model, m_key, m_provider,
+                               [b for b in group if picks[b["id"]] == m_key]))
+        first_pass = []
+        for g_llm, g_model, g_key, g_provider, group in groups:
+            first_pass += [{"provider": g_provider, "model": g_model, **r}
+                           for r in _convert_packed(g_llm, group, g_model, source, target,
+                                                    ddl_type, tenant, run_all, pack_cfg,
+                                                    job_id, g_key, hedge, _convert_one)]
+    else:
+        first_pass = fan_out(primary)
+    by_id = {**settled, **{r["id"]: r for r in first_pass}}
+
+    leftovers, avoided_tokens = [], 0
+    for blk in ast_blocks:
+        plan = templates.get(blk["id"])
+        if not plan or blk["id"] in settled:
+            continue
+        rep  = by_id.get(plan["rep"])
+        code = None
+        if rep and rep["ok"]:
+            code = instantiate(rep["code"], code_lookup[plan["rep"]],
+                               plan["rep_slots"], plan["slots"])
+        if code is None:                # unsafe rename → ask the LLM after all
+            leftovers.append(blk)
+            continue
+        avoided_tokens += rep["total_tokens"] or rep.get("saved_tokens", 0)
+        by_id[blk["id"]] = {
+            "id":            blk["id"],
+            "ok":            True,
+            "code":          code,
+            "input_tokens":  0,
+            "output_tokens": 0,
+            "total_tokens":  0,
+            "cache":         "template",
+            "template_of":   plan["rep"],
+            "provider":      rep.get("provider", provider),
+            "model":         rep.get("model", targets[tier_of(blk)][1]),
+        }
+        emit(job_id, "chunk", id=blk["id"], state="cached", via="template",
+             template_of=plan["rep"])
+    by_id.update({r["id"]: r for r in fan_out(leftovers)})
+    results = [by_id[b["id"]] for b in ast_blocks]
+
+    tier_usage: Dict[str, Dict] = {}
+    pool_usage: Dict[str, Dict] = {}
+    for blk, res in zip(ast_blocks, results):
         # print("Chunk: ", res["code"])
         rows.append(res)
+        tier  = tier_of(blk)
+        route = routes.get(blk["id"]) or {}
+        tu = tier_usage.setdefault(tier, {"model": targets[tier][1], "chunks": 0,
+                                          "input": 0, "output": 0})
+        tu["chunks"] += 1
+        tu["input"]  += res["input_tokens"]
+        tu["output"] += res["output_tokens"]
+        if pooled and tier == STANDARD and res.get("provider"):
+            pu = pool_usage.setdefault(f"{res['provider']}/{res['model']}", {
+                "provider": res["provider"], "model": res["model"],
+                "chunks": 0, "input": 0, "output": 0})
+            pu["chunks"] += 1
+            pu["input"]  += res["input_tokens"]
+            pu["output"] += res["output_tokens"]
         status.append({
             "id":            res["id"],
             "ok":            res["ok"],
             "input_tokens":  res["input_tokens"],
             "output_tokens": res["output_tokens"],
             "total_tokens":  res["total_tokens"],
+            "cached_tokens": res.get("cached_tokens", 0),
+            "cache":         res["cache"],
+            "template_of":   res.get("template_of"),
+            "reused_from":   res.get("reused_from"),
+            "batch_size":    res.get("batch_size", 1),
+            "route":         tier,
+            "provider":      res.get("provider", provider),
+            "model":         res.get("model", targets[tier][1]),
+            "complexity":    route.get("score"),
+            "statements":    res.get("statements"),
         })
         total_in  += res["input_tokens"]
         total_out += res["output_tokens"]
+        total_cached += res.get("cached_tokens", 0)
+
+    outcomes = [r["cache"] for r in results]
+    served   = outcomes.count("hit") + outcomes.count("coalesced")
+    lookups  = served + outcomes.count("miss")
+    cache_stats = {
+        "hits":         outcomes.count("hit"),
+        "misses":       outcomes.count("miss"),
+        "coalesced":    outcomes.count("coalesced"),
+        "hit_rate":     round(served / lookups, 4) if lookups else 0.0,
+        "saved_tokens": sum(r.get("saved_tokens", 0) for r in results),
+        "resumed":      outcomes.count("resumed"),
+        "reused":       outcomes.count("reused"),
+        "rule_hits":    outcomes.count("rule"),
+        "rule_hit_rate": round(outcomes.count("rule") / len(outcomes), 4) if outcomes else 0.0,
+    }
 
     rows.sort(key=lambda r: extract_numeric_part(r["id"]))
 
@@ -1088,6 +1584,8 @@ def llm_rule_node(state: Dict) -> Dict:
         "input_tokens":        [r["input_tokens"] for r in rows],
         "output_tokens":       [r["output_tokens"] for r in rows],
         "total_tokens":        [r["total_tokens"] for r in rows],
+        "provider":            [r.get("provider", provider) for r in rows],
+        "model":               [r.get("model", model_name) for r in rows],
     }).to_csv(csv_path, index=False)
 
     tok = state.get("token_usage", {})
@@ -1095,8 +1593,53 @@ def llm_rule_node(state: Dict) -> Dict:
         "input":  total_in,
         "output": total_out,
         "total":  total_in + total_out,
+        "cached_input": total_cached,
         "model":  model_name,
     }
+    templated = outcomes.count("template")
+    tok["templating"] = {
+        "input": 0, "output": 0, "total": 0,      # savings only – nothing spent
+        "chunks_avoided": templated,
+        "tokens_avoided": avoided_tokens,
+    }
+    hedging = take_job_stats(job_id)
+    tok["hedging"] = {
+        "input":  hedging["wasted_input"],     # spent by losing / cancelled attempts
+        "output": hedging["wasted_output"],
+        "total":  hedging["wasted_tokens"],
+        **{k: hedging[k] for k in ("calls", "hedged", "hedge_rate", "backup_wins",
+                                   "deadline_exceeded")},
+    }
+    if prior:
+        tok["incremental"] = {
+            "input": 0, "output": 0, "total": 0,      # savings only – nothing spent
+            "from_job":       prior_id,
+            "chunks_reused":  len(reused),
+            "tokens_avoided": sum(r["saved_tokens"] for r in reused.values()),
+            "diff":           diff,
+        }
+    if fast:
+        provenance = [s for r in results for s in (r.get("statements") or [])]
+        tok["rules"] = {
+            "input": 0, "output": 0, "total": 0,      # converted without the LLM
+            "engine":   engine,
+            "chunks":   len(ruled),
+            "hit_rate": cache_stats["rule_hit_rate"],
+            "ms":       round(rule_ms, 2),
+        }
+        if engine == "sqlglot":
+            tok["rules"]["statements"] = {
+                "transpiled":    sum(s["via"] == "sqlglot" for s in provenance),
+                "forwarded":     sum(s["via"] == "llm" for s in provenance),
+                "split_chunks":  len(splits),
+            }
+    if pooled:
+        tok["pool"] = {"input": 0, "output": 0, "total": 0,      # split of tok["llm"]
+                       "members": pool_usage,
+                       "breakers": breaker_snapshots(list(members))}
+    if len(tier_usage) > 1 or STANDARD not in tier_usage:
+        tok["routing"] = {"input": 0, "output": 0, "total": 0,   # split of tok["llm"]
+                          "tiers": tier_usage}
     state["token_usage"] = tok
 
     # ✅ Write LLM token usage to JSON for optimizer
@@ -1107,14 +1650,35 @@ def llm_rule_node(state: Dict) -> Dict:
 
     successes  = [r for r in rows if r["ok"]]
     failed_ids = [r["id"] for r in rows if not r["ok"]]
+    cache_pending = {}
+    for r in rows:
+        pending = r.pop("cache_entry", None)
+        if pending and r["ok"]:
+            # a split chunk's entry is the LLM span, not the stitched chunk
+            cache_pending[r["id"]] = {**pending, "split": r["id"] in splits}
 
     return {
         **state,
         "pyspark_chunks": successes,
         "failed_chunks":  failed_ids,
+        "cache_pending":  cache_pending,
         "chunk_status":   status,
+        "cache_stats":    cache_stats,
         "logs": state.get("logs", []) + [
-            f"LLM converted {len(successes)} chunks; failed {len(failed_ids)}"
+            f"LLM converted {len(successes)} chunks; failed {len(failed_ids)}",
+            f"Chunk cache: hits={cache_stats['hits']}, misses={cache_stats['misses']}, "
+            f"coalesced={cache_stats['coalesced']}",
+            f"Templating: reused {templated} chunks, ~{avoided_tokens} tokens avoided",
+            f"Checkpoint: {cache_stats['resumed']} chunks resumed without an LLM call",
+            *([f"Rules ({engine}): {len(ruled)}/{len(ast_blocks)} chunks converted without "
+               f"the LLM (hit rate {cache_stats['rule_hit_rate']:.0%})"] if fast else []),
+            *([f"Incremental: reused {len(reused)} chunks from job {prior_id} "
+               f"(unchanged {diff['unchanged']}, changed {diff['changed']}, "
+               f"added {diff['added']}, removed {diff['removed']})"] if prior else []),
+            f"Hedging: {hedging['hedged']}/{hedging['calls']} calls hedged, "
+            f"{hedging['deadline_exceeded']} past deadline, "
+            f"{hedging['wasted_tokens']} tokens wasted",
+            f"Prompt prefix cache: {total_cached}/{total_in} input tokens served cached",
         ],
         "token_usage": tok
     }
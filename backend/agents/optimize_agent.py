@@ -5,10 +5,15 @@ from datetime import datetime
 from time import perf_counter
 import re, json, pandas as pd
 
-from langchain_openai       import AzureChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 
+from agents.utils.llm_usage import response_usage
+from agents.utils.llm_stream import invoke_llm
+from agents.utils.llm_clients import get_client
+from agents.utils.concurrency import credential_key
+from agents.utils.model_registry import count_tokens
+from agents.utils.rate_limiter import limiter_snapshots
+
 # ────────────────────────── config ────────────────────────────
 PYTHON_TARGETS = {"pyspark", "snowpark","python"}               # code runs in Python VM
 SQL_TARGETS    = {"databricks", "snowflake", "bigquery"}
@@ -59,23 +64,7 @@ def _build_prompt(target: str) -> ChatPromptTemplate:
     ])
 
 def _load_llm(state: Dict):
-    cred, provider = state["llm_cred"], state["llm_provider"]
-    if provider == "azureopenai":
-        return AzureChatOpenAI(
-            azure_endpoint     = cred["openai_api_base"],
-            openai_api_key     = cred["openai_api_key"],
-            openai_api_version = cred["openai_api_version"],
-            deployment_name    = cred["deployment_name"],
-            model_name         = cred["model_name"],
-            temperature        = 0.0,
-        )
-    if provider == "gemini":
-        return ChatGoogleGenerativeAI(
-            model          = cred["model_name"],
-            google_api_key = cred["google_api_key"],
-            temperature    = 0.0,
-        )
-    raise ValueError("Unsupported provider")
+    return get_client(state["llm_provider"], state["llm_cred"])
 
 def _dedup_python(code: str) -> str:
     """Remove duplicate imports & builder lines – Py* only."""
@@ -121,7 +110,7 @@ def optimize_node(state: Dict) -> Dict:
     before_path.write_text(base_code, encoding="utf-8")
 
     # ▸ 3. LLM optimisation run ──────────────────────────────────
-    in2 = out2 = 0
+    in2 = out2 = cached2 = 0
     final = base_code
     if base_code:
         try:
@@ -129,12 +118,17 @@ def optimize_node(state: Dict) -> Dict:
             llm    = _load_llm(state)
             prompt = _build_prompt(target).format_prompt(code=base_code).to_messages()
             # print("Prompt is : ", prompt)
-            resp   = llm.invoke(prompt)
+            est    = sum(count_tokens(state["llm_cred"]["model_name"], m.content)
+                         for m in prompt)
+            resp   = invoke_llm(llm, prompt, job_id=state.get("job_id"),
+                                stage="optimize",
+                                cred_key=credential_key(state["llm_cred"]),
+                                est_tokens=2 * est)
             final  = resp.content.strip() or base_code
             # print("Final Code :", final)
-            if hasattr(resp, "usage"):
-                print("Landed in iffff")
-                in2, out2 = resp.usage.prompt_tokens, resp.usage.completion_tokens
+            usage  = response_usage(resp)
+            if usage:
+                in2, out2, cached2 = usage["input"], usage["output"], usage["cached"]
             state["logs"].append("LLM optimization succeeded.")
         except Exception as e:
             print("Errroooooorrr")
@@ -144,11 +138,12 @@ def optimize_node(state: Dict) -> Dict:
 
     if (in2 + out2) == 0 and base_code:
         in2, out2 = len(base_code.split()), len(final.split())
-    state["logs"].append(f"[optimize] tokens in={in2}, out={out2}")
+    state["logs"].append(f"[optimize] tokens in={in2}, out={out2}, cached={cached2}")
 
     # ▸ 4. update token_usage dict ───────────────────────────────
     tok_usage["optimize"] = {
         "input": in2, "output": out2, "total": in2+out2,
+        "cached_input": cached2,
         "model": state["llm_cred"]["model_name"]
     }
     state["token_usage"] = tok_usage
@@ -173,15 +168,27 @@ def optimize_node(state: Dict) -> Dict:
     # ▸ 7. cost maths (kept) ─────────────────────────────────────
     ti = sum(d["input"]  for d in tok_usage.values())
     to = sum(d["output"] for d in tok_usage.values())
+    tc = sum(d.get("cached_input", 0) for d in tok_usage.values())
     RATES = {
+        "gpt-4o-mini": {"input":0.00015,"output":0.0006},
         "gpt-4o": {"input":0.005,"output":0.015},
         "gpt-4":  {"input":0.03, "output":0.06 },
         "gpt-35": {"input":0.001,"output":0.002},
         "gemini": {"input":0.0015,"output":0.0015}
     }
+    rate_of = lambda m: next((v for k,v in RATES.items() if k in m), RATES["gpt-4o"])
     mdl = state["llm_cred"]["model_name"].lower()
-    rate= next((v for k,v in RATES.items() if k in mdl), RATES["gpt-4o"])
-    cost= round((ti/1e3)*rate["input"] + (to/1e3)*rate["output"], 6)
+    rate= rate_of(mdl)
+    cost= (ti/1e3)*rate["input"] + (to/1e3)*rate["output"]
+    # chunks routed to another model are billed at that model's price
+    for t in (tok_usage.get("routing") or {}).get("tiers", {}).values():
+        r = rate_of(t["model"])
+        cost += (t["input"]/1e3)*(r["input"]-rate["input"]) + (t["output"]/1e3)*(r["output"]-rate["output"])
+    # ... and so are chunks served by another credential of the job's pool
+    for m in (tok_usage.get("pool") or {}).get("members", {}).values():
+        r = rate_of(m["model"])
+        cost += (m["input"]/1e3)*(r["input"]-rate["input"]) + (m["output"]/1e3)*(r["output"]-rate["output"])
+    cost= round(cost, 6)
     dt  = round(perf_counter()-t0,2)
     state["before_code"] = base_code          # raw merged pre-LLM code
     state["final_code"]  = final              # optimized code (possibly python/sql)
@@ -212,8 +219,14 @@ def optimize_node(state: Dict) -> Dict:
         "llm_usage": {
             "by_stage": tok_usage, "input_tokens": ti,
             "output_tokens": to, "total_tokens": ti+to,
+            "cached_input_tokens": tc,
+            "prefix_cache_hit_rate": round(tc / ti, 4) if ti else 0.0,
             "estimated_cost_usd": cost
         },
+        "cache": state.get("cache_stats", {}),
+        "rate_limiter": limiter_snapshots().get(credential_key(state["llm_cred"]), {}),
+        "hedging": {k: v for k, v in (tok_usage.get("hedging") or {}).items()
+                    if k not in ("input", "output", "total")},
         "runtime_sec": dt,
         "graph_trace": state.get("graph_trace", []),
         "files": {
@@ -5,6 +5,11 @@ from agents.utils.sas_chunker_new import process_sas_string, save_chunks_to_csv
 from agents.utils.plsql_chunker import process_plsql_string, classify
 from agents.utils.generic_sql_chunker import process_sql_string
 from agents.utils.general_informatica_datastage_chunker import process_info_string
+from agents.utils.informatica_ir import process_informatica_string
+from agents.utils.datastage_parser import process_datastage_string
+from agents.utils.model_registry import count_tokens, target_chunk_tokens
+from agents.utils.token_chunker import resize_chunks
+from config import settings
 
 
 def infer_chunk_type(code: str) -> str:
@@ -18,6 +23,18 @@ def infer_chunk_type(code: str) -> str:
     return "UNKNOWN"
 
 def parse_node(state: dict) -> dict:
+    # resumed job: chunks come from the checkpoint, ids must not change
+    if state.get("ast_blocks"):
+        blocks = state["ast_blocks"]
+        print(f"🔍 Parse Node: reusing {len(blocks)} checkpointed blocks")
+        return {
+            **state,
+            "chunk_count":    len(blocks),
+            "unknown_blocks": sum(1 for b in blocks if b["type"] == "UNKNOWN"),
+            "logs": state.get("logs", []) + [f"Parse: {len(blocks)} blocks (checkpoint)"],
+            "graph_trace": state.get("graph_trace", []) + ["parse"],
+        }
+
     print("🔍 Parse Node: starting with max-line chunker")
 
     src_code: str = state["sas_code"]
@@ -39,15 +56,30 @@ def parse_node(state: dict) -> dict:
 
     elif source_type == "informatica":
         print("Informatica Applied")
-        raw_chunks = process_info_string(src_code)
+        if settings.INFORMATICA_COMPACT_IR:
+            raw_chunks = process_informatica_string(src_code)
+            ir_chars   = sum(len(ch["code"]) for ch in raw_chunks)
+            print(f"🗜️  Informatica IR: {len(src_code)} XML chars → {ir_chars} IR chars "
+                  f"in {len(raw_chunks)} pipeline chunks")
+        else:
+            raw_chunks = process_info_string(src_code)
         get_type   = lambda _: "Informatica"
 
     elif source_type == "datastage":
         print("Datastage Applied")
-        raw_chunks = process_info_string(src_code)
+        if settings.DATASTAGE_STAGE_CHUNKING:
+            # stage groups sized to the model window (token sizing skips XML sources)
+            model_name = (state.get("llm_cred") or {}).get("model_name", "")
+            budget     = (int(state.get("chunk_target_tokens") or target_chunk_tokens(model_name))
+                          if settings.CHUNK_TOKEN_SIZING else None)
+            raw_chunks = process_datastage_string(src_code, budget,
+                                                  lambda text: count_tokens(model_name, text))
+            print(f"🗂️  DataStage: {len(raw_chunks)} stage-group chunks")
+        else:
+            raw_chunks = process_info_string(src_code)
         get_type   = lambda _: "Datastage"
 
-    elif source_type == "oracle" or "plsql":
+    elif source_type in ("oracle", "plsql"):
         print("Oracle/PLSQL Applied")
         raw_chunks = process_plsql_string(src_code, max_lines=200)
         get_type   = classify
@@ -62,6 +94,14 @@ def parse_node(state: dict) -> dict:
         raw_chunks = process_sql_string(src_code)
         get_type   = lambda _: "SQL"
 
+    # ── re-cut to the model's token window (line counts ≠ tokens) ──
+    if settings.CHUNK_TOKEN_SIZING:
+        model_name = (state.get("llm_cred") or {}).get("model_name", "")
+        before     = len(raw_chunks)
+        raw_chunks = resize_chunks(raw_chunks, model_name, source_type,
+                                   state.get("chunk_target_tokens"))
+        print(f"📏 Token sizing ({model_name or 'default'}): {before} → {len(raw_chunks)} chunks")
+
     ast_blocks = [{
         "id":   ch["id"],
         "type": get_type(ch["code"]),
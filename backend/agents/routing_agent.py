@@ -0,0 +1,33 @@
+# backend/agents/routing_agent.py
+from typing import Dict
+
+from agents.utils.chunk_routing import normalize_rules, route_chunks, TIERS
+from config import settings
+
+
+def routing_node(state: Dict) -> Dict:
+    """Score every chunk and pick the model tier llm_rule_node will use."""
+    print("🧭 Routing Node: scoring chunk complexity")
+
+    blocks = state.get("ast_blocks", [])
+    rules  = normalize_rules(state.get("routing_rules"))
+    if not settings.MODEL_ROUTING_ENABLED:
+        rules["enabled"] = False
+    model_name = (state.get("llm_cred") or {}).get("model_name", "").lower()
+    routes = route_chunks(blocks, rules, (state.get("source") or "").lower(), model_name)
+
+    counts = {t: sum(1 for r in routes.values() if r["tier"] == t) for t in TIERS}
+    summary = ", ".join(f"{t}={n}" for t, n in counts.items() if n)
+    print(f"🧭 Routing Node: {summary or 'no chunks'}"
+          + ("" if rules["enabled"] else " (routing off)"))
+
+    trace = state.get("graph_trace", [])
+    trace.append("route")
+
+    return {
+        **state,
+        "routing_rules": rules,
+        "chunk_routes":  routes,
+        "logs": state.get("logs", []) + [f"Routing: {summary or 'no chunks'}"],
+        "graph_trace": trace,
+    }
@@ -0,0 +1,26 @@
+# backend/agents/template_agent.py
+from typing import Dict
+
+from agents.utils.chunk_templating import group_equivalent
+
+
+def template_node(state: Dict) -> Dict:
+    """Group near-duplicate AST blocks so each class is converted only once."""
+    print("🧬 Template Node: grouping near-duplicate chunks")
+
+    ast_blocks = state.get("ast_blocks", [])
+    plan = group_equivalent(ast_blocks)
+    classes = len({p["rep"] for p in plan.values()})
+    print(f"🧬 Template Node: {len(plan)} of {len(ast_blocks)} chunks reuse {classes} templates.")
+
+    trace = state.get("graph_trace", [])
+    trace.append("template")
+
+    return {
+        **state,
+        "chunk_templates": plan,
+        "logs": state.get("logs", []) + [
+            f"Template: {len(plan)} duplicate chunks in {classes} classes"
+        ],
+        "graph_trace": trace,
+    }
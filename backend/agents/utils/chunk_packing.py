@@ -0,0 +1,81 @@
+# backend/agents/utils/chunk_packing.py
+"""Pack several small chunks into one LLM request and split the answer back.
+
+Every request pays the full system prompt, which for some source/target pairs
+is hundreds of lines.  Tiny chunks (a ``%let``, a 5-line PROC SORT) are
+therefore bin-packed – in source order – up to a token budget and sent
+together, each wrapped in explicit delimiters the model must echo back.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional
+
+BEGIN = "<<<CHUNK {id}>>>"
+END   = "<<<END {id}>>>"
+
+
+def pack_chunks(blocks: List[Dict], count_tokens: Callable[[str], int], *,
+                budget: int, small_limit: int, max_per_batch: int) -> List[List[Dict]]:
+    """Group consecutive small chunks into bins of at most *budget* tokens.
+
+    Chunks above *small_limit* tokens always get a bin of their own, so the
+    result is a list of bins; a bin of length 1 means "convert normally".
+    """
+    bins: List[List[Dict]] = []
+    cur: List[Dict] = []
+    used = 0
+    for blk in blocks:
+        size = count_tokens(blk["code"])
+        if size > small_limit:
+            if cur:
+                bins.append(cur)
+                cur, used = [], 0
+            bins.append([blk])
+            continue
+        if cur and (used + size > budget or len(cur) >= max_per_batch):
+            bins.append(cur)
+            cur, used = [], 0
+        cur.append(blk)
+        used += size
+    if cur:
+        bins.append(cur)
+    return bins
+
+
+def build_batch_message(blocks: List[Dict], source: str, target: str) -> str:
+    """User message carrying several delimited chunks."""
+    src, tgt = source.upper(), target.upper()
+    parts = [
+        # no per-batch values up here – the instructions stay a stable prefix
+        f"Convert each of the following {src} chunks to {tgt} independently.",
+        "Return one section per chunk, in the same order, wrapped exactly as shown:",
+        BEGIN.format(id="<chunk id>"),
+        f"<{tgt} equivalent of that chunk>",
+        END.format(id="<chunk id>"),
+        "Do not merge chunks and do not write anything outside the sections.",
+        "",
+    ]
+    for blk in blocks:
+        parts += [
+            BEGIN.format(id=blk["id"]),
+            f"### {src} code (type={blk.get('type', 'UNKNOWN')}) ###",
+            blk["code"],
+            END.format(id=blk["id"]),
+            "",
+        ]
+    return "\n".join(parts)
+
+
+def split_batch_response(text: str, ids: List[str]) -> Optional[Dict[str, str]]:
+    """Map chunk id → converted code, or ``None`` unless every id came back."""
+    out: Dict[str, str] = {}
+    for cid in ids:
+        m = re.search(
+            re.escape(BEGIN.format(id=cid)) + r"\s*\n?(.*?)" + re.escape(END.format(id=cid)),
+            text, re.S,
+        )
+        if not m or not m.group(1).strip():
+            return None
+        out[cid] = m.group(1).strip()
+    return out
@@ -0,0 +1,129 @@
+# backend/agents/utils/chunk_routing.py
+"""Complexity scoring and model routing of chunks.
+
+Each chunk gets a score from a handful of cheap features
+
+    tokens           source tokens / 100
+    nesting          deepest DO/BEGIN/LOOP/CASE (and PL/SQL IF) block, or the
+                     number of sub-selects for SQL, whichever is larger
+    macro_refs       SAS ``&var`` references and ``%macro()`` calls
+    transformations  Informatica TRANSFORMATIONs / DataStage stages in XML
+
+weighted by ``weights``.  Chunks at or below ``simple_max_score`` go to the
+"simple" tier, chunks at or above ``complex_min_score`` to the "complex"
+tier; everything else – and any tier without a target – stays on the
+credential's own model ("standard").  A tier target overrides fields of the
+job's credential, typically another deployment on the same Azure resource::
+
+    {"enabled": true, "simple_max_score": 3, "complex_min_score": 15,
+     "tiers": {"simple": {"deployment_name": "gpt-4o-mini", "model_name": "gpt-4o-mini"}}}
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional
+
+from agents.utils.model_registry import count_tokens
+
+STANDARD = "standard"
+TIERS = ("simple", STANDARD, "complex")
+TIER_FIELDS = ("deployment_name", "model_name")      # what a tier may override
+
+DEFAULT_WEIGHTS = {"tokens": 1.0, "nesting": 2.0, "macro_refs": 0.5, "transformations": 1.5}
+DEFAULT_RULES = {
+    "enabled": False,
+    "simple_max_score": 3.0,
+    "complex_min_score": 15.0,
+    "weights": DEFAULT_WEIGHTS,
+    "tiers": {},
+}
+
+_WORD       = re.compile(r"%?\w+")
+_OPENERS    = {"do", "%do", "begin", "loop", "case"}
+_AFTER_END  = {"if", "loop", "case"}                 # END IF / END LOOP / END CASE
+_MACRO_REF  = re.compile(r"&\w+|%(?!(?:macro|mend|let|do|end|if|then|else|to|by|local|"
+                         r"global|put|include|eval|sysfunc|str|nrstr|scan|upcase)\b)\w+\s*\(",
+                         re.I)
+_SUBSELECT  = re.compile(r"\(\s*select\b", re.I)
+_TRANSFORMS = re.compile(r"<TRANSFORMATION\b|OLEType\s+\"C\w*Stage\"|<Record\b[^>]*Type=\"\w*Stage",
+                         re.I)
+_PLSQL      = ("oracle", "plsql")
+
+
+def _nesting(code: str, source: str) -> int:
+    openers = _OPENERS | ({"if"} if source in _PLSQL else set())
+    depth = deepest = 0
+    skip_next = False
+    for word in _WORD.findall(code.lower()):
+        if skip_next:
+            skip_next = False
+            if word in _AFTER_END:
+                continue
+        if word in ("end", "%end"):
+            depth = max(0, depth - 1)
+            skip_next = True
+        elif word in openers:
+            depth += 1
+            deepest = max(deepest, depth)
+    return max(deepest, len(_SUBSELECT.findall(code)))
+
+
+def complexity_features(code: str, source: str, model_name: str = "") -> Dict[str, float]:
+    source = (source or "").lower()
+    return {
+        "tokens":          round(count_tokens(model_name, code) / 100, 2),
+        "nesting":         _nesting(code, source),
+        "macro_refs":      len(_MACRO_REF.findall(code)) if source == "sas" else 0,
+        "transformations": len(_TRANSFORMS.findall(code)),
+    }
+
+
+def complexity_score(features: Dict[str, float], weights: Optional[Dict] = None) -> float:
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    return round(sum(features[k] * w.get(k, 0.0) for k in features), 2)
+
+
+def normalize_rules(rules: Optional[Dict]) -> Dict:
+    """Defaults filled in, unknown tiers / fields dropped."""
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    rules["weights"] = {**DEFAULT_WEIGHTS, **(rules.get("weights") or {})}
+    rules["tiers"] = {
+        tier: {k: v for k, v in (cfg or {}).items() if k in TIER_FIELDS and v}
+        for tier, cfg in (rules.get("tiers") or {}).items()
+        if tier in TIERS and tier != STANDARD
+    }
+    rules["tiers"] = {t: cfg for t, cfg in rules["tiers"].items() if cfg}
+    return rules
+
+
+def pick_tier(score: float, rules: Dict) -> str:
+    if score <= rules["simple_max_score"] and "simple" in rules["tiers"]:
+        return "simple"
+    if score >= rules["complex_min_score"] and "complex" in rules["tiers"]:
+        return "complex"
+    return STANDARD
+
+
+def route_chunks(blocks: List[Dict], rules: Dict, source: str,
+                 model_name: str) -> Dict[str, Dict]:
+    """``chunk id → {"tier", "score", "model", "features"}`` for every block."""
+    routes = {}
+    for blk in blocks:
+        feats = complexity_features(blk["code"], source, model_name)
+        score = complexity_score(feats, rules["weights"])
+        tier  = pick_tier(score, rules) if rules["enabled"] else STANDARD
+        model = rules["tiers"].get(tier, {}).get("model_name") or model_name
+        routes[blk["id"]] = {"tier": tier, "score": score, "model": model.lower(),
+                             "features": feats}
+    return routes
+
+
+def routed_cred(cred: Dict, tier_cfg: Dict) -> Dict:
+    """The job credential with a tier's overrides.
+
+    The id is dropped: the client registry binds ids to one client, and the
+    routed deployment must not replace the credential's own client.
+    """
+    routed = {k: v for k, v in cred.items() if k != "id"}
+    routed.update({k: v for k, v in tier_cfg.items() if k in TIER_FIELDS and v})
+    return routed
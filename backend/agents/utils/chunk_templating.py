@@ -0,0 +1,156 @@
+# backend/agents/utils/chunk_templating.py
+"""Near-duplicate chunk detection and re-instantiation.
+
+Chunks are reduced to a canonical form in which user identifiers, string
+literals and numbers are replaced by positional placeholders (keywords stay
+verbatim).  Chunks with the same canonical form are one equivalence class:
+the first chunk is converted by the LLM and its output is re-instantiated for
+the other members by renaming the representative's names to the member's.
+
+Re-instantiation is conservative – whenever the rename cannot be done safely
+``instantiate`` returns ``None`` and the caller converts the chunk normally.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(
+    r"""(?P<str>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      |(?P<num>\b\d+(?:\.\d+)?\b)
+      |(?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+      |(?P<ws>\s+)
+      |(?P<other>.)""",
+    re.X | re.S,
+)
+
+# language keywords stay verbatim in the canonical form
+KEYWORDS = {w.lower() for w in """
+    data set run proc quit by where keep drop rename if then else do end to
+    output retain length format informat label input infile file put merge
+    update modify array and or not in eq ne lt le gt ge like between is null
+    missing first last call symput symputx libname filename options title
+    footnote class var vars tables table model out nodupkey nodup descending
+    noprint nway sum mean min max n nmiss std median freq sort sql means print
+    summary transpose append datasets export import contents tabulate report
+    univariate rank compare copy delete create view select from as on join
+    inner left right full outer cross group order having distinct case when
+    union all except intersect insert into values limit with asc desc count
+    avg coalesce cast substr trim upcase lowcase put input today intnx intck
+    mdy datepart catx cats strip compress scan index
+    macro mend let global local include sysfunc eval str nrstr
+    begin declare procedure function package body return returns loop exit
+    exception raise commit rollback cursor open fetch close type rowtype
+    replace trigger before after for each row varchar varchar2 number integer
+    date timestamp char boolean true false
+""".split()}
+
+# names that commonly appear in generated code – never rename these
+_TARGET_RESERVED = {w.lower() for w in """
+    df spark col lit when otherwise expr alias select filter where join
+    session table self none true false import from def return print
+    f t id
+""".split()}
+
+_MIN_RENAME_LEN = 3
+
+
+def tokenize(code: str) -> List[Tuple[str, str]]:
+    return [(m.lastgroup, m.group()) for m in _TOKEN_RE.finditer(code)]
+
+
+def canonicalize(code: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Return ``(canonical_form, slots)``; slots are the distinct (kind, value)
+    pairs in order of first appearance."""
+    out, slots, index = [], [], {}
+    prev_word = ""
+    for kind, val in tokenize(code):
+        if kind == "ws":
+            out.append(" ")
+            continue
+        if kind == "ident":
+            low = val.lower()
+            # the word after PROC (SORT, MEANS, ...) is always structural
+            if low in KEYWORDS or prev_word == "proc":
+                out.append(low)
+                prev_word = low
+                continue
+            prev_word = low
+            slot, key = ("ident", val), ("ident", low)
+        elif kind in ("str", "num"):
+            slot = key = (kind, val)
+            prev_word = ""
+        else:
+            out.append(val)
+            continue
+        if key not in index:
+            index[key] = len(slots)
+            slots.append(slot)
+        out.append(f"\x00{kind[0]}{index[key]}\x00")
+    return re.sub(r" +", " ", "".join(out)).strip(), slots
+
+
+def group_equivalent(blocks: List[Dict]) -> Dict[str, Dict]:
+    """Map each duplicate member id to ``{"rep": rep_id, "rep_slots", "slots"}``.
+
+    Representatives (first chunk of each class) and singletons are not in the
+    result, so ``id not in plan`` means "convert with the LLM".
+    """
+    reps: Dict[str, Tuple[str, List]] = {}
+    plan: Dict[str, Dict] = {}
+    for blk in blocks:
+        canon, slots = canonicalize(blk["code"])
+        if not slots:                       # nothing to rename – exact dupes are the cache's job
+            continue
+        if canon not in reps:
+            reps[canon] = (blk["id"], slots)
+            continue
+        rep_id, rep_slots = reps[canon]
+        plan[blk["id"]] = {"rep": rep_id, "rep_slots": rep_slots, "slots": slots}
+    return plan
+
+
+def _text(kind: str, value: str) -> str:
+    return value[1:-1] if kind == "str" else value
+
+
+def _pattern(text: str) -> str:
+    # names may be embedded in derived names (df_sales, sales_sorted)
+    return rf"(?<![A-Za-z0-9]){re.escape(text)}(?![A-Za-z0-9])"
+
+
+def instantiate(rep_output: str, rep_code: str,
+                rep_slots: List[Tuple[str, str]],
+                slots: List[Tuple[str, str]]) -> Optional[str]:
+    """Rewrite the representative's output for a member, or ``None`` if unsafe."""
+    if len(rep_slots) != len(slots):
+        return None
+    same = lambda k, a, b: a.lower() == b.lower() if k == "ident" else a == b
+    renames = [(r, m) for r, m in zip(rep_slots, slots) if not same(r[0], r[1], m[1])]
+    if not renames:
+        return rep_output
+
+    # longest names first so "sales" never pre-empts "sales_2020" in the alternation
+    renames.sort(key=lambda rm: len(rm[0][1]), reverse=True)
+    parts, repl = [], {}
+    for (kind, old), (_, new) in renames:
+        old_txt, new_txt = _text(kind, old), _text(kind, new)
+        if kind != "num" and len(old_txt) < _MIN_RENAME_LEN:
+            return None
+        if kind == "ident" and old_txt.lower() in _TARGET_RESERVED:
+            return None
+        pat = _pattern(old_txt)
+        if kind == "ident":                 # SAS/SQL names are case-insensitive
+            pat = f"(?i:{pat})"
+        found = len(re.findall(pat, rep_output))
+        if not found:
+            return None                     # name not traceable in the output
+        if kind == "num" and found != len(re.findall(pat, rep_code)):
+            return None                     # number also used for something else
+        name = f"g{len(parts)}"
+        parts.append(f"(?P<{name}>{pat})")
+        repl[name] = new_txt
+
+    # one pass, so a rename can never be renamed again (a→b, b→a)
+    rx = re.compile("|".join(parts))
+    return rx.sub(lambda m: repl[m.lastgroup], rep_output)
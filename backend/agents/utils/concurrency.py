@@ -0,0 +1,59 @@
+# backend/agents/utils/concurrency.py
+"""Bounded fan-out for per-chunk LLM calls.
+
+Graph nodes are synchronous (LangGraph runs them in a worker thread), so the
+fan-out uses a thread pool.  Two limits apply to every call:
+
+* a per-job limit – the size of the pool ``bounded_map`` creates for that job;
+* a per-credential limit – a process-wide semaphore shared by every job that
+  talks to the same deployment, so parallel jobs cannot multiply the load.
+  It is taken around each LLM call (``credential_slot``) with the key of the
+  credential that call goes to – a model tier or a pool member, not
+  necessarily the job's own credential.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_CRED_SEMAPHORES: Dict[str, threading.BoundedSemaphore] = {}
+_CRED_LOCK = threading.Lock()
+
+
+def credential_key(cred: Dict) -> str:
+    """Stable key for a credential dict – its DB id when known, else a fingerprint."""
+    if cred.get("id") is not None:
+        return f"id:{cred['id']}"
+    raw = "|".join(f"{k}={cred.get(k) or ''}" for k in sorted(cred))
+    return "fp:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def credential_semaphore(key: str, limit: int) -> threading.BoundedSemaphore:
+    with _CRED_LOCK:
+        sem = _CRED_SEMAPHORES.get(key)
+        if sem is None:
+            sem = _CRED_SEMAPHORES[key] = threading.BoundedSemaphore(max(1, limit))
+        return sem
+
+
+def credential_slot(key: Optional[str], limit: int) -> ContextManager:
+    """Hold one of *key*'s ``limit`` slots for the duration of a call (no-op
+    without a key)."""
+    return credential_semaphore(key, limit) if key else nullcontext()
+
+
+def bounded_map(fn: Callable[[T], R], items: Sequence[T], *, max_workers: int) -> List[R]:
+    """Apply *fn* to every item concurrently; results keep the input order."""
+    if not items:
+        return []
+    workers = max(1, min(max_workers, len(items)))
+    if workers == 1:
+        return [fn(it) for it in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-chunk") as pool:
+        return list(pool.map(fn, items))
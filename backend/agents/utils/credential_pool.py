@@ -0,0 +1,124 @@
+# backend/agents/utils/credential_pool.py
+"""Spreading chunk calls over several credentials, with circuit breakers.
+
+A job may name a pool of credentials (``state["llm_pool"]``, the job's own
+credential first).  Health is tracked process-wide per credential key, like
+the rate limiters, so every job sees the same picture:
+
+* ``slowness`` – EWMA of observed latency / ``hedging.prior_latency`` (1.0 =
+  as expected for the chunk size);
+* ``error_rate`` – EWMA of failed calls (after the limiter's own retries);
+* a circuit breaker – ``LLM_BREAKER_FAILURES`` consecutive failures open it
+  for ``LLM_BREAKER_COOLDOWN_SEC``; afterwards one probe call is let through
+  (half-open) and its outcome closes or re-opens the breaker.
+
+``pick`` draws a member at random, weighted by ``(1 - error_rate) / slowness``,
+among members whose breaker admits a call; when every breaker is open the one
+that reopens first is used, so a job never stalls on its pool.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from config import settings
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_ALPHA = 0.2                    # EWMA weight of the newest observation
+_LOCK = threading.Lock()
+_HEALTH: Dict[str, "_Health"] = {}
+
+
+class _Health:
+    def __init__(self, key: str):
+        self.key        = key
+        self.slowness   = 1.0
+        self.error_rate = 0.0
+        self.failures   = 0          # consecutive
+        self.state      = CLOSED
+        self.opened_at  = 0.0
+        self.probing    = False
+        self.calls = self.errors = self.trips = 0
+
+    def admits(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= settings.LLM_BREAKER_COOLDOWN_SEC:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.probing
+
+    def weight(self) -> float:
+        return max(0.01, 1.0 - self.error_rate) / max(0.05, self.slowness)
+
+
+def pick(keys: Sequence[str], exclude: Sequence[str] = ()) -> Optional[str]:
+    """Credential key for the next call, ``None`` when *keys* − *exclude* is empty."""
+    candidates = [k for k in keys if k not in exclude]
+    if not candidates:
+        return None
+    now = time.monotonic()
+    with _LOCK:
+        health = [_HEALTH.setdefault(k, _Health(k)) for k in candidates]
+        usable = [h for h in health if h.admits(now)]
+        if not usable:
+            chosen = min(health, key=lambda h: h.opened_at)
+        else:
+            chosen = random.choices(usable, weights=[h.weight() for h in usable])[0]
+        if chosen.state == HALF_OPEN:
+            chosen.probing = True
+        return chosen.key
+
+
+def record(key: str, ok: bool, slowness: Optional[float] = None) -> None:
+    """Outcome of one call on *key*; *slowness* is latency / expected latency."""
+    with _LOCK:
+        h = _HEALTH.setdefault(key, _Health(key))
+        h.calls += 1
+        h.probing = False
+        h.error_rate = (1 - _ALPHA) * h.error_rate + _ALPHA * (0.0 if ok else 1.0)
+        if ok:
+            h.failures = 0
+            h.state = CLOSED
+            if slowness is not None:
+                h.slowness = (1 - _ALPHA) * h.slowness + _ALPHA * slowness
+            return
+        h.errors += 1
+        h.failures += 1
+        if h.state == HALF_OPEN or h.failures >= settings.LLM_BREAKER_FAILURES:
+            if h.state != OPEN:
+                h.trips += 1
+                print(f"🔌  {key}: circuit open for {settings.LLM_BREAKER_COOLDOWN_SEC:.0f}s "
+                      f"after {h.failures} failures")
+            h.state = OPEN
+            h.opened_at = time.monotonic()
+
+
+def release(key: str) -> None:
+    """A picked member that made no call (cache hit) frees its half-open probe."""
+    with _LOCK:
+        h = _HEALTH.get(key)
+        if h is not None:
+            h.probing = False
+
+
+def breaker_snapshots(keys=None) -> Dict[str, Dict]:
+    now = time.monotonic()
+    with _LOCK:
+        return {k: {"state": h.state,
+                    "reopens_in_sec": (round(max(0.0, settings.LLM_BREAKER_COOLDOWN_SEC
+                                                  - (now - h.opened_at)), 1)
+                                       if h.state == OPEN else 0.0),
+                    "slowness": round(h.slowness, 2),
+                    "error_rate": round(h.error_rate, 3),
+                    "weight": round(h.weight(), 3),
+                    "calls": h.calls, "errors": h.errors, "trips": h.trips}
+                for k, h in _HEALTH.items() if keys is None or k in keys}
+
+
+def pool_members(state: Dict) -> List[Dict]:
+    """``[{"provider", "cred"}]`` of a job – its pool, or just its own credential."""
+    pool = [m for m in (state.get("llm_pool") or []) if m.get("cred")]
+    return pool or [{"provider": state["llm_provider"], "cred": state["llm_cred"]}]
@@ -0,0 +1,341 @@
+# backend/agents/utils/datastage_parser.py
+"""DataStage export parser (DSX text and XML) with stage-level chunking.
+
+Both export formats come down to the same shape: jobs made of records
+(stages, link pins, the job root) carrying properties and collections of
+sub-records (columns, stage properties, parameters).  ``iter_jobs`` reads
+either format job by job – the XML form with ``iterparse`` so a project
+export is never held as a tree – and ``process_datastage_string`` turns every
+job into chunks:
+
+* stages are linked by their output pins' ``Partner``; each weakly connected
+  part of a job is an independent flow and gets its own chunk(s), so
+  branches convert in parallel;
+* a flow larger than ``max_tokens`` is cut into stage groups in link
+  topological order; a link crossing a cut is rendered on both sides with
+  its columns, so each group knows its interface.
+
+A chunk is compact text: stages with their type, logic-bearing properties
+(SQL, keys, join type, constraints, stage variables), output links with
+column types and derivations.  Anything that is neither a DSX nor a
+DataStage XML export goes through as one raw chunk.
+"""
+from __future__ import annotations
+
+import io
+import re
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional
+
+from agents.utils.general_informatica_datastage_chunker import process_info_string
+
+# ODBC SqlType codes used by DataStage column definitions
+SQL_TYPES = {
+    "1": "char", "12": "varchar", "-1": "longvarchar", "-8": "nchar", "-9": "nvarchar",
+    "4": "integer", "5": "smallint", "-6": "tinyint", "-5": "bigint", "-7": "bit",
+    "2": "numeric", "3": "decimal", "6": "float", "7": "real", "8": "double",
+    "9": "date", "10": "time", "11": "timestamp", "91": "date", "92": "time",
+    "93": "timestamp", "-2": "binary", "-3": "varbinary",
+}
+JOB_TYPES   = {"0": "server", "1": "mainframe", "2": "sequence", "3": "parallel"}
+PARAM_TYPES = {"0": "string", "1": "encrypted", "2": "integer", "3": "float",
+               "4": "pathname", "5": "list", "6": "date", "7": "time"}
+
+# stage-level properties that carry logic; stage "Properties" sub-records
+# are all kept (they are the stage's settings) except layout noise
+STAGE_PROPS = ("Constraint", "Reject", "RejectLink", "SelectStatement", "TableName")
+NOISE_COLLS = {"Properties", "Columns", "MetaBag"}
+NOISE_PROPS = {"XMLProperties", "Description", "ShortDesc", "FullDescription",
+               "StageXPos", "StageYPos", "StageXSize", "StageYSize"}
+_XML_PROP = re.compile(
+    r"<(SelectStatement|InsertStatement|UpdateStatement|DeleteStatement|UserDefinedSQL|"
+    r"TableName|WriteMode|TableAction|BeforeSQL|AfterSQL|FileName)\b[^>]*>"
+    r"(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</\1>", re.S)
+
+HEADER = ("# DataStage job IR – compact form of the DSX/XML export, stages in link order.\n"
+          "# columns: NAME type [key] [= derivation]; an IN link marked 'from another group' "
+          "is the dataset produced by another chunk of the same job")
+
+
+# ───────────────────── readers ──────────────────────────────────
+def _record(rid: str, rtype: str) -> Dict:
+    return {"id": rid, "type": rtype, "props": {}, "colls": defaultdict(list)}
+
+
+_DSX_LINE  = re.compile(r'^\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*$')
+_DSX_MULTI = re.compile(r"^\s*(\w+)\s+=\+=\+=\+=(.*)$")
+_DSX_END   = "=+=+=+="
+
+
+def _dsx_value(raw: str) -> str:
+    return re.sub(r"\\(.)", r"\1", raw)
+
+
+def _iter_dsx(src: str) -> Iterator[Dict]:
+    job, rec, sub, coll = None, None, None, None
+    lines = iter(src.splitlines())
+    for line in lines:
+        s = line.strip()
+        if s == "BEGIN DSJOB":
+            job = {"name": "", "records": []}
+        elif s == "END DSJOB" and job is not None:
+            yield job
+            job = None
+        elif job is None:
+            continue
+        elif s == "BEGIN DSRECORD":
+            rec, coll = _record("", ""), None
+        elif s == "END DSRECORD" and rec is not None:
+            rec["id"], rec["type"] = rec["props"].get("Identifier", ""), rec["props"].get("OLEType", "")
+            job["records"].append(rec)
+            rec = None
+        elif s == "BEGIN DSSUBRECORD":
+            sub = {}
+        elif s == "END DSSUBRECORD" and sub is not None and rec is not None:
+            rec["colls"][coll or "Properties"].append(sub)
+            sub = None
+        else:
+            m = _DSX_LINE.match(line)
+            if m:
+                key, value = m.group(1), _dsx_value(m.group(2))
+            else:
+                m = _DSX_MULTI.match(line)
+                if not m:
+                    continue
+                key, buf = m.group(1), [m.group(2)]
+                while _DSX_END not in buf[-1]:
+                    nxt = next(lines, None)
+                    if nxt is None:
+                        break
+                    buf.append(nxt)
+                value = "\n".join(buf).split(_DSX_END)[0].strip("\n")
+            if sub is not None:
+                sub[key] = value
+            elif rec is not None:
+                rec["props"][key] = value
+                coll = key                  # sub-records follow their collection's header
+            elif key == "Identifier" and not job["name"]:
+                job["name"] = value
+
+
+def _iter_xml(src: str) -> Iterator[Dict]:
+    path: List[ET.Element] = []
+    for event, el in ET.iterparse(io.BytesIO(src.encode("utf-8")), events=("start", "end")):
+        if event == "start":
+            path.append(el)
+            continue
+        path.pop()
+        if el.tag != "Job":
+            continue
+        job = {"name": el.get("Identifier") or "", "records": []}
+        for r in el.iter("Record"):
+            rec = _record(r.get("Identifier") or "", r.get("Type") or "")
+            for child in r:
+                if child.tag == "Property":
+                    rec["props"][child.get("Name")] = (child.text or "").strip()
+                elif child.tag == "Collection":
+                    for sr in child.findall("SubRecord"):
+                        rec["colls"][child.get("Name")].append(
+                            {p.get("Name"): (p.text or "").strip()
+                             for p in sr.findall("Property")})
+            job["records"].append(rec)
+        yield job
+        el.clear()
+        if path:
+            path[-1].remove(el)
+
+
+def iter_jobs(src: str) -> Iterator[Dict]:
+    """``{"name", "records"}`` per job, ``ValueError`` when *src* is no export."""
+    head = src.lstrip()[:4096]
+    if "BEGIN DSJOB" in src and (head.startswith("BEGIN HEADER") or head.startswith("BEGIN DSJOB")):
+        return _iter_dsx(src)
+    if head.startswith("<") and "<DSExport" in head:
+        return _iter_xml(src)
+    raise ValueError("not a DataStage DSX or XML export")
+
+
+# ───────────────────── job model ────────────────────────────────
+def _pins(value: str) -> List[str]:
+    return [p for p in (value or "").split("|") if p]
+
+
+def _job_graph(job: Dict):
+    """``(root, stages, links)``; links: ``{"name", "src", "dst", "pin"}``."""
+    by_id  = {r["id"]: r for r in job["records"]}
+    root   = next((r for r in job["records"] if r["id"] == "ROOT"), None)
+    stages = [r for r in job["records"]
+              if "InputPins" in r["props"] or "OutputPins" in r["props"]
+              or (r["type"].endswith("Stage") and r["id"] != "ROOT")]
+    links, seen = [], set()
+    for st in stages:
+        for pin_id in _pins(st["props"].get("OutputPins")):
+            pin = by_id.get(pin_id)
+            dst = (pin or {}).get("props", {}).get("Partner", "").split("|")[0]
+            if pin and dst in by_id and (st["id"], dst, pin_id) not in seen:
+                seen.add((st["id"], dst, pin_id))
+                links.append({"name": pin["props"].get("Name", pin_id),
+                              "src": st["id"], "dst": dst, "pin": pin})
+        for pin_id in _pins(st["props"].get("InputPins")):
+            partner = (by_id.get(pin_id) or {}).get("props", {}).get("Partner", "")
+            src_id, _, src_pin = partner.partition("|")
+            if src_id in by_id and (src_id, st["id"], src_pin) not in seen and src_pin:
+                seen.add((src_id, st["id"], src_pin))
+                pin = by_id.get(src_pin) or by_id[pin_id]
+                links.append({"name": pin["props"].get("Name", src_pin),
+                              "src": src_id, "dst": st["id"], "pin": pin})
+    return root, stages, links
+
+
+def _flows(stages: List[Dict], links: List[Dict]) -> List[List[str]]:
+    """Weakly connected parts, each in link topological order (ties: export order)."""
+    ids  = [s["id"] for s in stages]
+    root = {i: i for i in ids}
+    def find(n):
+        while root[n] != n:
+            root[n] = root[root[n]]
+            n = root[n]
+        return n
+    for ln in links:
+        if ln["src"] in root and ln["dst"] in root:
+            root[find(ln["src"])] = find(ln["dst"])
+    parts: Dict[str, List[str]] = defaultdict(list)
+    for i in ids:
+        parts[find(i)].append(i)
+
+    rank = {i: n for n, i in enumerate(ids)}
+    out = []
+    for members in parts.values():
+        indeg = {i: 0 for i in members}
+        succ: Dict[str, List[str]] = defaultdict(list)
+        for ln in links:
+            if ln["src"] in indeg and ln["dst"] in indeg and ln["src"] != ln["dst"]:
+                succ[ln["src"]].append(ln["dst"])
+                indeg[ln["dst"]] += 1
+        ready, order = sorted((i for i in members if indeg[i] == 0), key=rank.get), []
+        while ready:
+            n = ready.pop(0)
+            order.append(n)
+            for s in succ[n]:
+                indeg[s] -= 1
+                if indeg[s] == 0:
+                    ready.append(s)
+            ready.sort(key=rank.get)
+        out.append(order + [i for i in members if i not in order])    # cycles
+    return out
+
+
+# ───────────────────── rendering ────────────────────────────────
+def _one_line(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def _column(c: Dict) -> str:
+    name = c.get("Name", "")
+    kind = SQL_TYPES.get(c.get("SqlType", ""), c.get("SqlType", "").lower())
+    if c.get("Precision") not in (None, "", "0"):
+        kind += f"({c['Precision']}" + (f",{c['Scale']})" if c.get("Scale") not in (None, "", "0") else ")")
+    line = " ".join(p for p in (name, kind) if p)
+    if c.get("KeyPosition") not in (None, "", "0"):
+        line += " key"
+    deriv = _one_line(c.get("Derivation") or c.get("Expression") or "")
+    if deriv and not re.fullmatch(rf"\w+\.{re.escape(name)}", deriv):
+        line += f" = {deriv}"
+    return line
+
+
+def _stage_lines(st: Dict, names: Dict[str, str], links: List[Dict],
+                 group: set) -> List[str]:
+    kind = st["props"].get("StageType") or st["type"]
+    out  = [f"STAGE {names[st['id']]} : {kind}"]
+    out += [f"  {p}: {_one_line(st['props'][p])}" for p in STAGE_PROPS
+            if _one_line(st["props"].get(p, ""))]
+    for sub in st["colls"].get("Properties", []):
+        if sub.get("Name") == "XMLProperties":
+            out += [f"  {tag}: {_one_line(val)}" for tag, val in _XML_PROP.findall(sub.get("Value", ""))
+                    if _one_line(val)]
+        elif sub.get("Name") not in NOISE_PROPS and _one_line(sub.get("Value", "")):
+            out.append(f"  {sub['Name']}: {_one_line(sub['Value'])}")
+    for coll, subs in st["colls"].items():
+        if coll in NOISE_COLLS or not subs:
+            continue
+        out.append(f"  {coll}:")
+        out += [f"    {_column(s)}" for s in subs]
+    for ln in links:
+        if ln["dst"] == st["id"]:
+            outside = ln["src"] not in group
+            out.append(f"  IN {ln['name']} <- {names.get(ln['src'], ln['src'])}"
+                       + (" (from another group)" if outside else ""))
+            if outside:
+                out += [f"    {_column(c)}" for c in ln["pin"]["colls"].get("Columns", [])]
+    for ln in links:
+        if ln["src"] == st["id"]:
+            constraint = _one_line(ln["pin"]["props"].get("Constraint", ""))
+            out.append(f"  OUT {ln['name']} -> {names.get(ln['dst'], ln['dst'])}"
+                       + (f" (constraint: {constraint})" if constraint else ""))
+            out += [f"    {_column(c)}" for c in ln["pin"]["colls"].get("Columns", [])]
+    return out
+
+
+def _job_head(job: Dict, root: Optional[Dict], idx: int, total: int) -> List[str]:
+    jtype = JOB_TYPES.get((root or {}).get("props", {}).get("JobType", ""), "")
+    label = ", ".join(p for p in (jtype, f"group {idx}/{total}") if p)
+    out   = [HEADER, f"JOB {job['name']} ({label})"]
+    params = (root or {}).get("colls", {}).get("Parameters", [])
+    if params:
+        out.append("PARAMETERS")
+        for p in params:
+            default = _one_line(p.get("Default", ""))
+            ptype = PARAM_TYPES.get(p.get("ParamType", ""), p.get("ParamType", ""))
+            out.append(f"  {p.get('Name')}" + (f" {ptype}" if ptype else "")
+                       + (f" = {default}" if default else ""))
+    return out
+
+
+def job_chunks(job: Dict, max_tokens: Optional[int] = None,
+               count: Callable[[str], int] = lambda t: len(t) // 4) -> List[str]:
+    """Chunk texts of one job: one per flow, flows above *max_tokens* cut
+    into stage groups in link order."""
+    root, stages, links = _job_graph(job)
+    if not stages:
+        return []
+    by_id = {s["id"]: s for s in stages}
+    names = {s["id"]: s["props"].get("Name", s["id"]) for s in stages}
+
+    groups: List[List[str]] = []
+    for flow in _flows(stages, links):
+        if max_tokens is None:
+            groups.append(flow)
+            continue
+        current, used = [], 0
+        for sid in flow:
+            size = count("\n".join(_stage_lines(by_id[sid], names, links, set())))
+            if current and used + size > max_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(sid)
+            used += size
+        groups.append(current)
+
+    out = []
+    for idx, group in enumerate(groups, 1):
+        members = set(group)
+        lines = _job_head(job, root, idx, len(groups))
+        for sid in group:
+            lines += _stage_lines(by_id[sid], names, links, members)
+        out.append("\n".join(lines))
+    return out
+
+
+def process_datastage_string(src: str, max_tokens: Optional[int] = None,
+                             count: Callable[[str], int] = lambda t: len(t) // 4) -> List[Dict]:
+    """Stage-group chunks for every job of the export; raw fallback otherwise."""
+    try:
+        texts = [t for job in iter_jobs(src) for t in job_chunks(job, max_tokens, count)]
+    except (ValueError, ET.ParseError) as exc:
+        print(f"⚠️  DataStage parser: {exc} – sending raw export")
+        return process_info_string(src)
+    if not texts:
+        return process_info_string(src)
+    return [{"id": f"blk_{n:03d}", "code": t} for n, t in enumerate(texts, 1)]
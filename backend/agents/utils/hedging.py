@@ -0,0 +1,210 @@
+# backend/agents/utils/hedging.py
+"""Hedged LLM requests and per-chunk deadlines, against tail latency.
+
+A call expects ``out_tokens`` of completion.  Its p95 latency is the prior
+
+    LLM_EXPECTED_BASE_SEC + out_tokens / LLM_EXPECTED_TOKENS_PER_SEC
+
+scaled by the 95th percentile of *observed / prior* over the last calls on
+the same credential key (once ``LLM_HEDGE_MIN_SAMPLES`` are in), so slow
+deployments and big chunks get proportionally more time.
+
+``hedged_call`` runs the primary attempt in a worker thread.  If it is still
+running at the p95 mark, a duplicate goes to the backup (a second credential,
+never the primary's own); the first good answer wins and the other attempt is
+cancelled – streamed attempts stop reading at the next fragment, blocking
+ones are left to finish and ignored.  Tokens the loser burned are counted as
+wasted.  Past ``LLM_CHUNK_DEADLINE_FACTOR`` × p95 (at least
+``LLM_CHUNK_DEADLINE_MIN_SEC``) every attempt is cancelled and
+``ChunkDeadlineExceeded`` raised.
+
+Both are opt-in: hedging needs ``LLM_HEDGE_ENABLED`` and a backup, deadlines
+a non-zero ``LLM_CHUNK_DEADLINE_FACTOR``.  Hedges are capped at
+``LLM_HEDGE_MAX_RATE`` of recent calls per key, so a uniformly slow provider
+is not hit with twice the load.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from config import settings
+
+R = TypeVar("R")
+
+_WINDOW = 200
+_POOL = ThreadPoolExecutor(max_workers=256, thread_name_prefix="llm-hedge")
+_LOCK = threading.Lock()
+_KEYS: Dict[str, "_KeyStats"] = {}
+_JOBS: Dict[Optional[str], Dict] = {}
+
+_COUNTERS = ("calls", "hedged", "backup_wins", "deadline_exceeded",
+             "wasted_input", "wasted_output")
+
+
+class CallCancelled(Exception):
+    """Raised inside an attempt that lost the race (or hit the deadline)."""
+
+    def __init__(self, partial: str = ""):
+        super().__init__("LLM call cancelled")
+        self.partial = partial
+
+
+class ChunkDeadlineExceeded(Exception):
+    pass
+
+
+class _KeyStats:
+    def __init__(self):
+        self.ratios = deque(maxlen=_WINDOW)     # observed / prior latency
+        self.hedges = deque(maxlen=_WINDOW)     # 1 if the call was hedged
+        self.counts = dict.fromkeys(_COUNTERS, 0)
+
+    def ratio_p95(self) -> float:
+        ordered = sorted(self.ratios)
+        if len(ordered) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return 1.0
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_rate(self) -> float:
+        return sum(self.hedges) / len(self.hedges) if self.hedges else 0.0
+
+
+def _key_stats(key: str) -> _KeyStats:
+    with _LOCK:
+        return _KEYS.setdefault(key, _KeyStats())
+
+def _count(key: str, job_id: Optional[str], **deltas) -> None:
+    with _LOCK:
+        ks  = _KEYS.setdefault(key, _KeyStats())
+        # a loser finishing after the job was reported only counts per key
+        job = (_JOBS.setdefault(job_id, dict.fromkeys(_COUNTERS, 0)) if "calls" in deltas
+               else _JOBS.get(job_id, {}))
+        for k, v in deltas.items():
+            ks.counts[k] += v
+            if k in job:
+                job[k] += v
+
+
+def prior_latency(out_tokens: int) -> float:
+    return settings.LLM_EXPECTED_BASE_SEC + out_tokens / max(1.0, settings.LLM_EXPECTED_TOKENS_PER_SEC)
+
+def expected_p95(key: str, out_tokens: int) -> float:
+    ks = _key_stats(key)
+    with _LOCK:
+        ratio = ks.ratio_p95()
+    return prior_latency(out_tokens) * ratio
+
+def chunk_deadline(key: str, out_tokens: int) -> Optional[float]:
+    """Seconds a chunk may take on *key*, ``None`` when deadlines are off."""
+    if settings.LLM_CHUNK_DEADLINE_FACTOR <= 0:
+        return None
+    return max(settings.LLM_CHUNK_DEADLINE_MIN_SEC,
+               settings.LLM_CHUNK_DEADLINE_FACTOR * expected_p95(key, out_tokens))
+
+
+def hedged_call(primary: Callable[[threading.Event], R],
+                backup: Optional[Callable[[threading.Event], R]], *,
+                key: str, out_tokens: int, in_tokens: int = 0,
+                job_id: Optional[str] = None, failover: bool = False,
+                used_tokens: Callable[[R], Optional[Tuple[int, int]]] = lambda r: None) -> R:
+    """Run *primary*, hedge with *backup* past the p95 mark, enforce the deadline.
+
+    Both callables get a ``threading.Event`` that is set once their result is
+    no longer wanted.  *used_tokens* maps a result to ``(input, output)``.
+    With *failover* a primary that fails outright is retried on the backup.
+    """
+    ks       = _key_stats(key)
+    p95      = expected_p95(key, out_tokens)
+    deadline = chunk_deadline(key, out_tokens)
+    with _LOCK:
+        budget_left = ks.hedge_rate() < settings.LLM_HEDGE_MAX_RATE
+    hedge_at = p95 if (backup is not None and settings.LLM_HEDGE_ENABLED
+                       and budget_left) else None
+
+    def wasted(fut) -> None:
+        """Charge whatever a cancelled / losing attempt spent."""
+        exc = fut.exception()
+        if exc is None:
+            tok = used_tokens(fut.result()) or (in_tokens, out_tokens)
+        elif isinstance(exc, CallCancelled):
+            tok = (in_tokens, len(exc.partial) // 4)
+        else:
+            return
+        _count(key, job_id, wasted_input=tok[0], wasted_output=tok[1])
+
+    cancel  = [threading.Event(), threading.Event()]
+    running = {_POOL.submit(primary, cancel[0]): 0}
+    started = time.monotonic()
+    hedged  = False
+    error: Optional[BaseException] = None
+    winner  = None
+    _count(key, job_id, calls=1)
+    try:
+        while winner is None:
+            elapsed = time.monotonic() - started
+            waits = [t - elapsed for t in (deadline, None if hedged else hedge_at)
+                     if t is not None]
+            done, _ = wait(running, timeout=max(0.0, min(waits)) if waits else None,
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = running.pop(fut)
+                if fut.exception() is None:
+                    winner = (idx, fut.result())
+                    break
+                error = fut.exception()
+            if winner is not None:
+                break
+
+            elapsed = time.monotonic() - started
+            # a failed primary (retries already spent) may fail over to the backup
+            if not hedged and backup is not None and (
+                    (failover and not running)
+                    or (running and hedge_at is not None and elapsed >= hedge_at)):
+                hedged = True
+                running[_POOL.submit(backup, cancel[1])] = 1
+                _count(key, job_id, hedged=1)
+                print(f"🪁  {key}: hedging after {elapsed:.1f}s (p95 ≈ {p95:.1f}s)")
+                continue
+            if not running:
+                raise error
+            if deadline is not None and elapsed >= deadline:
+                _count(key, job_id, deadline_exceeded=1)
+                raise ChunkDeadlineExceeded(
+                    f"no LLM answer within {deadline:.0f}s (p95 ≈ {p95:.1f}s)")
+    finally:
+        for ev in cancel:
+            ev.set()
+        for fut in running:             # losers report their spend when they stop
+            fut.add_done_callback(wasted)
+        with _LOCK:
+            ks.hedges.append(1 if hedged else 0)
+
+    idx, result = winner
+    if idx == 1:
+        _count(key, job_id, backup_wins=1)
+    with _LOCK:
+        ks.ratios.append((time.monotonic() - started) / prior_latency(out_tokens))
+    return result
+
+
+def take_job_stats(job_id: Optional[str]) -> Dict:
+    """Hedging counters of one job (reset on read) plus the derived rates."""
+    with _LOCK:
+        stats = _JOBS.pop(job_id, None) or dict.fromkeys(_COUNTERS, 0)
+    calls = stats["calls"]
+    return {**stats,
+            "hedge_rate": round(stats["hedged"] / calls, 4) if calls else 0.0,
+            "wasted_tokens": stats["wasted_input"] + stats["wasted_output"]}
+
+def hedge_snapshots(keys=None) -> Dict[str, Dict]:
+    with _LOCK:
+        items = [(k, v) for k, v in _KEYS.items() if keys is None or k in keys]
+        return {k: {**v.counts,
+                    "recent_hedge_rate": round(v.hedge_rate(), 4),
+                    "latency_ratio_p95": round(v.ratio_p95(), 2),
+                    "samples": len(v.ratios)}
+                for k, v in items}
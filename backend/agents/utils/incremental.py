@@ -0,0 +1,66 @@
+# backend/agents/utils/incremental.py
+"""Incremental reconversion: which chunks of a new upload a prior job covers.
+
+Chunks are compared by a content hash that ignores trailing whitespace and
+blank-line padding, so re-saving a file in another editor does not count as
+a change.  The two hash sequences are aligned with ``difflib`` to report the
+edit as ``unchanged`` / ``changed`` / ``added`` / ``removed`` chunks; any
+new chunk whose hash the prior job converted – aligned or moved – reuses the
+prior output, everything else is reconverted.
+
+Only outputs that passed validation are reused (``validated``, or a feedback
+``fixed`` chunk, whose repaired code wins).
+"""
+from __future__ import annotations
+
+import difflib
+import hashlib
+from typing import Dict, List, Tuple
+
+REUSABLE_STAGES = ("validated", "fixed")
+
+
+def chunk_hash(code: str) -> str:
+    lines = [ln.rstrip() for ln in (code or "").strip("\n").splitlines()]
+    return hashlib.sha256("\n".join(lines).strip().encode("utf-8")).hexdigest()
+
+
+def reusable_output(chunk: Dict) -> str | None:
+    """Validated output of a checkpointed chunk, ``None`` if it has none."""
+    if not chunk.get("ok") or chunk.get("stage") not in REUSABLE_STAGES:
+        return None
+    if chunk["stage"] == "fixed" and chunk.get("fixed_code"):
+        return chunk["fixed_code"]
+    return chunk.get("code")
+
+
+def plan_reuse(prior_blocks: List[Dict], prior_chunks: Dict[str, Dict],
+               new_blocks: List[Dict]) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+    """``(reuse, diff)``: new chunk id → ``{"code", "from", "tokens"}`` and
+    the chunk-level diff counts."""
+    outputs: Dict[str, Dict] = {}
+    for blk in prior_blocks:
+        cp = prior_chunks.get(blk["id"])
+        code = reusable_output(cp) if cp else None
+        if code is not None:
+            outputs.setdefault(chunk_hash(blk["code"]), {
+                "code": code, "from": blk["id"],
+                "tokens": (cp.get("input_tokens") or 0) + (cp.get("output_tokens") or 0)})
+
+    old = [chunk_hash(b["code"]) for b in prior_blocks]
+    new = [chunk_hash(b["code"]) for b in new_blocks]
+    diff = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if op == "equal":
+            diff["unchanged"] += i2 - i1
+        elif op == "replace":
+            diff["changed"] += min(i2 - i1, j2 - j1)
+            diff["added"]   += max(0, (j2 - j1) - (i2 - i1))
+            diff["removed"] += max(0, (i2 - i1) - (j2 - j1))
+        elif op == "insert":
+            diff["added"] += j2 - j1
+        else:
+            diff["removed"] += i2 - i1
+
+    reuse = {blk["id"]: outputs[h] for blk, h in zip(new_blocks, new) if h in outputs}
+    return reuse, diff
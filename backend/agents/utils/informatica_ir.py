@@ -0,0 +1,303 @@
+# backend/agents/utils/informatica_ir.py
+"""Compact mapping IR for Informatica PowerCenter XML exports.
+
+The raw export is mostly noise for a conversion prompt – field offsets,
+physical lengths, descriptions, session/workflow configuration.  This module
+streams the XML with ``iterparse`` (elements are dropped as soon as they are
+consumed, so memory is bounded by the largest single mapping, not the
+repository) and keeps what the logic needs:
+
+* sources / targets – fields with datatype and keys;
+* transformations  – ports (input/output/variable …, expression) and the
+  attributes that carry logic (filter condition, SQL override, lookup
+  condition, router groups …);
+* connectors       – the instance-level DAG with field mappings.
+
+Every mapping is split into pipelines (connected components of the DAG,
+listed in topological order) and each pipeline becomes one chunk of IR text,
+so a repository export turns into many small, independent chunks.  Instances
+without links (unconnected lookups, stored procedures called from
+expressions) are listed with every pipeline of their mapping.
+``process_informatica_string`` falls back to the raw document as one chunk
+when it is not a PowerCenter export.
+"""
+from __future__ import annotations
+
+import io
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+from agents.utils.general_informatica_datastage_chunker import process_info_string
+
+# TABLEATTRIBUTEs that change what a transformation does (everything else is
+# tracing, caching, connection or performance tuning)
+LOGIC_ATTRS = {
+    "Sql Query", "User Defined Join", "Source Filter", "Select Distinct",
+    "Number Of Sorted Ports", "Pre SQL", "Post SQL",
+    "Filter Condition", "Join Condition", "Join Type",
+    "Lookup Sql Override", "Lookup table name", "Lookup condition",
+    "Lookup Source Filter", "Lookup Policy on Multiple Match",
+    "Update Strategy Expression", "Sorter Distinct", "Distinct", "Case Sensitive",
+    "Start Value", "Increment By", "End Value", "Cycle",
+    "Top/Bottom", "Number of Ranks", "Transformation Scope",
+    "Insert Else Update", "Update Else Insert", "Update Override",
+    "Truncate Target Table Option", "Reject Truncated/Overflowed Rows",
+    "Stored Procedure Name", "Call Text",
+}
+_PORT_IO = {"INPUT": "I", "OUTPUT": "O", "VARIABLE": "V", "LOCAL VARIABLE": "V",
+            "LOOKUP": "L", "RETURN": "R", "MASTER": "M"}
+_SIZED   = ("char", "string", "text", "binary")
+_SCALED  = ("decimal", "number", "numeric")
+
+HEADER = ("# Informatica mapping IR – compact form of the PowerCenter XML export.\n"
+          "# ports: NAME type io [= expression]; io: I input, O output, V variable, "
+          "L lookup, R return, M master\n"
+          "# FLOW lists instance → instance links as from_port->to_port "
+          "(a single name when both ports match)")
+
+
+def _dtype(el: ET.Element) -> str:
+    dt   = (el.get("DATATYPE") or "").lower()
+    prec = el.get("PRECISION")
+    if prec and any(k in dt for k in _SIZED):
+        return f"{dt}({prec})"
+    if prec and any(k in dt for k in _SCALED):
+        return f"{dt}({prec},{el.get('SCALE') or 0})"
+    return dt
+
+
+def _table(el: ET.Element, field_tag: str) -> Dict:
+    fields = []
+    for f in el.iter(field_tag):
+        key = {"PRIMARY KEY": "PK", "FOREIGN KEY": "FK",
+               "PRIMARY FOREIGN KEY": "PK FK"}.get((f.get("KEYTYPE") or "").upper(), "")
+        fields.append(" ".join(p for p in (f.get("NAME"), _dtype(f), key) if p))
+    flat = el.find("FLATFILE")
+    return {"name": el.get("NAME"), "kind": "table",
+            "db": el.get("DATABASETYPE") or "",
+            "owner": el.get("OWNERNAME") or el.get("DBDNAME") or "",
+            "delimiter": flat.get("DELIMITERS") if flat is not None else None,
+            "fields": fields}
+
+
+def _transformation(el: ET.Element) -> Dict:
+    ports = []
+    for f in el.findall("TRANSFORMFIELD"):
+        io_  = "".join(_PORT_IO.get(p.strip().upper(), "") for p in
+                       (f.get("PORTTYPE") or "").split("/"))
+        line = " ".join(p for p in (f.get("NAME"), _dtype(f), io_) if p)
+        if (f.get("EXPRESSIONTYPE") or "").upper() == "GROUPBY":
+            line += " group-by"
+        if (f.get("ISSORTKEY") or "").upper() == "YES":
+            line += f" sort-{(f.get('SORTDIRECTION') or 'ASCENDING')[:3].lower()}"
+        if f.get("GROUP"):
+            line += f" group={f.get('GROUP')}"
+        expr = (f.get("EXPRESSION") or "").strip()
+        if expr and expr != f.get("NAME"):
+            line += f" = {' '.join(expr.split())}"
+        ports.append(line)
+    attrs = [f"{a.get('NAME')}: {' '.join(a.get('VALUE').split())}"
+             for a in el.findall("TABLEATTRIBUTE")
+             if a.get("NAME") in LOGIC_ATTRS and (a.get("VALUE") or "").strip()]
+    attrs += [f"group {g.get('NAME')}: {' '.join((g.get('EXPRESSION') or 'DEFAULT').split())}"
+              for g in el.findall("GROUP") if (g.get("TYPE") or "").upper() != "INPUT"]
+    return {"name": el.get("NAME"), "kind": "transformation",
+            "type": el.get("TYPE") or "", "attrs": attrs, "ports": ports}
+
+
+class _Mapping:
+    def __init__(self, name: str, kind: str):
+        self.name, self.kind = name, kind           # kind: MAPPING | MAPPLET
+        self.transformations: Dict[str, Dict] = {}
+        self.instances: Dict[str, Dict] = {}
+        self.connectors: List[Dict] = []
+        self.variables: List[str] = []
+
+
+def iter_mappings(src: str) -> Iterator[Dict]:
+    """Stream ``{"folder", "mapping", "pipeline", "pipelines", "ir"}`` slices."""
+    folder = {"name": "", "sources": {}, "targets": {}, "reusable": {}, "mapplets": {}}
+    path: List[ET.Element] = []
+    current: Optional[_Mapping] = None
+    for event, el in ET.iterparse(io.BytesIO(src.encode("utf-8")), events=("start", "end")):
+        if event == "start":
+            path.append(el)
+            if el.tag == "FOLDER":
+                folder = {"name": el.get("NAME") or "", "sources": {}, "targets": {},
+                          "reusable": {}, "mapplets": {}}
+            elif el.tag in ("MAPPING", "MAPPLET"):
+                current = _Mapping(el.get("NAME") or "", el.tag)
+            continue
+
+        path.pop()
+        parent = path[-1].tag if path else None
+        if el.tag == "SOURCE" and parent == "FOLDER":
+            folder["sources"][el.get("NAME")] = _table(el, "SOURCEFIELD")
+        elif el.tag == "TARGET" and parent == "FOLDER":
+            folder["targets"][el.get("NAME")] = _table(el, "TARGETFIELD")
+        elif el.tag == "TRANSFORMATION":
+            if parent in ("MAPPING", "MAPPLET") and current:
+                current.transformations[el.get("NAME")] = _transformation(el)
+            elif parent == "FOLDER":
+                folder["reusable"][el.get("NAME")] = _transformation(el)
+        elif el.tag == "INSTANCE" and current:
+            assoc = el.find("ASSOCIATED_SOURCE_INSTANCE")
+            current.instances[el.get("NAME")] = {
+                "ref":   el.get("TRANSFORMATION_NAME") or el.get("NAME"),
+                "type":  (el.get("TYPE") or "").upper(),
+                "assoc": assoc.get("NAME") if assoc is not None else None,
+            }
+        elif el.tag == "CONNECTOR" and current:
+            current.connectors.append({k: el.get(k) for k in
+                                       ("FROMINSTANCE", "FROMFIELD", "TOINSTANCE", "TOFIELD")})
+        elif el.tag == "MAPPINGVARIABLE" and current:
+            default = el.get("DEFAULTVALUE")
+            current.variables.append(
+                f"{el.get('NAME')} {_dtype(el)} "
+                f"{'parameter' if (el.get('ISPARAM') or '').upper() == 'YES' else 'variable'}"
+                + (f" = {default}" if default else ""))
+        elif el.tag == "MAPPLET" and current:
+            folder["mapplets"][current.name] = current
+            current = None
+        elif el.tag == "MAPPING" and current:
+            yield from _slices(folder, current)
+            current = None
+
+        # drop consumed subtrees; mapping internals go with their mapping
+        if parent in ("FOLDER", "REPOSITORY", "POWERMART") or parent is None:
+            el.clear()
+            if path:
+                path[-1].remove(el)
+
+
+def _definition(folder: Dict, m: _Mapping, inst_name: str) -> Dict:
+    inst = m.instances.get(inst_name) or {}
+    ref, kind = inst.get("ref", inst_name), inst.get("type", "")
+    if kind == "SOURCE":
+        found = folder["sources"].get(ref)
+    elif kind == "TARGET":
+        found = folder["targets"].get(ref)
+    else:
+        found = (m.transformations.get(ref) or folder["reusable"].get(ref)
+                 or (_mapplet_def(folder["mapplets"][ref]) if ref in folder["mapplets"] else None)
+                 or folder["sources"].get(ref) or folder["targets"].get(ref))
+    found = found or {"name": ref, "kind": "missing"}
+    role = kind or ("SOURCE" if ref in folder["sources"] and ref not in m.transformations else
+                    "TARGET" if ref in folder["targets"] and ref not in m.transformations else
+                    "TRANSFORMATION")
+    return {**found, "instance": inst_name, "role": role}
+
+
+def _mapplet_def(mp: _Mapping) -> Dict:
+    ports, attrs = [], []
+    for name, t in mp.transformations.items():
+        attrs.append(f"inner {name}: {t['type']}")
+        attrs += [f"  {a}" for a in t["attrs"]]
+        ports += [f"{name}.{p}" for p in t["ports"]]
+    return {"name": mp.name, "kind": "transformation", "type": "Mapplet",
+            "attrs": attrs, "ports": ports}
+
+
+def _slices(folder: Dict, m: _Mapping) -> Iterator[Dict]:
+    edges: Dict[tuple, List[str]] = defaultdict(list)
+    for c in m.connectors:
+        a, b = c["FROMINSTANCE"], c["TOINSTANCE"]
+        edges[(a, b)].append(c["FROMFIELD"] if c["FROMFIELD"] == c["TOFIELD"]
+                             else f"{c['FROMFIELD']}->{c['TOFIELD']}")
+    for name, inst in m.instances.items():
+        if inst["assoc"] and (inst["assoc"], name) not in edges:
+            edges[(inst["assoc"], name)] = []
+    refs  = {inst["ref"] for inst in m.instances.values()}
+    nodes = list(dict.fromkeys([n for e in edges for n in e] + list(m.instances)
+                               + [t for t in m.transformations if t not in refs]))
+    if not nodes:
+        return
+
+    # connected components (union-find), then Kahn order inside each
+    root = {n: n for n in nodes}
+    def find(n):
+        while root[n] != n:
+            root[n] = root[root[n]]
+            n = root[n]
+        return n
+    for a, b in edges:
+        root[find(a)] = find(b)
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for n in nodes:
+        groups[find(n)].append(n)
+
+    linked    = {n for e in edges for n in e}
+    pipelines = [g for g in groups.values() if linked.intersection(g)] or [[]]
+    unlinked  = [n for n in nodes if n not in linked]
+    for idx, members in enumerate(pipelines, 1):
+        order = _topo(members, [e for e in edges if e[0] in members])
+        yield {"folder": folder["name"], "mapping": m.name,
+               "pipeline": idx, "pipelines": len(pipelines),
+               "ir": _render(folder, m, idx, len(pipelines), order + unlinked, edges)}
+
+
+def _topo(nodes: List[str], edges: List[tuple]) -> List[str]:
+    indeg = {n: 0 for n in nodes}
+    succ: Dict[str, List[str]] = defaultdict(list)
+    for a, b in edges:
+        succ[a].append(b)
+        indeg[b] += 1
+    ready = [n for n in nodes if indeg[n] == 0]
+    order = []
+    while ready:
+        n = ready.pop(0)
+        order.append(n)
+        for s in succ[n]:
+            indeg[s] -= 1
+            if indeg[s] == 0:
+                ready.append(s)
+    return order + [n for n in nodes if n not in order]     # cycles: keep the rest
+
+
+def _render(folder: Dict, m: _Mapping, idx: int, total: int,
+            order: List[str], edges: Dict[tuple, List[str]]) -> str:
+    defs = [_definition(folder, m, n) for n in order]
+    out  = [HEADER, f"MAPPING {m.name} (folder {folder['name']}, pipeline {idx}/{total})"]
+    if m.variables:
+        out += ["PARAMETERS"] + [f"  {v}" for v in m.variables]
+    for title, role in (("SOURCES", "SOURCE"), ("TRANSFORMATIONS", "TRANSFORMATION"),
+                        ("TARGETS", "TARGET")):
+        block = [d for d in defs if d["role"] == role]
+        if not block:
+            continue
+        out.append(title)
+        for d in block:
+            alias = f" (instance of {d['name']})" if d["instance"] != d["name"] else ""
+            if d["kind"] == "missing":
+                out.append(f"  {d['instance']}{alias}: definition not in this export")
+            elif d["kind"] == "table":
+                where = " ".join(p for p in (d["db"], d["owner"]) if p)
+                delim = f" delimiter={d['delimiter']!r}" if d["delimiter"] else ""
+                out.append(f"  {d['instance']}{alias} [{where}]{delim}")
+                out += [f"    {f}" for f in d["fields"]]
+            else:
+                out.append(f"  {d['instance']}{alias} : {d['type']}")
+                out += [f"    {a}" for a in d["attrs"]]
+                out += [f"    {p}" for p in d["ports"]]
+    links = [(a, b) for a, b in edges if a in order]
+    if links:
+        out.append("FLOW")
+        rank = {n: i for i, n in enumerate(order)}
+        for a, b in sorted(links, key=lambda e: (rank[e[0]], rank.get(e[1], 0))):
+            fields = edges[(a, b)]
+            out.append(f"  {a} -> {b}" + (f": {', '.join(fields)}" if fields else ""))
+    return "\n".join(out)
+
+
+def process_informatica_string(src: str) -> List[Dict]:
+    """One IR chunk per mapping pipeline; the raw document when it is not a
+    PowerCenter export (or does not parse)."""
+    try:
+        slices = list(iter_mappings(src))
+    except ET.ParseError as exc:
+        print(f"⚠️  Informatica IR: XML does not parse ({exc}) – sending raw export")
+        return process_info_string(src)
+    if not slices:
+        return process_info_string(src)
+    return [{"id": f"blk_{n:03d}", "code": s["ir"]} for n, s in enumerate(slices, 1)]
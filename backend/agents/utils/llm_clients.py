@@ -0,0 +1,167 @@
+# backend/agents/utils/llm_clients.py
+"""Process-wide registry of LangChain chat clients.
+
+Building ``AzureChatOpenAI`` / ``ChatGoogleGenerativeAI`` per node meant a new
+HTTP connection pool – and new TLS handshakes – for every stage of every job.
+Clients are now built once per credential *fingerprint* (provider + the
+fields that reach the wire) and shared by all nodes, jobs and the settings
+validation call; the OpenAI client gets one keep-alive pool sized to the
+per-credential concurrency.
+
+Credential ids map onto fingerprints so that replacing or deleting a
+credential (``invalidate``) drops its client, and a credential validated
+before it had an id is picked up again under that id afterwards.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable
+
+from config import settings
+
+# fields that determine the client (id / rpm / tpm etc. do not)
+_CLIENT_FIELDS = {
+    "azureopenai": ("openai_api_base", "openai_api_key", "openai_api_version",
+                    "deployment_name", "model_name"),
+    "gemini":      ("google_api_key", "model_name"),
+    "mock":        ("model_name", "mock"),        # "mock": MockChatModel overrides
+    "replay":      ("model_name", "replay"),      # "replay": ReplayChatModel overrides
+}
+
+_CLIENTS: Dict[str, object] = {}        # fingerprint → client
+_BY_ID:   Dict[int, str]    = {}        # credential id → fingerprint
+_LOCK = threading.Lock()
+
+
+def fingerprint(provider: str, cred: Dict) -> str:
+    provider = (provider or "").lower()
+    if provider not in _CLIENT_FIELDS:
+        raise ValueError("Unsupported LLM provider")
+    raw = "|".join([provider] + [json.dumps(cred.get(f) or "", sort_keys=True)
+                                 for f in _CLIENT_FIELDS[provider]])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def _build(provider: str, cred: Dict):
+    if provider == "azureopenai":
+        import httpx
+        from langchain_openai import AzureChatOpenAI
+        pool = max(1, settings.LLM_MAX_CONCURRENCY_PER_CREDENTIAL)
+        return AzureChatOpenAI(
+            azure_endpoint     = cred["openai_api_base"],
+            openai_api_key     = cred["openai_api_key"],
+            openai_api_version = cred["openai_api_version"],
+            deployment_name    = cred["deployment_name"],
+            model_name         = cred["model_name"],
+            temperature        = 0.0,
+            max_retries        = 0,     # retries/backoff live in the rate limiter
+            http_client        = httpx.Client(limits=httpx.Limits(
+                max_connections=2 * pool, max_keepalive_connections=pool)),
+        )
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model          = cred["model_name"],
+            google_api_key = cred["google_api_key"],
+            temperature    = 0.0,
+            max_retries    = 0,
+        )
+    if provider == "mock":
+        from agents.utils.mock_llm import MockChatModel
+        return MockChatModel(**{
+            "model_name":     cred.get("model_name") or "mock",
+            "mode":           settings.MOCK_LLM_MODE,
+            "latency_ms":     settings.MOCK_LLM_LATENCY_MS,
+            "latency_dist":   settings.MOCK_LLM_LATENCY_DIST,
+            "tokens_per_sec": settings.MOCK_LLM_TOKENS_PER_SEC,
+            "error_rate":     settings.MOCK_LLM_ERROR_RATE,
+            "throttle_rate":  settings.MOCK_LLM_THROTTLE_RATE,
+            "seed":           settings.MOCK_LLM_SEED,
+            **(cred.get("mock") or {}),
+        })
+    if provider == "replay":
+        from agents.utils.llm_fixtures import ReplayChatModel
+        return ReplayChatModel(**{
+            "model_name":  cred.get("model_name") or "replay",
+            "fixture_dir": settings.LLM_FIXTURE_REPLAY_DIR,
+            "speed":       settings.LLM_FIXTURE_REPLAY_SPEED,
+            **(cred.get("replay") or {}),
+        })
+    raise ValueError("Unsupported LLM provider")
+
+
+def _drop(fp: str) -> None:
+    """Forget a client unless another credential id still uses it (lock held)."""
+    if fp in _BY_ID.values():
+        return
+    client = _CLIENTS.pop(fp, None)
+    http = getattr(client, "http_client", None)
+    if http is not None:
+        try:
+            http.close()
+        except Exception:
+            pass
+
+
+def get_client(provider: str, cred: Dict):
+    """Shared client for *cred*; built on first use."""
+    provider = (provider or "").lower()
+    fp = fingerprint(provider, cred)
+    with _LOCK:
+        client = _CLIENTS.get(fp)
+        if client is None:
+            client = _CLIENTS[fp] = _build(provider, cred)
+        cred_id = cred.get("id")
+        if cred_id is not None:
+            old = _BY_ID.get(cred_id)
+            _BY_ID[cred_id] = fp
+            if old and old != fp:          # credential edited in place
+                _drop(old)
+        return client
+
+
+def invalidate(cred_id: int) -> None:
+    """Drop the client of a replaced / deleted credential."""
+    with _LOCK:
+        fp = _BY_ID.pop(cred_id, None)
+        if fp:
+            _drop(fp)
+
+
+def forget(provider: str, cred: Dict) -> None:
+    """Drop a client that was never attached to a credential id (failed validation)."""
+    fp = fingerprint(provider, cred)
+    with _LOCK:
+        _drop(fp)
+
+
+def warm(creds: Iterable[Dict]) -> int:
+    """Build clients for ``{"provider", ...cred}`` dicts; returns how many succeeded."""
+    n = 0
+    for cred in creds:
+        try:
+            get_client(cred["provider"], cred)
+            n += 1
+        except Exception as e:
+            print(f"⚠️  LLM client warm-up failed for credential {cred.get('id')}: {e}")
+    return n
+
+
+def credential_dict(row) -> Dict:
+    """The ``llm_cred`` state dict for an ``LLMCredential`` row."""
+    return {
+        "id":                 row.id,
+        "openai_api_base":    row.openai_api_base,
+        "openai_api_key":     row.openai_api_key,
+        "openai_api_version": row.openai_api_version,
+        "deployment_name":    row.deployment_name,
+        "model_name":         row.model_name,
+        "google_api_key":     row.google_api_key,
+    }
+
+
+def registered() -> int:
+    with _LOCK:
+        return len(_CLIENTS)
@@ -0,0 +1,204 @@
+# backend/agents/utils/llm_fixtures.py
+"""Record / replay of LLM calls.
+
+Record: with ``LLM_FIXTURE_RECORD_DIR`` set, every call made through
+``invoke_llm`` (chunk conversion, packed batches, feedback, optimize) is
+stored with its response, provider usage and measured latency.
+
+Replay: provider ``replay`` (``ReplayChatModel``) answers from such a store,
+sleeping the recorded latency (scaled by ``speed``), so a production-shaped
+workload can be rerun after a code change and compared on wall-clock, tokens
+and output without calling the API.
+
+Store layout (gzip, content-addressed, safe to copy / tar as a unit)::
+
+    <root>/blobs/ab/<sha256>.gz      message and response texts, deduplicated
+    <root>/calls/cd/<prompt key>.json.gz
+        {"messages": [[role, blob], ...],
+         "responses": [{"response": blob, "usage": {...}, "latency_sec": …,
+                        "model": …, "recorded_at": …}, ...]}
+
+The prompt key is the sha256 of the (role, content) sequence.  A prompt
+recorded several times is replayed round-robin in recording order.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config import settings
+
+_STORES: Dict[str, "FixtureStore"] = {}
+_STORES_LOCK = threading.Lock()
+
+
+class FixtureMiss(LookupError):
+    """No recording for this prompt (not retried by the rate limiter)."""
+
+
+def _pairs(messages) -> List[List[str]]:
+    if isinstance(messages, str):
+        return [["human", messages]]
+    return [[getattr(m, "type", "human"), m.content if isinstance(m.content, str)
+             else json.dumps(m.content, sort_keys=True)] for m in messages]
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    def __init__(self, root: str | Path):
+        self.root   = Path(root)
+        self._lock  = threading.Lock()
+        self._next: Dict[str, int] = {}         # replay position per prompt key
+
+    # ── files ─────────────────────────────────────────────────
+    def _path(self, kind: str, name: str, ext: str) -> Path:
+        return self.root / kind / name[:2] / f"{name}{ext}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(gzip.compress(data))
+        os.replace(tmp, path)
+
+    def _put_blob(self, text: str) -> str:
+        sha  = _sha(text)
+        path = self._path("blobs", sha, ".gz")
+        if not path.exists():
+            self._write(path, text.encode("utf-8"))
+        return sha
+
+    def _get_blob(self, sha: str) -> str:
+        return gzip.decompress(self._path("blobs", sha, ".gz").read_bytes()).decode("utf-8")
+
+    def _read_call(self, key: str) -> Optional[Dict]:
+        path = self._path("calls", key, ".json.gz")
+        if not path.exists():
+            return None
+        return json.loads(gzip.decompress(path.read_bytes()))
+
+    # ── API ───────────────────────────────────────────────────
+    @staticmethod
+    def prompt_key(messages) -> str:
+        return _sha(json.dumps(_pairs(messages), ensure_ascii=False))
+
+    def record(self, messages, content: str, usage: Optional[Dict],
+               latency_sec: float, model: str = "") -> str:
+        key   = self.prompt_key(messages)
+        pairs = _pairs(messages)
+        entry = {
+            "response":    self._put_blob(content),
+            "usage":       usage,
+            "latency_sec": round(latency_sec, 4),
+            "model":       model,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            call = self._read_call(key) or {
+                "messages": [[role, self._put_blob(text)] for role, text in pairs],
+                "responses": [],
+            }
+            call["responses"].append(entry)
+            self._write(self._path("calls", key, ".json.gz"),
+                        json.dumps(call).encode("utf-8"))
+        return key
+
+    def lookup(self, messages) -> Optional[Dict]:
+        """Next recording for this prompt: ``{"content", "usage", "latency_sec"}``."""
+        key = self.prompt_key(messages)
+        with self._lock:
+            call = self._read_call(key)
+            if not call or not call["responses"]:
+                return None
+            n = self._next.get(key, 0)
+            self._next[key] = n + 1
+        rec = call["responses"][n % len(call["responses"])]
+        return {"content": self._get_blob(rec["response"]),
+                "usage": rec.get("usage"), "latency_sec": rec.get("latency_sec", 0.0)}
+
+    def stats(self) -> Dict:
+        calls = list((self.root / "calls").glob("*/*.json.gz"))
+        return {"prompts": len(calls),
+                "responses": sum(len(json.loads(gzip.decompress(p.read_bytes()))["responses"])
+                                 for p in calls),
+                "blobs": len(list((self.root / "blobs").glob("*/*.gz")))}
+
+
+def get_store(root: str | Path) -> FixtureStore:
+    key = str(Path(root).resolve())
+    with _STORES_LOCK:
+        if key not in _STORES:
+            _STORES[key] = FixtureStore(key)
+        return _STORES[key]
+
+
+def maybe_record(llm, messages, resp, latency_sec: float) -> None:
+    """Called by ``invoke_llm`` after every successful call."""
+    root = settings.LLM_FIXTURE_RECORD_DIR
+    if not root or isinstance(llm, ReplayChatModel):
+        return
+    from agents.utils.llm_usage import response_usage
+    try:
+        get_store(root).record(messages, resp.content if isinstance(resp.content, str)
+                               else json.dumps(resp.content),
+                               response_usage(resp), latency_sec,
+                               getattr(llm, "model_name", "") or getattr(llm, "model", ""))
+    except Exception as e:
+        print(f"⚠️  fixture record failed: {e}")
+
+
+# ── replay provider ──────────────────────────────────────────
+class ReplayChatModel(BaseChatModel):
+    fixture_dir: str
+    model_name: str = "replay"
+    speed: float = 1.0          # latency multiplier, 0 = no waiting
+    on_miss: str = "error"      # error | mock (answer with the echo mock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _play(self, messages: List[BaseMessage]) -> AIMessage:
+        rec = get_store(self.fixture_dir).lookup(messages)
+        if rec is None:
+            if self.on_miss == "mock":
+                from agents.utils.mock_llm import MockChatModel
+                return MockChatModel(model_name=self.model_name, latency_ms=0).invoke(messages)
+            raise FixtureMiss(f"no fixture for prompt {FixtureStore.prompt_key(messages)[:12]}")
+        if self.speed > 0:
+            time.sleep(rec["latency_sec"] * self.speed)
+        usage = rec["usage"]
+        meta = None if not usage else {
+            "input_tokens": usage["input"], "output_tokens": usage["output"],
+            "total_tokens": usage["input"] + usage["output"],
+            "input_token_details": {"cache_read": usage.get("cached", 0)},
+        }
+        return AIMessage(content=rec["content"], usage_metadata=meta,
+                         response_metadata={"model_name": self.model_name, "replayed": True})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._play(messages))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        msg = self._play(messages)
+        chunk = ChatGenerationChunk(message=AIMessageChunk(
+            content=msg.content, usage_metadata=msg.usage_metadata))
+        if run_manager:
+            run_manager.on_llm_new_token(msg.content, chunk=chunk)
+        yield chunk
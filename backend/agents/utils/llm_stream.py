@@ -0,0 +1,90 @@
+# backend/agents/utils/llm_stream.py
+"""Single entry point for agent LLM calls.
+
+* Rate limiting – with a ``cred_key`` the call runs under that credential's
+  process-wide limiter (RPM/TPM, adaptive concurrency, 429/transient retries;
+  see ``rate_limiter``).  ``est_tokens`` is the prompt + expected completion
+  size charged up front and reconciled with the provider's usage afterwards.
+* Fixtures – every successful call is offered to ``llm_fixtures.maybe_record``
+  (a no-op unless ``LLM_FIXTURE_RECORD_DIR`` is set).
+* Token streaming – when a client is subscribed to
+  ``/agent/events/{job_id}?tokens=true`` the call is made with ``llm.stream``
+  and every fragment is published as a ``token`` event; otherwise it is a
+  plain ``llm.invoke``.  Either way the caller gets one message back
+  (streamed chunks are summed, so usage metadata is kept).
+* Hedging / deadlines – with ``out_tokens`` (the expected completion size)
+  the call runs through ``hedging.hedged_call``: past its p95 latency a
+  duplicate goes to ``hedge`` (``(llm, cred_key)`` of another credential –
+  without one nothing is hedged) and past the chunk deadline it fails with
+  ``ChunkDeadlineExceeded``.
+"""
+from __future__ import annotations
+
+import time
+from typing import Optional, Tuple
+
+from agents.utils.hedging import CallCancelled, chunk_deadline, hedged_call
+from agents.utils.llm_fixtures import maybe_record
+from agents.utils.llm_usage import response_usage
+from agents.utils.rate_limiter import call_with_limits
+from tasks.job_events import emit, wants_tokens
+
+
+def _call(llm, messages, job_id: Optional[str], stage: str, chunk_id: Optional[str],
+          cancel=None, attempt: int = 0):
+    if cancel is not None and cancel.is_set():
+        raise CallCancelled()
+    t0 = time.monotonic()
+    if not wants_tokens(job_id):
+        resp = llm.invoke(messages)
+        maybe_record(llm, messages, resp, time.monotonic() - t0)
+        return resp
+
+    resp = None
+    extra = {"attempt": attempt} if attempt else {}
+    for piece in llm.stream(messages):
+        if cancel is not None and cancel.is_set():
+            # leaving the loop closes the stream (and the HTTP response)
+            raise CallCancelled(resp.content if resp is not None
+                                and isinstance(resp.content, str) else "")
+        resp = piece if resp is None else resp + piece
+        if isinstance(piece.content, str) and piece.content:
+            emit(job_id, "token", stage=stage, id=chunk_id, text=piece.content, **extra)
+    if resp is None:
+        raise RuntimeError("LLM stream returned no output")
+    maybe_record(llm, messages, resp, time.monotonic() - t0)
+    return resp
+
+
+def _used_tokens(resp) -> Optional[int]:
+    usage = response_usage(resp)
+    return usage["input"] + usage["output"] if usage else None
+
+
+def _usage_pair(resp):
+    usage = response_usage(resp)
+    return (usage["input"], usage["output"]) if usage else None
+
+
+def invoke_llm(llm, messages, *, job_id: Optional[str] = None,
+               stage: str = "llm", chunk_id: Optional[str] = None,
+               cred_key: Optional[str] = None, est_tokens: int = 0,
+               out_tokens: int = 0, hedge: Optional[Tuple] = None):
+    if cred_key is None:
+        return _call(llm, messages, job_id, stage, chunk_id)
+    # a duplicate on the same credential only doubles its load
+    if hedge is not None and hedge[1] == cred_key:
+        hedge = None
+    if not out_tokens or (hedge is None and chunk_deadline(cred_key, out_tokens) is None):
+        return call_with_limits(cred_key, lambda: _call(llm, messages, job_id, stage, chunk_id),
+                                est_tokens=est_tokens, used_tokens=_used_tokens)
+
+    def attempt(a_llm, a_key, n):
+        return lambda cancel: call_with_limits(
+            a_key, lambda: _call(a_llm, messages, job_id, stage, chunk_id, cancel, n),
+            est_tokens=est_tokens, used_tokens=_used_tokens)
+
+    return hedged_call(attempt(llm, cred_key, 0), hedge and attempt(*hedge, 1),
+                       key=cred_key, out_tokens=out_tokens,
+                       in_tokens=max(0, est_tokens - out_tokens), job_id=job_id,
+                       failover=hedge is not None, used_tokens=_usage_pair)
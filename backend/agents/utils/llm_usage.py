@@ -0,0 +1,61 @@
+# backend/agents/utils/llm_usage.py
+"""Token usage as reported by the provider, including prefix-cache reads.
+
+LangChain exposes usage in two places depending on the integration version:
+``AIMessage.usage_metadata`` (``input_tokens`` / ``output_tokens`` /
+``input_token_details.cache_read``) and the raw provider payload in
+``response_metadata`` (OpenAI ``token_usage.prompt_tokens_details.cached_tokens``,
+Gemini ``usage_metadata.cached_content_token_count``).
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+
+def _get(obj, key, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def response_usage(resp) -> Optional[Dict[str, int]]:
+    """``{"input", "output", "cached"}`` for one LLM reply, or ``None`` if the
+    provider reported nothing (callers then fall back to local counting)."""
+    meta = _get(resp, "usage_metadata")
+    if meta and _get(meta, "input_tokens") is not None:
+        details = _get(meta, "input_token_details") or {}
+        return {
+            "input":  int(_get(meta, "input_tokens") or 0),
+            "output": int(_get(meta, "output_tokens") or 0),
+            "cached": int(_get(details, "cache_read") or 0),
+        }
+
+    raw = _get(resp, "response_metadata") or {}
+    usage = _get(raw, "token_usage")
+    if usage:                                                   # OpenAI / Azure
+        details = _get(usage, "prompt_tokens_details") or {}
+        return {
+            "input":  int(_get(usage, "prompt_tokens") or 0),
+            "output": int(_get(usage, "completion_tokens") or 0),
+            "cached": int(_get(details, "cached_tokens") or 0),
+        }
+    usage = _get(raw, "usage_metadata")
+    if usage:                                                   # Gemini
+        return {
+            "input":  int(_get(usage, "prompt_token_count") or 0),
+            "output": int(_get(usage, "candidates_token_count") or 0),
+            "cached": int(_get(usage, "cached_content_token_count") or 0),
+        }
+    return None
+
+
+def add_usage(stage: Dict, input_tokens: int, output_tokens: int,
+              cached_tokens: int = 0) -> Dict:
+    """Accumulate into a ``token_usage`` stage entry (input/output/total/cached_input)."""
+    stage["input"]        = stage.get("input", 0) + input_tokens
+    stage["output"]       = stage.get("output", 0) + output_tokens
+    stage["total"]        = stage["input"] + stage["output"]
+    stage["cached_input"] = stage.get("cached_input", 0) + cached_tokens
+    return stage
@@ -0,0 +1,222 @@
+# backend/agents/utils/mock_llm.py
+"""Deterministic stand-in for a chat model (provider ``mock``).
+
+Lets the real ``build_graph()`` pipeline run without a live service, for
+benchmarks, load tests and offline development.  It reads the prompts the
+agents actually send and answers in the shape the next node expects:
+
+* chunk prompts (``### <SRC> code ### … ### <TGT> equivalent ###``) get a
+  target-shaped stub – Python for PySpark/Snowpark/Python, JSON for
+  Matillion, SQL otherwise – that passes ``validate_agent``; in ``echo``
+  mode the source is carried along as comments;
+* packed batches get one ``<<<CHUNK id>>> … <<<END id>>>`` section per chunk;
+* optimizer prompts get their code back unchanged;
+* ``canned`` mode returns ``canned_response`` verbatim.
+
+Latency (fixed / uniform / exponential / lognormal around ``latency_ms``),
+generation speed (``tokens_per_sec``), transient errors and 429s are drawn
+from an RNG seeded by ``seed``, the prompt and how often that prompt has been
+seen – so a run is reproducible regardless of thread scheduling, and a
+retried call can succeed.  Usage metadata is reported like a real provider,
+including prefix-cache reads once a system prompt has been seen.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agents.utils.chunk_packing import BEGIN, END
+from agents.utils.model_registry import count_tokens
+
+_CHUNK_RE  = re.compile(r"### .+? code ###\n(?P<code>.*?)\n\n### chunk (?P<id>\S+), type=", re.S)
+_TARGET_RE = re.compile(r"### (?P<tgt>[A-Za-z ]+?) equivalent ###|### Fixed (?P<fix>[A-Za-z ]+?) Code ###")
+_BATCH_RE  = re.compile(r"chunks to (?P<tgt>\S+) independently")
+_BATCH_IDS = re.compile(r"^<<<CHUNK (?P<id>(?!<)[^>]+)>>>$", re.M)
+_OPTIMIZE_RE = re.compile(r"^Optimize this .+? code:\n", re.S)
+
+PREFIX_CACHE_MIN = 1024      # providers only cache prefixes from this size …
+PREFIX_CACHE_STEP = 128      # … in steps of this many tokens
+
+
+class MockError(Exception):
+    """Injected transient failure (HTTP 503)."""
+    status_code = 503
+
+
+class MockRateLimitError(Exception):
+    """Injected throttle (HTTP 429) carrying a Retry-After header."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"mock rate limit, retry after {retry_after:.2f}s")
+        self.response = type("Response", (), {"headers": {"retry-after": f"{retry_after:.2f}"}})()
+
+
+class MockChatModel(BaseChatModel):
+    model_name: str = "mock"
+    mode: str = "echo"                  # echo | canned
+    canned_response: str = ""
+    latency_ms: float = 250.0           # median time to first token
+    latency_dist: str = "lognormal"     # fixed | uniform | exponential | lognormal
+    latency_spread: float = 0.5         # sigma (lognormal) / ±fraction (uniform)
+    tokens_per_sec: float = 0.0         # generation speed, 0 = instant
+    error_rate: float = 0.0             # share of calls failing with MockError
+    throttle_rate: float = 0.0          # share of calls failing with a 429
+    retry_after_sec: float = 0.5
+    prefix_cache: bool = True
+    seed: int = 0
+
+    _seen: Dict[str, int]
+    _lock: Any
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    # ── behaviour ─────────────────────────────────────────────
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}\x00{prompt}".encode("utf-8")).hexdigest()
+        with self._lock:
+            n = self._seen[digest] = self._seen.get(digest, 0) + 1
+        return random.Random(f"{digest}:{n}")
+
+    def _latency(self, rng: random.Random) -> float:
+        base = max(0.0, self.latency_ms) / 1000.0
+        if self.latency_dist == "uniform":
+            return max(0.0, rng.uniform(base * (1 - self.latency_spread),
+                                        base * (1 + self.latency_spread)))
+        if self.latency_dist == "exponential":
+            return rng.expovariate(1 / base) if base else 0.0
+        if self.latency_dist == "lognormal":
+            return rng.lognormvariate(math.log(base), self.latency_spread) if base else 0.0
+        return base
+
+    def _inject_faults(self, rng: random.Random) -> None:
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            raise MockRateLimitError(self.retry_after_sec)
+        if roll < self.throttle_rate + self.error_rate:
+            raise MockError("mock transient error")
+
+    def _usage(self, messages: List[BaseMessage], output: str) -> Dict:
+        in_tok = sum(count_tokens(self.model_name, m.content) for m in messages
+                     if isinstance(m.content, str))
+        cached = 0
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        if self.prefix_cache and system:
+            key = "sys:" + hashlib.sha256(system.encode("utf-8")).hexdigest()
+            with self._lock:
+                seen = self._seen.get(key, 0)
+                self._seen[key] = seen + 1
+            sys_tok = count_tokens(self.model_name, system)
+            if seen and sys_tok >= PREFIX_CACHE_MIN:
+                cached = sys_tok // PREFIX_CACHE_STEP * PREFIX_CACHE_STEP
+        out_tok = count_tokens(self.model_name, output)
+        return {"input_tokens": in_tok, "output_tokens": out_tok,
+                "total_tokens": in_tok + out_tok,
+                "input_token_details": {"cache_read": cached}}
+
+    # ── answers ───────────────────────────────────────────────
+    @staticmethod
+    def _shape(target: str) -> str:
+        t = target.upper()
+        if any(k in t for k in ("PYTHON", "PYSPARK", "SNOWPARK")):
+            return "python"
+        if "MATILLION" in t:
+            return "json"
+        return "sql"
+
+    def _stub(self, shape: str, chunk_id: str, code: str) -> str:
+        safe = re.sub(r"\W", "_", chunk_id) or "chunk"
+        if shape == "json":
+            body = {"mock_conversion": chunk_id}
+            if self.mode == "echo":
+                body["source"] = code
+            return json.dumps(body, indent=2)
+        mark = "#" if shape == "python" else "--"
+        lines = [f"{mark} mock conversion of {chunk_id}"]
+        if self.mode == "echo":
+            lines += [f"{mark} {ln}" for ln in code.splitlines()]
+        if shape == "python":
+            lines.append(f"mock_{safe} = {len(code)}")
+        else:
+            lines.append(f"SELECT {len(code)} AS mock_{safe};")
+        return "\n".join(lines)
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        user = messages[-1].content if messages else ""
+        user = user if isinstance(user, str) else str(user)
+        if self.mode == "canned" and self.canned_response:
+            return self.canned_response
+
+        m = _OPTIMIZE_RE.match(user)
+        if m:
+            return user[m.end():]
+
+        batch = _BATCH_RE.search(user)
+        if batch:
+            shape = self._shape(batch.group("tgt"))
+            parts = []
+            for bm in _BATCH_IDS.finditer(user):
+                cid = bm.group("id")
+                body = re.search(re.escape(BEGIN.format(id=cid)) + r"\n### .+? ###\n(.*?)\n"
+                                 + re.escape(END.format(id=cid)), user, re.S)
+                parts += [BEGIN.format(id=cid),
+                          self._stub(shape, cid, body.group(1) if body else ""),
+                          END.format(id=cid)]
+            return "\n".join(parts)
+
+        tm = _TARGET_RE.search(user)
+        shape = self._shape((tm.group("tgt") or tm.group("fix")) if tm else "")
+        cm = _CHUNK_RE.search(user)
+        if cm:
+            return self._stub(shape, cm.group("id"), cm.group("code"))
+        return self._stub(shape, "reply", user if tm else "")
+
+    # ── BaseChatModel hooks ───────────────────────────────────
+    def _prepare(self, messages: List[BaseMessage]):
+        rng = self._rng("\n".join(str(m.content) for m in messages))
+        time.sleep(self._latency(rng))
+        self._inject_faults(rng)
+        output = self._answer(messages)
+        return output, self._usage(messages, output)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        output, usage = self._prepare(messages)
+        if self.tokens_per_sec > 0:
+            time.sleep(usage["output_tokens"] / self.tokens_per_sec)
+        msg = AIMessage(content=output, usage_metadata=usage,
+                        response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        output, usage = self._prepare(messages)
+        pieces = re.findall(r"\S+\s*|\s+", output) or [""]
+        delay = (usage["output_tokens"] / self.tokens_per_sec / len(pieces)
+                 if self.tokens_per_sec > 0 else 0.0)
+        for i, piece in enumerate(pieces):
+            if delay:
+                time.sleep(delay)
+            last = i == len(pieces) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=usage if last else None))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
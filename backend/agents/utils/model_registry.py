@@ -0,0 +1,84 @@
+# backend/agents/utils/model_registry.py
+"""Per-model context limits and tokenizer lookup.
+
+Entries are matched by the longest key that is a prefix of the (lower-cased)
+model / deployment name, so "gpt-4o-2024-08-06" resolves to "gpt-4o".
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict
+
+# context = prompt + completion window, max_output = completion cap
+MODEL_LIMITS: Dict[str, Dict] = {
+    "gpt-4.1":          {"context": 1_047_576, "max_output": 32_768, "encoding": "o200k_base"},
+    "gpt-4o-mini":      {"context":   128_000, "max_output": 16_384, "encoding": "o200k_base"},
+    "gpt-4o":           {"context":   128_000, "max_output": 16_384, "encoding": "o200k_base"},
+    "gpt-4-turbo":      {"context":   128_000, "max_output":  4_096, "encoding": "cl100k_base"},
+    "gpt-4-32k":        {"context":    32_768, "max_output":  4_096, "encoding": "cl100k_base"},
+    "gpt-4":            {"context":     8_192, "max_output":  4_096, "encoding": "cl100k_base"},
+    "gpt-35-turbo-16k": {"context":    16_385, "max_output":  4_096, "encoding": "cl100k_base"},
+    "gpt-35-turbo":     {"context":    16_385, "max_output":  4_096, "encoding": "cl100k_base"},
+    "gpt-3.5-turbo":    {"context":    16_385, "max_output":  4_096, "encoding": "cl100k_base"},
+    "o1":               {"context":   200_000, "max_output": 100_000, "encoding": "o200k_base"},
+    "o3":               {"context":   200_000, "max_output": 100_000, "encoding": "o200k_base"},
+    "gemini-2.5":       {"context": 1_048_576, "max_output": 65_536, "encoding": "cl100k_base"},
+    "gemini-2.0":       {"context": 1_048_576, "max_output":  8_192, "encoding": "cl100k_base"},
+    "gemini-1.5-pro":   {"context": 2_097_152, "max_output":  8_192, "encoding": "cl100k_base"},
+    "gemini-1.5-flash": {"context": 1_048_576, "max_output":  8_192, "encoding": "cl100k_base"},
+    "gemini-pro":       {"context":    32_760, "max_output":  8_192, "encoding": "cl100k_base"},
+}
+DEFAULT_LIMITS = {"context": 8_192, "max_output": 4_096, "encoding": "cl100k_base"}
+
+DEFAULT_CHUNK_TOKENS = 1_500   # sweet spot for conversion quality even on huge windows
+PROMPT_RESERVE       = 3_000   # system prompt + instructions (largest ETL prompts)
+OUTPUT_RATIO         = 1.5     # converted code is usually longer than the source
+
+
+def model_limits(model_name: str) -> Dict:
+    name = (model_name or "").lower()
+    best = ""
+    for key in MODEL_LIMITS:
+        if name.startswith(key) and len(key) > len(best):
+            best = key
+    return MODEL_LIMITS.get(best, DEFAULT_LIMITS)
+
+
+def max_chunk_tokens(model_name: str) -> int:
+    """Largest chunk (source tokens) whose prompt and answer still fit the model."""
+    lim = model_limits(model_name)
+    by_output  = int(lim["max_output"] / OUTPUT_RATIO)
+    by_context = int((lim["context"] - PROMPT_RESERVE) / (1 + OUTPUT_RATIO))
+    return max(200, min(by_output, by_context))
+
+
+def target_chunk_tokens(model_name: str) -> int:
+    """Preferred chunk size: the default window, shrunk for small models."""
+    return min(DEFAULT_CHUNK_TOKENS, max_chunk_tokens(model_name))
+
+
+@lru_cache(maxsize=32)
+def _encoding(model_name: str):
+    """tiktoken encoder for the model, or ``None`` if none can be loaded.
+
+    Cached – including failures – so offline hosts do not retry per call.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception:
+        pass
+    try:
+        return tiktoken.get_encoding(model_limits(model_name)["encoding"])
+    except Exception:
+        return None
+
+
+def count_tokens(model_name: str, text: str) -> int:
+    enc = _encoding((model_name or "").lower())
+    if enc is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(enc.encode(text, disallowed_special=()))
@@ -0,0 +1,230 @@
+# backend/agents/utils/rate_limiter.py
+"""Process-wide rate limiting per LLM credential.
+
+Every job that talks to the same credential (see ``concurrency.credential_key``)
+shares one ``CredentialLimiter``, which enforces
+
+* requests/min and tokens/min as continuously refilled buckets (0 = unlimited);
+* an adaptive concurrency window (AIMD): +1/window per success, halved on a
+  429, trimmed by 10 % when a call is slower than the latency target;
+* a shared pause after a 429, honouring ``Retry-After`` when the provider
+  sends one, so parallel callers back off together.
+
+``call_with_limits`` wraps one LLM call: it waits for capacity, retries
+throttled and transient errors with full-jitter exponential backoff and only
+re-raises once the retries are used up.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+from config import settings
+from agents.utils.hedging import CallCancelled
+
+R = TypeVar("R")
+
+_LIMITERS: Dict[str, "CredentialLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+_TRANSIENT_STATUS = {408, 409, 425, 500, 502, 503, 504}
+_TRANSIENT_NAMES  = ("Timeout", "Connection", "ServiceUnavailable",
+                     "InternalServer", "DeadlineExceeded", "ServerError")
+_THROTTLE_NAMES   = ("RateLimit", "ResourceExhausted", "TooManyRequests")
+
+
+class _Bucket:
+    """Token bucket refilled at *per_min*/60 per second; capacity = one minute."""
+
+    def __init__(self, per_min: int):
+        self.rate     = per_min / 60.0
+        self.capacity = float(per_min)
+        self.level    = float(per_min)
+        self.stamp    = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class CredentialLimiter:
+    def __init__(self, key: str, rpm: int, tpm: int, max_concurrency: int):
+        self.key        = key
+        self.rpm, self.tpm = rpm, tpm
+        self._requests  = _Bucket(rpm) if rpm > 0 else None
+        self._tokens    = _Bucket(tpm) if tpm > 0 else None
+        self.max_limit  = max(1, max_concurrency)
+        self.limit      = float(self.max_limit)
+        self.in_flight  = 0
+        self.paused_until = 0.0
+        self._cond      = threading.Condition()
+        self.stats = {"requests": 0, "succeeded": 0, "throttled": 0, "retries": 0,
+                      "failed": 0, "wait_sec": 0.0, "latency_sec": 0.0}
+
+    # ── admission ─────────────────────────────────────────────
+    def acquire(self, est_tokens: int) -> None:
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                now  = time.monotonic()
+                wait = max(0.0, self.paused_until - now)
+                if not wait and self.in_flight >= int(self.limit):
+                    wait = None                         # woken by release()
+                if wait == 0.0 and self._requests:
+                    wait = self._requests.wait_time(1, now)
+                if wait == 0.0 and self._tokens:
+                    wait = self._tokens.wait_time(est_tokens, now)
+                if wait == 0.0:
+                    break
+                self._cond.wait(timeout=wait)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(est_tokens)
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            self.stats["wait_sec"] += time.monotonic() - t0
+
+    def release(self, *, est_tokens: int = 0, used_tokens: Optional[int] = None,
+                latency: Optional[float] = None, outcome: str = "ok",
+                retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if self._tokens and used_tokens is not None:
+                # reconcile the estimate with what the provider actually counted
+                if used_tokens < est_tokens:
+                    self._tokens.give_back(est_tokens - used_tokens)
+                else:
+                    self._tokens.take(used_tokens - est_tokens)
+            if outcome == "ok":
+                self.stats["succeeded"] += 1
+                self.stats["latency_sec"] += latency or 0.0
+                target = settings.LLM_LATENCY_TARGET_SEC
+                if target and latency and latency > target:
+                    self.limit = max(1.0, self.limit * 0.9)
+                else:
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            elif outcome == "throttled":
+                self.stats["throttled"] += 1
+                self.limit = max(1.0, self.limit / 2)
+                pause = retry_after if retry_after is not None else settings.LLM_RETRY_BASE_SEC
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self._cond.notify_all()
+
+    def count(self, stat: str) -> None:
+        with self._cond:
+            self.stats[stat] += 1
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            done = self.stats["succeeded"]
+            return {
+                "credential":       self.key,
+                "rpm_limit":        self.rpm,
+                "tpm_limit":        self.tpm,
+                "concurrency_limit": int(self.limit),
+                "max_concurrency":  self.max_limit,
+                "in_flight":        self.in_flight,
+                "requests_available": round(self._requests.level, 1) if self._requests else None,
+                "tokens_available":   round(self._tokens.level) if self._tokens else None,
+                "paused_for_sec":   round(max(0.0, self.paused_until - time.monotonic()), 2),
+                **{k: (round(v, 2) if isinstance(v, float) else v)
+                   for k, v in self.stats.items()},
+                "avg_latency_sec":  round(self.stats["latency_sec"] / done, 2) if done else 0.0,
+            }
+
+
+def get_limiter(key: str) -> CredentialLimiter:
+    """Limiter for a credential key, created with the configured limits."""
+    with _LIMITERS_LOCK:
+        lim = _LIMITERS.get(key)
+        if lim is None:
+            lim = _LIMITERS[key] = CredentialLimiter(
+                key,
+                rpm=settings.LLM_RATE_LIMIT_RPM,
+                tpm=settings.LLM_RATE_LIMIT_TPM,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY_PER_CREDENTIAL,
+            )
+        return lim
+
+def limiter_snapshots(keys=None) -> Dict[str, Dict]:
+    with _LIMITERS_LOCK:
+        items = [(k, v) for k, v in _LIMITERS.items() if keys is None or k in keys]
+    return {k: v.snapshot() for k, v in items}
+
+
+# ── error classification ─────────────────────────────────────
+def _status(exc: BaseException) -> Optional[int]:
+    for obj in (exc, getattr(exc, "response", None)):
+        code = getattr(obj, "status_code", None) or getattr(obj, "code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def is_throttle(exc: BaseException) -> bool:
+    name = type(exc).__name__
+    return _status(exc) == 429 or any(n in name for n in _THROTTLE_NAMES)
+
+def is_transient(exc: BaseException) -> bool:
+    name = type(exc).__name__
+    return _status(exc) in _TRANSIENT_STATUS or any(n in name for n in _TRANSIENT_NAMES)
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base·2^attempt))."""
+    ceiling = min(settings.LLM_RETRY_MAX_SEC, settings.LLM_RETRY_BASE_SEC * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+# ── guarded call ─────────────────────────────────────────────
+def call_with_limits(key: str, fn: Callable[[], R], *, est_tokens: int,
+                     used_tokens: Callable[[R], Optional[int]] = lambda r: None) -> R:
+    """Run *fn* under the credential's limiter, retrying 429s and transient errors."""
+    lim = get_limiter(key)
+    attempt = 0
+    while True:
+        lim.acquire(est_tokens)
+        t0 = time.monotonic()
+        try:
+            res = fn()
+        except CallCancelled:
+            lim.release(est_tokens=est_tokens, outcome="cancelled")
+            raise
+        except Exception as e:
+            throttled = is_throttle(e)
+            lim.release(est_tokens=est_tokens,
+                        outcome="throttled" if throttled else "error",
+                        retry_after=_retry_after(e) if throttled else None)
+            if not (throttled or is_transient(e)) or attempt >= settings.LLM_MAX_RETRIES:
+                lim.count("failed")
+                raise
+            delay = max(backoff_delay(attempt), _retry_after(e) or 0.0)
+            attempt += 1
+            lim.count("retries")
+            print(f"⏳  {key}: {type(e).__name__} – retry {attempt}/"
+                  f"{settings.LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        lim.release(est_tokens=est_tokens, used_tokens=used_tokens(res),
+                    latency=time.monotonic() - t0)
+        return res
@@ -0,0 +1,452 @@
+# backend/agents/utils/sas_rules.py
+"""Deterministic conversion of a small, well-defined subset of SAS.
+
+``convert_sas(code, target)`` returns target code for a chunk made *only*
+of the steps below (comments and blank statements aside), or ``None`` so the
+chunk goes to the LLM as before.  Nothing is guessed: any option, macro
+reference, function call or statement outside the subset rejects the chunk.
+
+    %let name = value;                  (not for BigQuery, see below)
+    data out; set in; [where <expr>;] [keep a b;] [drop c;] [rename a=b;] run;
+    proc sort data=in [out=out]; by [descending] a ...; run;
+    proc sql [noprint]; create table t as select ...; | select ...; |
+                        drop table t; quit;
+
+WHERE expressions may use columns, literals, ``and / or``, ``in (...)``,
+``between``, ``like`` and comparisons (also ``eq gt lt ge le``) that keep the
+same rows in SQL.  SAS sorts a missing value below every other value, SQL
+drops NULL from every comparison, so only ``col = / > / >= literal`` (or
+``literal = / < / <= col``) is accepted; ``<``, ``ne``, ``not``,
+column-to-column comparisons and blank strings are rejected, and so is
+``is [not] missing / null``, which in SAS also matches blank strings.  PROC
+SQL statements are passed through under the same rules, with functions
+limited to ``ALLOWED_SQL_FUNCTIONS``.  Date/time/name/hex literals
+(``'01JAN2020'd`` …) are rejected everywhere.  ``work.`` is dropped from
+dataset names (the temporary library).
+
+PROC SORT NODUPKEY / NODUP keep the first row of a group in input order,
+which a table has none of, so they go to the LLM.  BigQuery only accepts
+DECLARE at the start of a script and chunks are merged into one, so
+``%let`` is not converted for BigQuery.
+
+Targets: pyspark, snowpark and the SQL targets (databricks, snowflake,
+bigquery).
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+PYTHON_TARGETS = ("pyspark", "snowpark")
+SQL_TARGETS    = ("databricks", "snowflake", "bigquery")
+TARGETS        = PYTHON_TARGETS + SQL_TARGETS
+
+_NAME    = re.compile(r"[A-Za-z_]\w*$")
+_DSN     = re.compile(r"(?:[A-Za-z_]\w*\.)?[A-Za-z_]\w*$")
+_LET     = re.compile(r"%let\s+([A-Za-z_]\w*)\s*=(.*)$", re.I | re.S)
+_RENAME  = re.compile(r"([A-Za-z_]\w*)\s*=\s*([A-Za-z_]\w*)")
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<str>'(?:[^']|'')*'|"(?:[^"]|"")*")
+  | (?P<num>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<op>\^=|~=|<>|!=|<=|>=|=|<|>)
+  | (?P<punct>\|\||[(),*+\-/])
+  | (?P<name>[A-Za-z_]\w*(?:\.(?:[A-Za-z_]\w*|\*))?)
+)""", re.X)
+_WORD_OPS = {"eq": "=", "ne": "<>", "gt": ">", "lt": "<", "ge": ">=", "le": "<="}
+_NE_OPS   = {"^=": "<>", "~=": "<>", "!=": "<>"}
+_KEYWORDS = {"and", "or", "not", "in", "between", "like"}
+
+# functions that mean the same in PROC SQL and every SQL target; the
+# aggregates only with one argument (``sum(a, b)`` is row-wise in SAS)
+ALLOWED_SQL_FUNCTIONS = {"count", "sum", "avg", "min", "max",
+                         "coalesce", "upper", "lower", "abs"}
+_AGGREGATES  = {"count", "sum", "avg", "min", "max"}
+_PAREN_WORDS = {"in", "exists", "from", "join", "on", "and", "or", "where", "as",
+                "select", "by", "having", "when", "then", "else", "union", "all"}
+_SAS_ONLY_SQL = re.compile(
+    r"\b(?:calculated|monotonic|put|input|format|informat|label|missing|using|natural|"
+    r"outobs|inobs|connect|disconnect|execute|validate|describe|eq|ne|gt|lt|ge|le)\b",
+    re.I)
+
+
+# ───────────────────── statements ───────────────────────────────
+def _statements(code: str) -> Optional[List[str]]:
+    """Split on ``;`` outside quotes, dropping ``/* */`` and ``* ...;`` comments."""
+    out, buf, i, quote = [], [], 0, None
+    while i < len(code):
+        ch = code[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+            buf.append(ch)
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            if end < 0:
+                return None
+            i = end + 2
+            buf.append(" ")
+            continue
+        elif ch == ";":
+            out.append("".join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    if quote or "".join(buf).strip():
+        return None                         # unterminated string / statement
+    return [s for s in out if s and not s.startswith("*")]
+
+
+def _dsn(name: str) -> Optional[str]:
+    if not _DSN.match(name):
+        return None
+    return name[5:] if name.lower().startswith("work.") else name
+
+
+def _names(text: str) -> Optional[List[str]]:
+    names = text.split()
+    return names if names and all(_NAME.match(n) for n in names) else None
+
+
+def _sql_string(lit: str) -> str:
+    body = lit[1:-1]
+    if lit[0] == '"':
+        body = body.replace('""', '"').replace("'", "''")
+    return f"'{body}'"
+
+
+def _tokens(text: str, word_ops: bool = False) -> Optional[List[Tuple[str, str]]]:
+    """``[(kind, text)]``, ``None`` on anything the tokenizer does not know
+    (macro references, ``:host`` variables, SAS missing ``.`` …) or on a
+    suffixed literal such as ``'01JAN2020'd``."""
+    toks, pos = [], 0
+    while text[pos:].strip():
+        m = _TOKEN.match(text, pos)
+        if not m:
+            return None
+        kind, tok = m.lastgroup, m.group(m.lastgroup)
+        pos = m.end()
+        if kind == "str" and re.match(r"\w", text[pos:pos + 1]):
+            return None
+        if kind == "op":
+            tok = _NE_OPS.get(tok, tok)
+        elif kind == "name" and word_ops and tok.lower() in _WORD_OPS:
+            kind, tok = "op", _WORD_OPS[tok.lower()]
+        toks.append((kind, tok))
+    return toks
+
+
+def _same_rows(toks: List[Tuple[str, str]]) -> bool:
+    """True when SQL keeps the rows SAS keeps, given missing sorts lowest."""
+    def literal(t):
+        return t and (t[0] == "num" or (t[0] == "str" and t[1][1:-1].strip()))
+    def column(t):
+        return t and t[0] == "name" and t[1].lower() not in _KEYWORDS
+    for i, (kind, tok) in enumerate(toks):
+        prev = toks[i - 1] if i else None
+        nxt  = toks[i + 1] if i + 1 < len(toks) else None
+        if kind == "str" and not tok[1:-1].strip():
+            return False                    # blank is missing in SAS, not NULL in SQL
+        if kind == "name" and tok.lower() == "not":
+            return False
+        if kind == "name" and tok.lower() in ("is", "null", "missing"):
+            return False                    # SAS missing also matches blank strings
+        if kind == "op":
+            if column(prev) and literal(nxt) and tok in ("=", ">", ">="):
+                continue
+            if literal(prev) and column(nxt) and tok in ("=", "<", "<="):
+                continue
+            return False
+    return True
+
+
+def _where(expr: str) -> Optional[str]:
+    """SAS WHERE expression → SQL expression, ``None`` if outside the subset."""
+    toks = _tokens(expr, word_ops=True)
+    if not toks or not _same_rows(toks):
+        return None
+    out = []
+    for i, (kind, tok) in enumerate(toks):
+        low  = tok.lower()
+        prev = toks[i - 1][1].lower() if i else ""
+        if kind == "str":
+            tok = _sql_string(tok)
+        elif kind == "punct":
+            if tok not in "(),":
+                return None                 # arithmetic is outside the subset
+            if tok == "(" and i and toks[i - 1][0] == "name" and prev not in ("and", "or", "in"):
+                return None                 # function call
+        elif kind == "name":
+            if "." in tok:
+                return None
+            if low in _KEYWORDS:
+                tok = low.upper()
+        out.append(tok)
+    return " ".join(out).replace("( ", "(").replace(" )", ")").replace(" ,", ",") or None
+
+
+def _functions_ok(toks: List[Tuple[str, str]]) -> bool:
+    """Every ``name(`` is an allowed function (aggregates with one argument)
+    or a keyword followed by a parenthesis."""
+    for i, (kind, tok) in enumerate(toks[:-1]):
+        if kind != "name" or toks[i + 1] != ("punct", "("):
+            continue
+        low = tok.lower()
+        if low in _PAREN_WORDS:
+            continue
+        if low not in ALLOWED_SQL_FUNCTIONS:
+            return False
+        if low in _AGGREGATES:
+            depth = 0
+            for k, t in toks[i + 1:]:
+                depth += (t == "(") - (t == ")") if k == "punct" else 0
+                if depth == 1 and (k, t) == ("punct", ","):
+                    return False
+                if depth == 0:
+                    break
+    return True
+
+
+# ───────────────────── step parsers ─────────────────────────────
+def _parse(stmts: List[str], target: str) -> Optional[List[Tuple[str, Dict]]]:
+    steps, i = [], 0
+    while i < len(stmts):
+        s   = stmts[i]
+        low = s.lower()
+        if low.startswith("%let"):
+            m = _LET.match(s)
+            if not m:
+                return None
+            value = m.group(2).strip()
+            if re.search(r"[&%]", value) or target == "bigquery":
+                return None
+            steps.append(("let", {"name": m.group(1), "value": value}))
+            i += 1
+        elif re.match(r"data\s", low):
+            end = _find(stmts, i, "run")
+            step = end and _data_step(stmts[i:end])
+            if not step:
+                return None
+            steps.append(("data", step))
+            i = end + 1
+        elif re.match(r"proc\s+sort\b", low):
+            end = _find(stmts, i, "run")
+            step = end and _sort_step(stmts[i:end])
+            if not step:
+                return None
+            steps.append(("sort", step))
+            i = end + 1
+        elif re.match(r"proc\s+sql\b", low):
+            end = _find(stmts, i, "quit")
+            step = end and _sql_step(stmts[i:end])
+            if not step:
+                return None
+            steps.append(("sql", step))
+            i = end + 1
+        else:
+            return None
+    return steps
+
+
+def _find(stmts: List[str], start: int, word: str) -> Optional[int]:
+    for j in range(start + 1, len(stmts)):
+        if stmts[j].lower() == word:
+            return j
+    return None
+
+
+def _data_step(stmts: List[str]) -> Optional[Dict]:
+    out = _dsn(stmts[0].split(None, 1)[1].strip())
+    step = {"out": out, "input": None, "where": None, "keep": None, "drop": None, "rename": []}
+    if not out:
+        return None
+    for s in stmts[1:]:
+        kw, _, rest = s.partition(" ")
+        kw, rest = kw.lower(), rest.strip()
+        if kw == "set" and step["input"] is None:
+            step["input"] = _dsn(rest)
+            if not step["input"]:
+                return None
+        elif kw == "where" and step["where"] is None:
+            step["where"] = _where(rest)
+            if not step["where"]:
+                return None
+        elif kw in ("keep", "drop") and step[kw] is None:
+            step[kw] = _names(rest)
+            if not step[kw]:
+                return None
+        elif kw == "rename":
+            pairs = _RENAME.findall(rest)
+            if not pairs or _RENAME.sub("", rest).strip():
+                return None
+            step["rename"] += pairs
+        else:
+            return None
+    return step if step["input"] else None
+
+
+def _sort_step(stmts: List[str]) -> Optional[Dict]:
+    opts = stmts[0].split()[2:]
+    step = {"input": None, "out": None, "by": []}
+    for opt in opts:
+        key, eq, val = opt.partition("=")
+        key = key.lower()
+        if eq and key in ("data", "out"):
+            step["input" if key == "data" else "out"] = _dsn(val)
+        else:
+            return None
+    if not step["input"] or (step["out"] is None and "out=" in stmts[0].lower()):
+        return None
+    step["out"] = step["out"] or step["input"]
+    if len(stmts) != 2 or not stmts[1].lower().startswith("by "):
+        return None
+    desc = False
+    for word in stmts[1].split()[1:]:
+        if word.lower() == "descending":
+            desc = True
+        elif _NAME.match(word):
+            step["by"].append((word, desc))
+            desc = False
+        else:
+            return None
+    return step if step["by"] and not desc else None
+
+
+def _sql_step(stmts: List[str]) -> Optional[Dict]:
+    if stmts[0].lower().split()[2:] not in ([], ["noprint"]):
+        return None
+    queries = []
+    for s in stmts[1:]:
+        toks = _tokens(s)
+        if (toks is None or _SAS_ONLY_SQL.search(s)
+                or not _same_rows(toks) or not _functions_ok(toks)):
+            return None
+        m = re.match(r"create\s+table\s+(\S+)\s+as\s+(select\b.*)$", s, re.I | re.S)
+        d = re.match(r"drop\s+table\s+(\S+)$", s, re.I)
+        if m and _dsn(m.group(1)):
+            queries.append(("create", _dsn(m.group(1)), _sql_literals(m.group(2))))
+        elif d and _dsn(d.group(1)):
+            queries.append(("drop", _dsn(d.group(1)), ""))
+        elif re.match(r"select\b", s, re.I):
+            queries.append(("select", None, _sql_literals(s)))
+        else:
+            return None
+    return {"queries": queries} if queries else None
+
+
+def _sql_literals(sql: str) -> str:
+    """SAS string literals may be double-quoted; SQL dialects want single quotes."""
+    sql = re.sub(r"\bwork\.", "", sql, flags=re.I)
+    return re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"",
+                  lambda m: _sql_string(m.group(0)), sql)
+
+
+# ───────────────────── emitters ─────────────────────────────────
+def _literal(value: str) -> Tuple[str, bool]:
+    """``(text, numeric)`` of a %let value without surrounding quotes."""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+    return value, bool(re.fullmatch(r"-?\d+(?:\.\d+)?", value))
+
+
+def _emit_python(steps, target: str) -> str:
+    sp      = "spark" if target == "pyspark" else "session"
+    save    = "saveAsTable" if target == "pyspark" else "save_as_table"
+    renamed = "withColumnRenamed" if target == "pyspark" else "with_column_renamed"
+    lines, imports = [], set()
+    for kind, st in steps:
+        if kind == "let":
+            value, numeric = _literal(st["value"])
+            lines.append(f"{st['name']} = {value if numeric else repr(value)}")
+            continue
+        if kind == "sql":
+            for op, table, sql in st["queries"]:
+                if op == "drop":
+                    lines.append(f'{sp}.sql("DROP TABLE IF EXISTS {table}").collect()')
+                elif op == "select":
+                    lines.append(f'{sp}.sql("""{sql}""").show()')
+                else:
+                    lines.append(f'df = {sp}.sql("""{sql}""")')
+                    lines.append(f'df.write.mode("overwrite").{save}("{table}")')
+            continue
+        lines.append(f'df = {sp}.table("{st["input"]}")')
+        if kind == "data":
+            if st["where"]:
+                lines.append(f"df = df.filter({st['where']!r})")
+            if st["keep"]:
+                lines.append("df = df.select(" + ", ".join(map(repr, st["keep"])) + ")")
+            if st["drop"]:
+                lines.append("df = df.drop(" + ", ".join(map(repr, st["drop"])) + ")")
+            for old, new in st["rename"]:
+                lines.append(f"df = df.{renamed}({old!r}, {new!r})")
+        else:
+            if target == "pyspark":
+                imports.add("from pyspark.sql import functions as F")
+                order = ", ".join(f'F.col("{c}").{"desc" if d else "asc"}()' for c, d in st["by"])
+                lines.append(f"df = df.orderBy({order})")
+            else:
+                imports.add("from snowflake.snowpark.functions import col")
+                order = ", ".join(f'col("{c}").{"desc" if d else "asc"}()' for c, d in st["by"])
+                lines.append(f"df = df.sort({order})")
+        lines.append(f'df.write.mode("overwrite").{save}("{st["out"]}")')
+    return "\n".join(sorted(imports) + ([""] if imports else []) + lines)
+
+
+def _emit_sql(steps, target: str) -> str:
+    out = []
+    for kind, st in steps:
+        if kind == "let":
+            value, numeric = _literal(st["value"])
+            text = value if numeric else "'" + value.replace("'", "''") + "'"
+            out.append(f"SET {st['name']} = {text};")
+        elif kind == "sql":
+            for op, table, sql in st["queries"]:
+                if op == "drop":
+                    out.append(f"DROP TABLE IF EXISTS {table};")
+                elif op == "select":
+                    out.append(f"{sql};")
+                else:
+                    out.append(f"CREATE OR REPLACE TABLE {table} AS\n{sql};")
+        elif kind == "data":
+            out.append(f"CREATE OR REPLACE TABLE {st['out']} AS\n"
+                       f"SELECT {_select_list(st, target)}\nFROM {st['input']}"
+                       + (f"\nWHERE {st['where']}" if st["where"] else "") + ";")
+        else:
+            order = ", ".join(f"{c} DESC" if d else c for c, d in st["by"])
+            out.append(f"CREATE OR REPLACE TABLE {st['out']} AS\n"
+                       f"SELECT *\nFROM {st['input']}\nORDER BY {order};")
+    return "\n\n".join(out)
+
+
+def _select_list(st: Dict, target: str) -> str:
+    renames = dict((o.lower(), n) for o, n in st["rename"])
+    if st["keep"]:
+        cols = [c for c in st["keep"]
+                if c.lower() not in {d.lower() for d in (st["drop"] or [])}]
+        return ", ".join(f"{c} AS {renames[c.lower()]}" if c.lower() in renames else c
+                         for c in cols)
+    dropped = list(st["drop"] or [])
+    if not renames:
+        return "*" + (f" {'EXCLUDE' if target == 'snowflake' else 'EXCEPT'} "
+                      f"({', '.join(dropped)})" if dropped else "")
+    if target == "snowflake":
+        sel = "*" + (f" EXCLUDE ({', '.join(dropped)})" if dropped else "")
+        return sel + " RENAME (" + ", ".join(f"{o} AS {n}" for o, n in st["rename"]) + ")"
+    hidden = dropped + [o for o, _ in st["rename"]]
+    return f"* EXCEPT ({', '.join(hidden)}), " + ", ".join(f"{o} AS {n}" for o, n in st["rename"])
+
+
+# ───────────────────── entry point ──────────────────────────────
+def convert_sas(code: str, target: str) -> Optional[str]:
+    """Target code for a chunk inside the subset, else ``None``."""
+    target = (target or "").lower()
+    if target not in TARGETS:
+        return None
+    stmts = _statements(code or "")
+    steps = _parse(stmts, target) if stmts else None
+    if not steps:
+        return None
+    return _emit_python(steps, target) if target in PYTHON_TARGETS else _emit_sql(steps, target)
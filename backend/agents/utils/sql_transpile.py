@@ -0,0 +1,116 @@
+# backend/agents/utils/sql_transpile.py
+"""Local SQL → SQL transpilation for SQL-ish sources (sqlglot).
+
+``plan_chunk(code, source, target)`` parses a chunk in the source dialect
+and regenerates every statement it fully understands in the target dialect.
+A statement is *not* understood when sqlglot keeps it as an opaque
+``Command`` (procedural blocks, vendor utilities), contains a function it
+does not know (``Anonymous``), or the generator reports it unsupported for
+the target.  Those go to the LLM:
+
+* every statement transpiled      → ``{"code": ...}``, no LLM call;
+* some statements not understood  → the span from the first to the last
+  such statement (``"llm"``) is converted by the LLM and ``stitch`` puts the
+  result back between the locally transpiled ``head`` and ``tail`` so the
+  statement order is kept;
+* nothing transpiled, the chunk does not parse, the dialect pair is unknown
+  or sqlglot is not installed → ``None``: the whole chunk goes to the LLM.
+
+Each plan lists per-statement provenance: ``{"n", "kind", "via"}`` with
+``via`` ``"sqlglot"`` or ``"llm"``.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# source names as sent by the UI (lower-cased) → sqlglot dialect
+SOURCE_DIALECTS = {
+    "ms sql server":           "tsql",
+    "azure synapse analytics": "tsql",
+    "oracle":                  "oracle",
+    "plsql":                   "oracle",
+    "teradata":                "teradata",
+    "apache hive":             "hive",
+    "snowflake":               "snowflake",
+}
+TARGET_DIALECTS = {
+    "snowflake":  "snowflake",
+    "bigquery":   "bigquery",
+    "databricks": "databricks",
+}
+
+
+@lru_cache(maxsize=1)
+def _sqlglot():
+    """``(sqlglot, exp, ErrorLevel)`` or ``None`` when sqlglot is not installed."""
+    try:
+        import sqlglot
+        from sqlglot import exp
+        from sqlglot.errors import ErrorLevel
+    except ImportError:
+        return None
+    return sqlglot, exp, ErrorLevel
+
+
+def supported(source: str, target: str) -> bool:
+    read  = SOURCE_DIALECTS.get((source or "").lower())
+    write = TARGET_DIALECTS.get((target or "").lower())
+    return bool(_sqlglot() and read and write and read != write)
+
+
+def _transpile(expr, write: str) -> Optional[str]:
+    _, exp, ErrorLevel = _sqlglot()
+    if expr.find(exp.Command, exp.Anonymous) is not None:
+        return None
+    try:
+        return expr.sql(dialect=write, pretty=True,
+                        unsupported_level=ErrorLevel.RAISE).strip()
+    except Exception:
+        return None
+
+
+def _join(statements: List[str]) -> str:
+    return "\n\n".join(s.rstrip().rstrip(";") + ";" for s in statements)
+
+
+def plan_chunk(code: str, source: str, target: str) -> Optional[Dict]:
+    if not supported(source, target):
+        return None
+    sqlglot = _sqlglot()[0]
+    read  = SOURCE_DIALECTS[source.lower()]
+    write = TARGET_DIALECTS[target.lower()]
+    try:
+        exprs = [e for e in sqlglot.parse(code, read=read) if e is not None]
+    except Exception:
+        return None
+    if not exprs:
+        return None
+
+    out = [_transpile(e, write) for e in exprs]
+    bad = [i for i, sql in enumerate(out) if sql is None]
+    if len(bad) == len(out):
+        return None
+    statements = [{"n": i + 1, "kind": e.key, "via": "llm" if sql is None else "sqlglot"}
+                  for i, (e, sql) in enumerate(zip(exprs, out))]
+    if not bad:
+        return {"code": _join(out), "llm": None, "statements": statements}
+
+    first, last = bad[0], bad[-1]
+    for st in statements[first:last + 1]:     # carried along to keep the order
+        st["via"] = "llm"
+    try:
+        span = _join([e.sql(dialect=read) for e in exprs[first:last + 1]])
+    except Exception:
+        return None
+    return {"head": out[:first], "llm": span, "tail": out[last + 1:],
+            "statements": statements}
+
+
+def stitch(plan: Dict, llm_code: str) -> str:
+    """Locally transpiled head and tail around the LLM's conversion of the span."""
+    parts = [_join(plan["head"])] if plan["head"] else []
+    parts.append(llm_code.strip())
+    if plan["tail"]:
+        parts.append(_join(plan["tail"]))
+    return "\n\n".join(parts)
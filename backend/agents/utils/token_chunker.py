@@ -0,0 +1,105 @@
+# backend/agents/utils/token_chunker.py
+"""Token-aware re-chunking.
+
+The source chunkers split by line count, which says little about tokens.
+This pass measures every chunk with the model's tokenizer and
+
+* splits chunks above the target window at safe statement boundaries
+  (RUN; / QUIT; / %MEND; for SAS, ``/`` or ``;`` outside BEGIN…END for
+  PL/SQL, ``;`` for plain SQL); past the midpoint to the hard cap any
+  statement end will do, and only at the hard cap (twice the target, never
+  more than the model can take) is a line cut forced;
+* merges runs of tiny neighbouring chunks until they reach the window floor,
+  and folds tiny scraps into the preceding chunk while it stays under the cap.
+
+Chunk ids are renumbered ``blk_NNN`` in order afterwards.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional
+
+from agents.utils.model_registry import (count_tokens, max_chunk_tokens,
+                                         target_chunk_tokens)
+from agents.utils.plsql_chunker import _BEGIN, _END
+
+MERGE_FLOOR_RATIO = 0.125     # chunks below target/8 are merged with neighbours
+FORCE_SPLIT_RATIO = 2.0       # no boundary until 2×target → cut anyway
+
+_SAS_BOUNDARY   = re.compile(r"(\bRUN\s*;|\bQUIT\s*;|%MEND\b[^;]*;)\s*$", re.I)
+_PLSQL_BOUNDARY = re.compile(r"(^\s*/\s*$)|(;\s*$)")
+_SQL_BOUNDARY   = re.compile(r";\s*$")
+_SOFT_BOUNDARY  = _SQL_BOUNDARY          # any statement end
+
+# sources whose chunks are whole documents (XML, COBOL) are never re-cut
+_NO_RESIZE = {"informatica", "datastage", "cobol"}
+
+
+def boundary_kind(source: str) -> Optional[str]:
+    src = (source or "").lower()
+    if src in _NO_RESIZE:
+        return None
+    if src == "sas":
+        return "sas"
+    if src in ("oracle", "plsql"):
+        return "plsql"
+    return "sql"
+
+
+def _split(code: str, kind: str, target: int, hard_cap: int,
+           count: Callable[[str], int]) -> List[str]:
+    boundary = {"sas": _SAS_BOUNDARY, "plsql": _PLSQL_BOUNDARY, "sql": _SQL_BOUNDARY}[kind]
+    soft_at  = (target + hard_cap) // 2
+    out, buf, used, depth = [], [], 0, 0
+    for ln in code.splitlines():
+        buf.append(ln)
+        used += count(ln + "\n")
+        if kind == "plsql":
+            if _BEGIN.search(ln): depth += 1
+            if _END.search(ln):   depth = max(depth - 1, 0)
+        safe = depth == 0 and boundary.search(ln)
+        soft = depth == 0 and _SOFT_BOUNDARY.search(ln)
+        if (used >= target and safe) or (used >= soft_at and soft) or used >= hard_cap:
+            out.append("\n".join(buf).strip())
+            buf, used = [], 0
+    if buf and "\n".join(buf).strip():
+        out.append("\n".join(buf).strip())
+    return [p for p in out if p]
+
+
+def resize_chunks(chunks: List[Dict], model_name: str, source: str,
+                  target_tokens: Optional[int] = None) -> List[Dict]:
+    """Split/merge ``{"id", "code"}`` chunks to the model's token window."""
+    kind = boundary_kind(source)
+    if kind is None or not chunks:
+        return chunks
+
+    target   = int(target_tokens or target_chunk_tokens(model_name))
+    hard_cap = max(target, min(int(target * FORCE_SPLIT_RATIO), max_chunk_tokens(model_name)))
+    floor    = int(target * MERGE_FLOOR_RATIO)
+    count    = lambda text: count_tokens(model_name, text)
+
+    pieces: List[tuple] = []            # (code, tokens)
+    for ch in chunks:
+        n = count(ch["code"])
+        if n > target:
+            pieces.extend((p, count(p))
+                          for p in _split(ch["code"], kind, target, hard_cap, count))
+        else:
+            pieces.append((ch["code"], n))
+
+    merged: List[str] = []
+    cur, cur_tok = "", 0
+    for code, n in pieces:
+        grow   = cur_tok < floor and cur_tok + n <= target     # tiny run → window
+        absorb = n < floor and cur_tok + n <= hard_cap         # trailing scrap
+        if cur and (grow or absorb):
+            cur, cur_tok = f"{cur}\n\n{code}", cur_tok + n
+            continue
+        if cur:
+            merged.append(cur)
+        cur, cur_tok = code, n
+    if cur:
+        merged.append(cur)
+
+    return [{"id": f"blk_{i+1:03}", "code": c} for i, c in enumerate(merged)]
@@ -5,6 +5,9 @@ from typing import Dict, List, Tuple
 
 import pandas as pd
 
+from tasks.job_events import emit
+from services import chunk_cache, job_checkpoint
+
 # ───────────────────── helpers ──────────────────────────────────
 PYTHON_TARGETS = {"pyspark", "snowpark","python"}        # validate with ast
 SQL_TARGETS    = {"databricks", "snowflake", "bigquery"}
@@ -90,8 +93,17 @@ def validate_node(state: Dict) -> Dict:
     for ch in chunks:
         ok, reason = validate_chunk(ch["code"], target)
         validation_results.append({"id": ch["id"], "validated": ok, "reason": reason})
+        emit(state.get("job_id"), "chunk", id=ch["id"],
+             state="validated" if ok else "failed", reason=reason)
         if not ok:
             failed_chunks.append(ch["id"])
+    job_checkpoint.save_chunks(state.get("job_id"), [
+        {"chunk_id": v["id"], "stage": "validated" if v["validated"] else "invalid",
+         "reason": v["reason"]} for v in validation_results])
+    pending = state.get("cache_pending") or {}
+    for v in validation_results:
+        if v["validated"] and v["id"] in pending:
+            chunk_cache.promote(pending.pop(v["id"]))
 
     # update CSV (column names preserved)
     if csv_path.exists():
@@ -0,0 +1,13 @@
+# backend/benchmarks/__init__.py
+"""End-to-end pipeline benchmarks.
+
+* ``corpus``        – synthetic SAS / PL/SQL / Informatica / SQL sources of a
+                      given size, reproducible from a seed;
+* ``run_benchmark`` – drives ``build_graph()`` with the mock LLM and reports
+                      per-stage wall time, peak RSS and tokens, compared
+                      against the baselines stored in ``baselines/``.
+
+Run from ``backend/``::
+
+    python -m benchmarks.run_benchmark --source sas --lines 10000
+"""
@@ -0,0 +1,255 @@
+# backend/benchmarks/corpus.py
+"""Synthetic source corpora for the pipeline benchmarks.
+
+Each generator emits self-contained *units* (a macro, a DATA/PROC step, a
+package, a mapping …) drawn from a seeded RNG until the requested line count
+is reached, so the same ``(kind, lines, seed)`` always yields the same text
+and the chunkers see realistic boundaries at every size from 1k to 1M lines.
+
+    python -m benchmarks.corpus --kind sas --lines 100000 -o /tmp/big.sas
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+KINDS = ("sas", "plsql", "informatica", "sql")
+EXTENSIONS = {"sas": ".sas", "plsql": ".sql", "informatica": ".xml", "sql": ".sql"}
+
+_COLS  = ("cust_id", "acct_id", "txn_dt", "amount", "balance", "region",
+          "segment", "status", "product_cd", "branch_id", "open_dt", "score")
+_TYPES = ("NUMBER", "VARCHAR2(40)", "DATE", "NUMBER(12,2)")
+
+
+def _cols(rng: random.Random, n: int) -> List[str]:
+    return rng.sample(_COLS, n)
+
+
+# ── SAS ──────────────────────────────────────────────────────
+def _sas_macro(rng: random.Random, i: int) -> List[str]:
+    c = _cols(rng, 3)
+    return [
+        f"%macro summarise_{i}(ds=, by={c[0]}, out=work.summ_{i});",
+        "  %local n;",
+        f"  %let n = %sysfunc(countw(&by));",
+        "  %do j = 1 %to &n;",
+        f"    proc means data=&ds noprint nway;",
+        "      class %scan(&by, &j);",
+        f"      var {c[1]} {c[2]};",
+        "      output out=&out._&j sum= mean= / autoname;",
+        "    run;",
+        "  %end;",
+        f"%mend summarise_{i};",
+        "",
+    ]
+
+def _sas_data(rng: random.Random, i: int) -> List[str]:
+    c = _cols(rng, 4)
+    lines = [f"data work.stage_{i};",
+             f"  set lib.src_{rng.randrange(50)} (keep={' '.join(c)});",
+             f"  retain run_total_{i} 0;"]
+    for k in range(rng.randint(2, 6)):
+        lines += [f"  if {c[k % 4]} > {rng.randint(0, 999)} then do;",
+                  f"    flag_{k} = 1;",
+                  f"    run_total_{i} + {c[1]};",
+                  "  end;",
+                  f"  else flag_{k} = 0;"]
+    lines += [f"  format {c[2]} date9.;", "run;", ""]
+    return lines
+
+def _sas_proc(rng: random.Random, i: int) -> List[str]:
+    c = _cols(rng, 3)
+    kind = rng.choice(("sql", "sort", "freq"))
+    if kind == "sql":
+        return [ "proc sql;",
+                f"  create table work.join_{i} as",
+                f"  select a.{c[0]}, a.{c[1]}, sum(b.{c[2]}) as total_{c[2]}",
+                f"  from work.stage_{i} a",
+                f"  left join lib.dim_{rng.randrange(20)} b on a.{c[0]} = b.{c[0]}",
+                f"  where a.{c[1]} is not missing",
+                f"  group by a.{c[0]}, a.{c[1]};",
+                 "quit;", ""]
+    if kind == "sort":
+        return [f"proc sort data=work.stage_{i} out=work.sorted_{i} nodupkey;",
+                f"  by {c[0]} descending {c[1]};", "run;", ""]
+    return [f"proc freq data=work.stage_{i};",
+            f"  tables {c[0]}*{c[1]} / nocol nopercent;", "run;", ""]
+
+def _sas(rng: random.Random) -> Iterator[List[str]]:
+    yield ["/* synthetic SAS benchmark program */",
+           "options mprint symbolgen;",
+           "libname lib '/data/warehouse';", ""]
+    i = 0
+    while True:
+        i += 1
+        roll = rng.random()
+        if roll < 0.05:
+            yield [f"%include \"/shared/macros/common_{rng.randrange(10)}.sas\";", ""]
+        elif roll < 0.20:
+            yield _sas_macro(rng, i)
+        elif roll < 0.30:
+            yield [f"%summarise_{max(1, i - rng.randint(1, 10))}(ds=work.stage_{i - 1}, "
+                   f"by={' '.join(_cols(rng, 2))});", ""]
+        elif roll < 0.65:
+            yield _sas_data(rng, i)
+        else:
+            yield _sas_proc(rng, i)
+
+
+# ── PL/SQL ───────────────────────────────────────────────────
+def _plsql(rng: random.Random) -> Iterator[List[str]]:
+    i = 0
+    while True:
+        i += 1
+        procs = [f"load_{i}_{k}" for k in range(rng.randint(2, 5))]
+        spec = [f"CREATE OR REPLACE PACKAGE pkg_etl_{i} AS"]
+        spec += [f"  PROCEDURE {p}(p_run_dt IN DATE);" for p in procs]
+        spec += [f"END pkg_etl_{i};", "/", ""]
+
+        body = [f"CREATE OR REPLACE PACKAGE BODY pkg_etl_{i} AS"]
+        for p in procs:
+            c = _cols(rng, 3)
+            t = rng.randrange(40)
+            body += [
+                f"  PROCEDURE {p}(p_run_dt IN DATE) IS",
+                f"    CURSOR c_src IS SELECT {', '.join(c)} FROM stg_{t} WHERE load_dt = p_run_dt;",
+                f"    v_cnt NUMBER := 0;",
+                "  BEGIN",
+                "    FOR r IN c_src LOOP",
+                f"      IF r.{c[1]} IS NOT NULL THEN",
+                f"        MERGE INTO dw_{t} d USING (SELECT r.{c[0]} AS k FROM dual) s",
+                f"          ON (d.{c[0]} = s.k)",
+                f"        WHEN MATCHED THEN UPDATE SET d.{c[2]} = r.{c[2]}",
+                f"        WHEN NOT MATCHED THEN INSERT ({c[0]}, {c[2]}) VALUES (r.{c[0]}, r.{c[2]});",
+                "        v_cnt := v_cnt + 1;",
+                "      END IF;",
+                "    END LOOP;",
+                "    COMMIT;",
+                f"    dbms_output.put_line('{p}: ' || v_cnt);",
+                "  EXCEPTION",
+                "    WHEN OTHERS THEN",
+                "      ROLLBACK;",
+                "      RAISE;",
+                f"  END {p};",
+                "",
+            ]
+        body += [f"END pkg_etl_{i};", "/", ""]
+        yield spec + body
+
+
+# ── Informatica ──────────────────────────────────────────────
+def _infa_fields(tag: str, cols: List[str], rng: random.Random) -> List[str]:
+    return [f'        <{tag} NAME="{c.upper()}" DATATYPE="{rng.choice(_TYPES)}" '
+            f'NULLABLE="NULL" FIELDNUMBER="{n}"/>' for n, c in enumerate(cols, 1)]
+
+def _informatica(rng: random.Random) -> Iterator[List[str]]:
+    yield ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<POWERMART CREATION_DATE="01/01/2024 00:00:00" REPOSITORY_VERSION="187.96">',
+           '  <REPOSITORY NAME="REP_BENCH" VERSION="187" CODEPAGE="UTF-8" DATABASETYPE="Oracle">',
+           '    <FOLDER NAME="BENCH" SHARED="NOTSHARED">']
+    i = 0
+    while True:
+        i += 1
+        cols = _cols(rng, rng.randint(4, 8))
+        unit = [f'      <SOURCE NAME="SRC_{i}" DATABASETYPE="Oracle" OWNERNAME="STG">']
+        unit += _infa_fields("SOURCEFIELD", cols, rng)
+        unit += ['      </SOURCE>',
+                 f'      <TARGET NAME="TGT_{i}" DATABASETYPE="Oracle">']
+        unit += _infa_fields("TARGETFIELD", cols, rng)
+        unit += ['      </TARGET>',
+                 f'      <MAPPING NAME="m_load_{i}" ISVALID="YES">',
+                 f'        <TRANSFORMATION NAME="SQ_SRC_{i}" TYPE="Source Qualifier">']
+        unit += [f'          <TRANSFORMFIELD NAME="{c.upper()}" PORTTYPE="INPUT/OUTPUT"/>'
+                 for c in cols]
+        unit += [f'          <TABLEATTRIBUTE NAME="Source Filter" VALUE="{cols[0].upper()} &gt; 0"/>',
+                 '        </TRANSFORMATION>',
+                 f'        <TRANSFORMATION NAME="EXP_{i}" TYPE="Expression">']
+        unit += [f'          <TRANSFORMFIELD NAME="{c.upper()}_OUT" PORTTYPE="OUTPUT" '
+                 f'EXPRESSION="LTRIM(RTRIM({c.upper()}))"/>' for c in cols]
+        unit += ['        </TRANSFORMATION>']
+        if rng.random() < 0.5:
+            unit += [f'        <TRANSFORMATION NAME="FIL_{i}" TYPE="Filter">',
+                     f'          <TABLEATTRIBUTE NAME="Filter Condition" '
+                     f'VALUE="NOT ISNULL({cols[1].upper()}_OUT)"/>',
+                     '        </TRANSFORMATION>']
+        for c in cols:
+            unit.append(f'        <CONNECTOR FROMINSTANCE="SQ_SRC_{i}" FROMFIELD="{c.upper()}" '
+                        f'TOINSTANCE="EXP_{i}" TOFIELD="{c.upper()}"/>')
+            unit.append(f'        <CONNECTOR FROMINSTANCE="EXP_{i}" FROMFIELD="{c.upper()}_OUT" '
+                        f'TOINSTANCE="TGT_{i}" TOFIELD="{c.upper()}"/>')
+        unit += ['      </MAPPING>']
+        yield unit
+
+_INFA_FOOTER = ["    </FOLDER>", "  </REPOSITORY>", "</POWERMART>"]
+
+
+# ── generic SQL ──────────────────────────────────────────────
+def _sql(rng: random.Random) -> Iterator[List[str]]:
+    i = 0
+    while True:
+        i += 1
+        c = _cols(rng, 4)
+        kind = rng.choice(("ddl", "cte", "merge"))
+        if kind == "ddl":
+            cols = [f"  {col} {rng.choice(_TYPES)}," for col in c]
+            yield ([f"CREATE TABLE dw.fact_{i} ("] + cols +
+                   [f"  PRIMARY KEY ({c[0]})", ");", ""])
+        elif kind == "cte":
+            yield [f"INSERT INTO dw.agg_{i} ({c[0]}, {c[1]}, total)",
+                   "WITH base AS (",
+                   f"  SELECT {', '.join(c)}",
+                   f"  FROM stg.src_{rng.randrange(40)}",
+                   f"  WHERE {c[2]} >= DATE '2024-01-01'",
+                   "), ranked AS (",
+                   f"  SELECT b.*, ROW_NUMBER() OVER (PARTITION BY {c[0]} ORDER BY {c[2]} DESC) rn",
+                   "  FROM base b",
+                   ")",
+                   f"SELECT {c[0]}, {c[1]}, SUM({c[3]}) AS total",
+                   "FROM ranked WHERE rn = 1",
+                   f"GROUP BY {c[0]}, {c[1]};", ""]
+        else:
+            yield [f"MERGE INTO dw.dim_{i} t",
+                   f"USING stg.delta_{i} s ON (t.{c[0]} = s.{c[0]})",
+                   f"WHEN MATCHED THEN UPDATE SET t.{c[1]} = s.{c[1]}, t.{c[2]} = s.{c[2]}",
+                   f"WHEN NOT MATCHED THEN INSERT ({c[0]}, {c[1]}) VALUES (s.{c[0]}, s.{c[1]});",
+                   ""]
+
+
+_GENERATORS: Dict[str, Callable[[random.Random], Iterator[List[str]]]] = {
+    "sas": _sas, "plsql": _plsql, "informatica": _informatica, "sql": _sql,
+}
+
+
+def generate(kind: str, lines: int, seed: int = 0) -> str:
+    """Source of roughly *lines* lines (whole units, so it may run a little over)."""
+    kind = kind.lower()
+    if kind not in _GENERATORS:
+        raise ValueError(f"unknown corpus kind {kind!r} (expected one of {', '.join(KINDS)})")
+    rng    = random.Random(f"{kind}:{seed}")
+    footer = _INFA_FOOTER if kind == "informatica" else []
+    out: List[str] = []
+    for unit in _GENERATORS[kind](rng):
+        out.extend(unit)
+        if len(out) + len(footer) >= lines:
+            break
+    return "\n".join(out + footer) + "\n"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write a synthetic benchmark corpus")
+    ap.add_argument("--kind", choices=KINDS, default="sas")
+    ap.add_argument("--lines", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--out", help="output file (default: corpus_<kind>_<lines><ext>)")
+    args = ap.parse_args()
+
+    text = generate(args.kind, args.lines, args.seed)
+    path = Path(args.out or f"corpus_{args.kind}_{args.lines}{EXTENSIONS[args.kind]}")
+    path.write_text(text, encoding="utf-8")
+    print(f"✅ {path}: {text.count(chr(10))} lines, {len(text) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+# backend/benchmarks/load_test.py
+"""HTTP load harness for the conversion API.
+
+Signs up ``--users`` synthetic users, registers a ``mock`` credential for
+each, then runs them as closed-loop virtual users for ``--duration``
+seconds.  Each virtual user picks one of these calls per iteration, weighted
+by ``--mix``:
+
+* ``convert``  – ``POST /agent/convert`` with a synthetic corpus file;
+* ``status``   – ``GET /agent/status/{job}`` for one of its jobs;
+* ``estimate`` – ``POST /agent/estimate_cost``;
+* ``download`` – ``GET /agent/download_final/{job}`` for a finished job.
+
+Reported: throughput and p50/p95/p99 latency per endpoint, job completion
+times, and event-loop lag while the jobs run in ``conversion_runner``.
+
+Without ``--url`` the app is started in-process on uvicorn, in its own
+thread with a throwaway SQLite database and work directory; a monitor task
+on the server's loop then measures lag directly (how late a 50 ms sleep
+wakes up).  Against ``--url`` (a local ``uvicorn main:app`` started with
+``MOCK_LLM_ENABLED=true``) lag can only be seen from outside, via the
+latency of ``GET /``, which is reported for both modes.
+
+    python -m benchmarks.load_test --users 20 --duration 60
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.corpus import EXTENSIONS, KINDS, generate
+from benchmarks.run_benchmark import SOURCE_FOR_KIND
+
+LAG_INTERVAL_SEC = 0.05
+PROBE_INTERVAL_SEC = 0.25
+DEFAULT_MIX = "convert=1,status=6,estimate=2,download=1"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; ``None`` for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _summary(values: List[float], scale: float = 1000.0) -> Dict:
+    ms = lambda v: round(v * scale, 1) if v is not None else None
+    return {"count": len(values), "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)), "p99": ms(percentile(values, 99)),
+            "max": ms(max(values) if values else None)}
+
+
+# ── in-process server ────────────────────────────────────────
+class LocalServer:
+    """``main:app`` on uvicorn in a background thread, isolated from the tree."""
+
+    def __init__(self, mock_latency_ms: float):
+        self.workdir = Path(tempfile.mkdtemp(prefix="scintiai_load_"))
+        self.mock_latency_ms = mock_latency_ms
+        self.lag: List[float] = []
+        self.port = self._free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    async def _monitor_lag(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL_SEC)
+            self.lag.append(max(0.0, time.perf_counter() - t0 - LAG_INTERVAL_SEC))
+
+    def start(self) -> None:
+        # the engines are built when ``db`` is imported, so settle the settings first
+        from config import settings
+        settings.DATABASE_URL        = f"sqlite+aiosqlite:///{self.workdir / 'load.db'}"
+        settings.SYNC_DATABASE_URL   = f"sqlite:///{self.workdir / 'load.db'}"
+        settings.MOCK_LLM_ENABLED    = True
+        settings.MOCK_LLM_LATENCY_MS = self.mock_latency_ms
+        settings.CHUNK_CACHE_ENABLED = False
+
+        import uvicorn
+        import db
+        from main import app                # mounts ./static, so import from backend/
+        db.engine.echo = False
+        (self.workdir / "static").mkdir()
+        os.chdir(self.workdir)              # nodes write rule_outputs/ into the cwd
+        from agents import llm_rule_agent   # … except llm_rule_node (absolute RULE_DIR)
+        llm_rule_agent.RULE_DIR = self.workdir / "rule_outputs"
+        llm_rule_agent.RULE_DIR.mkdir(exist_ok=True)
+
+        @app.on_event("startup")
+        async def _lag_monitor():
+            asyncio.get_running_loop().create_task(self._monitor_lag())
+
+        self._server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("in-process server did not start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+
+
+# ── load ─────────────────────────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.job_submitted: Dict[str, float] = {}
+        self.job_done: Dict[str, float] = {}
+        self.job_failed: Dict[str, str] = {}
+
+    async def call(self, name: str, coro):
+        t0 = time.perf_counter()
+        try:
+            resp = await coro
+        except httpx.HTTPError as e:
+            self.errors[name][type(e).__name__] += 1
+            return None
+        self.latency[name].append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            self.errors[name][str(resp.status_code)] += 1
+        return resp
+
+
+class VirtualUser:
+    def __init__(self, n: int, client: httpx.AsyncClient, rec: Recorder, args,
+                 upload: bytes, rng: random.Random):
+        self.n, self.client, self.rec, self.args = n, client, rec, args
+        self.upload = upload
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.cred_id: Optional[int] = None
+        self.running: List[str] = []
+        self.finished: List[str] = []
+
+    async def setup(self) -> None:
+        email = f"load-{self.args.run_id}-{self.n}@loadtest.dev"
+        body = {"email": email, "password": "load-test-pw"}
+        r = await self.client.post("/auth/signup", json=body)
+        r.raise_for_status()
+        r = await self.client.post("/auth/login", json=body)
+        r.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        r = await self.client.post("/settings/llm", headers=self.headers, json={
+            "provider": "mock", "name": "load-test", "MODEL_NAME": self.args.model})
+        r.raise_for_status()
+        self.cred_id = r.json()["id"]
+
+    def _form(self):
+        kind = self.args.source
+        files = {"file": (f"load_{self.n}{EXTENSIONS[kind]}", self.upload, "text/plain")}
+        data = {"llm_cred_id": str(self.cred_id), "source": SOURCE_FOR_KIND[kind],
+                "ddl_type": "general", "target": self.args.target}
+        return files, data
+
+    async def convert(self) -> None:
+        if len(self.running) >= self.args.max_jobs_per_user:
+            return await self.status()
+        files, data = self._form()
+        r = await self.rec.call("convert", self.client.post(
+            "/agent/convert", headers=self.headers, files=files, data=data))
+        if r is not None and r.status_code == 200:
+            job = r.json()["job_id"]
+            self.rec.job_submitted[job] = time.perf_counter()
+            self.running.append(job)
+
+    async def status(self) -> None:
+        if not self.running:
+            return await self.estimate()
+        job = self.rng.choice(self.running)
+        r = await self.rec.call("status", self.client.get(f"/agent/status/{job}"))
+        if r is None or r.status_code != 200:
+            return
+        st = r.json()["status"]
+        if st in ("finished", "failed", "stopped"):
+            self.running.remove(job)
+            self.rec.job_done[job] = time.perf_counter()
+            if st == "finished":
+                self.finished.append(job)
+            else:
+                self.rec.job_failed[job] = r.json().get("error") or st
+
+    async def estimate(self) -> None:
+        files, data = self._form()
+        await self.rec.call("estimate", self.client.post(
+            "/agent/estimate_cost", headers=self.headers, files=files, data=data))
+
+    async def download(self) -> None:
+        if not self.finished:
+            return await self.status()
+        job = self.rng.choice(self.finished)
+        await self.rec.call("download", self.client.get(f"/agent/download_final/{job}"))
+
+    async def run(self, until: float, mix: Dict[str, int]) -> None:
+        ops, weights = list(mix), list(mix.values())
+        while time.perf_counter() < until:
+            await getattr(self, self.rng.choices(ops, weights)[0])()
+            if self.args.think_ms:
+                await asyncio.sleep(self.rng.expovariate(1000 / self.args.think_ms))
+
+
+async def _probe(client: httpx.AsyncClient, samples: List[float], until: float) -> None:
+    while time.perf_counter() < until:
+        t0 = time.perf_counter()
+        with contextlib.suppress(httpx.HTTPError):
+            await client.get("/")
+            samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(PROBE_INTERVAL_SEC)
+
+
+async def run_load(base_url: str, args, lag: Optional[List[float]]) -> Dict:
+    mix = {k: int(v) for k, v in (p.split("=") for p in args.mix.split(","))}
+    upload = generate(args.source, args.lines, args.seed).encode("utf-8")
+    limits = httpx.Limits(max_connections=args.users + 4, max_keepalive_connections=args.users + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        rng = random.Random(args.seed)
+        rec = Recorder()
+        users = [VirtualUser(i, client, rec, args, upload, random.Random(rng.random()))
+                 for i in range(args.users)]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(u.setup() for u in users))
+        setup_sec = time.perf_counter() - t0
+
+        if lag is not None:
+            lag.clear()                     # only the loaded phase counts
+        probe: List[float] = []
+        start = time.perf_counter()
+        until = start + args.duration
+        await asyncio.gather(_probe(client, probe, until),
+                             *(u.run(until, mix) for u in users))
+        elapsed = time.perf_counter() - start
+        loop_lag = list(lag) if lag is not None else []
+
+        # let the jobs that are still running finish so completion times are complete
+        drain_until = time.perf_counter() + args.drain
+        while any(u.running for u in users) and time.perf_counter() < drain_until:
+            await asyncio.gather(*(u.status() for u in users if u.running))
+            await asyncio.sleep(0.5)
+
+    job_times = [rec.job_done[j] - rec.job_submitted[j]
+                 for j in rec.job_done if j in rec.job_submitted and j not in rec.job_failed]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "setup_sec": round(setup_sec, 2),
+        "duration_sec": round(elapsed, 2),
+        "endpoints": {
+            name: {**_summary(lat), "rps": round(len(lat) / elapsed, 2),
+                   "errors": dict(rec.errors.get(name, {}))}
+            for name, lat in sorted(rec.latency.items())
+        },
+        "jobs": {
+            "submitted": len(rec.job_submitted),
+            "finished": len(job_times),
+            "failed": len(rec.job_failed),
+            "unfinished": len(rec.job_submitted) - len(rec.job_done),
+            "per_min": round(len(job_times) / elapsed * 60, 2),
+            "completion_sec": _summary(job_times, scale=1.0),
+            "errors": sorted(set(rec.job_failed.values()))[:5],
+        },
+        "probe_ms": _summary(probe),
+        "event_loop_lag_ms": _summary(loop_lag) if lag is not None else None,
+    }
+
+
+def print_report(res: Dict) -> None:
+    head = ["endpoint", "count", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors"]
+    rows = [[name, e["count"], e["rps"], e["p50"], e["p95"], e["p99"], e["max"],
+             sum(e["errors"].values())] for name, e in res["endpoints"].items()]
+    p = res["probe_ms"]
+    rows.append(["GET / (probe)", p["count"], "-", p["p50"], p["p95"], p["p99"], p["max"], "-"])
+    widths = [max(len(str(x)) for x in col) for col in zip(head, *rows)]
+    for row in [head] + rows:
+        print("  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
+
+    j = res["jobs"]
+    c = j["completion_sec"]
+    print(f"\njobs: {j['submitted']} submitted, {j['finished']} finished, {j['failed']} failed, "
+          f"{j['unfinished']} unfinished – {j['per_min']}/min; "
+          f"completion p50 {c['p50']}s p95 {c['p95']}s p99 {c['p99']}s")
+    for err in j["errors"]:
+        print(f"   ❌ {err}")
+    lag = res["event_loop_lag_ms"]
+    if lag:
+        print(f"event-loop lag: p50 {lag['p50']}ms p95 {lag['p95']}ms "
+              f"p99 {lag['p99']}ms max {lag['max']}ms ({lag['count']} samples)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Concurrent-user load test for the conversion API")
+    ap.add_argument("--url", help="target a running server instead of starting one in-process")
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    ap.add_argument("--drain", type=float, default=60.0,
+                    help="seconds to wait for running jobs afterwards")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="weights, e.g. " + DEFAULT_MIX)
+    ap.add_argument("--think-ms", type=float, default=100.0, help="mean pause between calls")
+    ap.add_argument("--max-jobs-per-user", type=int, default=2)
+    ap.add_argument("--source", choices=KINDS, default="sas")
+    ap.add_argument("--lines", type=int, default=300, help="size of the uploaded file")
+    ap.add_argument("--target", default="pyspark")
+    ap.add_argument("--model", default="gpt-4o")
+    ap.add_argument("--mock-latency-ms", type=float, default=250.0,
+                    help="mock LLM latency (in-process server only)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--server-log", help="in-process server output (default: <workdir>/server.log)")
+    ap.add_argument("--json", help="write the full results here")
+    args = ap.parse_args(argv)
+    args.run_id = f"{int(time.time())}{os.getpid()}"
+    cwd = os.getcwd()
+
+    if args.url:
+        res = asyncio.run(run_load(args.url, args, None))
+    else:
+        server = LocalServer(args.mock_latency_ms)
+        log_path = Path(args.server_log).resolve() if args.server_log else server.workdir / "server.log"
+        print(f"🚀 in-process server in {server.workdir} (output → {log_path})")
+        with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+            try:
+                server.start()
+                res = asyncio.run(run_load(server.url, args, server.lag))
+            finally:
+                server.stop()
+                os.chdir(cwd)
+
+    print_report(res)
+    if args.json:
+        Path(cwd, args.json).write_text(json.dumps(res, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
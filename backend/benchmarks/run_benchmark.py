@@ -0,0 +1,267 @@
+# backend/benchmarks/run_benchmark.py
+"""Run the full conversion graph on synthetic corpora with the mock LLM.
+
+For every ``(kind, lines)`` case the real ``build_graph()`` is streamed node
+by node, recording wall time and peak RSS after each stage plus the token
+usage from the optimizer report.  Results are printed as a table, can be
+written as JSON, and are compared with a stored baseline
+(``baselines/<name>.json``); metrics that got worse by more than
+``--threshold`` are flagged, and ``--fail-on-regression`` turns that into a
+non-zero exit code for CI.
+
+    python -m benchmarks.run_benchmark --source sas plsql --lines 1000 10000
+    python -m benchmarks.run_benchmark --lines 1000 --save-baseline
+
+The mock answers instantly by default (``--latency-ms 0``) so the numbers
+measure the pipeline itself; pass a latency to see scheduling effects.  The
+chunk cache is off unless ``--cache`` is given, otherwise every run after
+the first would be a cache hit.  Peak RSS is the process high-water mark,
+so for isolated memory numbers run one case per invocation.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource                      # POSIX
+except ImportError:                      # Windows
+    resource = None
+
+from benchmarks.corpus import KINDS, EXTENSIONS, generate
+from config import settings
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# corpus kind → the "source" selection the UI would send
+SOURCE_FOR_KIND = {"sas": "sas", "plsql": "plsql",
+                   "informatica": "informatica", "sql": "ms sql server"}
+
+# changes smaller than these never count as regressions (timer / allocator noise)
+_NOISE_FLOOR = {"sec": 0.05, "mb": 8.0, "tokens": 0}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water resident set size of this process, in MiB."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def _state(kind: str, code: str, args) -> Dict:
+    mock = {"latency_ms": args.latency_ms, "latency_dist": args.latency_dist,
+            "error_rate": args.error_rate, "throttle_rate": args.throttle_rate,
+            "seed": args.seed}
+    state = {
+        "sas_code":       code,
+        "source":         SOURCE_FOR_KIND[kind],
+        "ddl_type":       "general",
+        "target":         args.target,
+        "input_filename": f"bench_{kind}{EXTENSIONS[kind]}",
+        "input_basename": f"bench_{kind}",
+        "user_id":        0,
+        "llm_provider":   "mock",
+        "llm_cred":       {"model_name": args.model, "mock": mock},
+        "logs":           [],
+    }
+    if args.concurrency:
+        state["max_concurrency"] = args.concurrency
+    if args.chunk_tokens:
+        state["chunk_target_tokens"] = args.chunk_tokens
+    return state
+
+
+def run_case(kind: str, lines: int, args) -> Dict:
+    from graph.main_graph import build_graph
+
+    t0   = time.perf_counter()
+    code = generate(kind, lines, args.seed)
+    gen_sec = time.perf_counter() - t0
+
+    graph  = build_graph()
+    stages: Dict[str, Dict] = {}
+    final: Dict = {}
+    start = last = time.perf_counter()
+    for update in graph.stream(_state(kind, code, args), stream_mode="updates"):
+        now = time.perf_counter()
+        for node, out in update.items():
+            st = stages.setdefault(node, {"sec": 0.0, "calls": 0})
+            st["sec"]   = round(st["sec"] + now - last, 4)
+            st["calls"] += 1
+            st["peak_rss_mb"] = peak_rss_mb()
+            if out:
+                final = out
+        last = now
+    total = time.perf_counter() - start
+
+    report = final.get("report") or {}
+    usage  = report.get("llm_usage", {})
+    return {
+        "case":   f"{kind}-{lines}",
+        "kind":   kind,
+        "lines":  code.count("\n"),
+        "bytes":  len(code.encode("utf-8")),
+        "chunks": len(final.get("ast_blocks") or []),
+        "failed_chunks": len(final.get("failed_chunks") or []),
+        "trace":  final.get("graph_trace", []),
+        "corpus_sec":  round(gen_sec, 4),
+        "total_sec":   round(total, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "tokens": {
+            "input":        usage.get("input_tokens", 0),
+            "output":       usage.get("output_tokens", 0),
+            "total":        usage.get("total_tokens", 0),
+            "cached_input": usage.get("cached_input_tokens", 0),
+            "by_stage": {k: {"input": v.get("input", 0), "output": v.get("output", 0)}
+                         for k, v in (usage.get("by_stage") or {}).items()},
+        },
+    }
+
+
+# ── baselines ────────────────────────────────────────────────
+def _metrics(res: Dict) -> Dict[str, tuple]:
+    """Flat ``name → (value, unit)`` view used for comparison."""
+    m = {"total_sec": (res["total_sec"], "sec"),
+         "peak_rss_mb": (res["peak_rss_mb"], "mb"),
+         "tokens.total": (res["tokens"]["total"], "tokens")}
+    for node, st in res["stages"].items():
+        m[f"stage.{node}.sec"] = (st["sec"], "sec")
+    return m
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    cases = baseline.get("cases", {})
+    for res in results:
+        base = cases.get(res["case"])
+        if not base:
+            print(f"ℹ️  {res['case']}: no baseline")
+            continue
+        old = _metrics(base)
+        for name, (value, unit) in _metrics(res).items():
+            if name not in old or value is None or old[name][0] is None:
+                continue
+            prev  = old[name][0]
+            delta = value - prev
+            if delta > _NOISE_FLOOR[unit] and delta > prev * threshold:
+                pct = f"{delta / prev:+.0%}" if prev else "new"
+                regressions.append(f"{res['case']} {name}: {prev} → {value} ({pct})")
+    return regressions
+
+
+def _environment() -> Dict:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "recorded_at": datetime.now().isoformat(timespec="seconds")}
+
+
+def save_baseline(results: List[Dict], name: str) -> Path:
+    path = BASELINE_DIR / f"{name}.json"
+    data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"cases": {}}
+    data["environment"] = _environment()
+    data["cases"].update({r["case"]: r for r in results})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return path
+
+
+# ── output ───────────────────────────────────────────────────
+def print_table(results: List[Dict]) -> None:
+    nodes = []
+    for r in results:
+        nodes += [n for n in r["stages"] if n not in nodes]
+    head = ["case", "lines", "chunks", "total_s"] + [f"{n}_s" for n in nodes] + ["rss_mb", "tokens"]
+    rows = [[r["case"], r["lines"], r["chunks"], f"{r['total_sec']:.2f}"]
+            + [f"{r['stages'][n]['sec']:.2f}" if n in r["stages"] else "-" for n in nodes]
+            + [r["peak_rss_mb"] if r["peak_rss_mb"] is not None else "-", r["tokens"]["total"]]
+            for r in results]
+    widths = [max(len(str(x)) for x in col) for col in zip(head, *rows)]
+    for row in [head] + rows:
+        print("  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark build_graph() with the mock LLM")
+    ap.add_argument("--source", nargs="+", choices=KINDS, default=list(KINDS))
+    ap.add_argument("--lines", nargs="+", type=int, default=[1000])
+    ap.add_argument("--target", default="pyspark")
+    ap.add_argument("--model", default="gpt-4o")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--latency-dist", default="fixed")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, default=0, help="per-job cap (0 = settings default)")
+    ap.add_argument("--chunk-tokens", type=int, default=0, help="override the chunk token window")
+    ap.add_argument("--cache", action="store_true", help="leave the chunk cache enabled")
+    ap.add_argument("--baseline", default="default", help="baseline name under benchmarks/baselines")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.25, help="relative slowdown that counts")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--json", help="write the full results here")
+    args = ap.parse_args(argv)
+
+    settings.CHUNK_CACHE_ENABLED = args.cache
+    settings.LLM_FIXTURE_RECORD_DIR = ""
+
+    # nodes write rule_outputs/ etc. relative to the cwd, llm_rule_node into its
+    # absolute RULE_DIR – point both at a tempdir to keep that out of the tree
+    from agents import llm_rule_agent
+    workdir  = tempfile.mkdtemp(prefix="scintiai_bench_")
+    cwd      = os.getcwd()
+    rule_dir = llm_rule_agent.RULE_DIR
+    llm_rule_agent.RULE_DIR = Path(workdir) / "rule_outputs"
+    llm_rule_agent.RULE_DIR.mkdir()
+    os.chdir(workdir)
+    results = []
+    try:
+        for kind in args.source:
+            for lines in args.lines:
+                print(f"⏱️  {kind} × {lines} lines")
+                results.append(run_case(kind, lines, args))
+    finally:
+        os.chdir(cwd)
+        llm_rule_agent.RULE_DIR = rule_dir
+
+    print()
+    print_table(results)
+    print(f"\n(work files in {workdir})")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    status = 0
+    base_path = BASELINE_DIR / f"{args.baseline}.json"
+    if base_path.exists():
+        baseline = json.loads(base_path.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs baseline '{args.baseline}' "
+                  f"(recorded {baseline.get('environment', {}).get('recorded_at', '?')}):")
+            for line in regressions:
+                print(f"   {line}")
+            status = 1 if args.fail_on_regression else 0
+        else:
+            print(f"\n✅ within {args.threshold:.0%} of baseline '{args.baseline}'")
+
+    if args.save_baseline:
+        print(f"💾 baseline saved to {save_baseline(results, args.baseline)}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
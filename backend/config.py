@@ -8,6 +8,80 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///./test.db"
     JWT_SECRET_KEY: str = "supersecret"
     ALGORITHM: str = "HS256"
+    SYNC_DATABASE_URL: str = ""   # blocking URL for graph nodes; derived from DATABASE_URL if empty
+
+    # LLM fan-out (chunks converted in parallel)
+    LLM_MAX_CONCURRENCY_PER_JOB: int = 8          # default, overridable per job
+    LLM_MAX_CONCURRENCY_PER_CREDENTIAL: int = 16  # shared by all jobs on one credential
+
+    # Per-credential rate limiting (process-wide, see agents/utils/rate_limiter.py)
+    LLM_RATE_LIMIT_RPM: int = 0           # requests/min per credential, 0 = unlimited
+    LLM_RATE_LIMIT_TPM: int = 0           # tokens/min (prompt + completion), 0 = unlimited
+    LLM_MAX_RETRIES: int = 4              # retries of 429 / transient errors per call
+    LLM_RETRY_BASE_SEC: float = 1.0       # backoff base (full jitter, doubles per retry)
+    LLM_RETRY_MAX_SEC: float = 30.0
+    LLM_LATENCY_TARGET_SEC: float = 60.0  # slower calls shrink the window, 0 = off
+
+    # Hedged chunk calls and per-chunk deadlines (agents/utils/hedging.py)
+    LLM_HEDGE_ENABLED: bool = False          # needs a distinct hedge credential on the job
+    LLM_HEDGE_MAX_RATE: float = 0.1          # at most this share of recent calls is hedged
+    LLM_HEDGE_MIN_SAMPLES: int = 20          # observed latencies before the prior is rescaled
+    LLM_EXPECTED_BASE_SEC: float = 3.0       # prior p95 = base + output tokens / tokens-per-sec
+    LLM_EXPECTED_TOKENS_PER_SEC: float = 40.0
+    LLM_CHUNK_DEADLINE_FACTOR: float = 0.0   # deadline = factor × p95, 0 = no deadline
+    LLM_CHUNK_DEADLINE_MIN_SEC: float = 60.0
+
+    # Credential pools – circuit breaker per credential (agents/utils/credential_pool.py)
+    LLM_BREAKER_FAILURES: int = 5            # consecutive failed calls that open it
+    LLM_BREAKER_COOLDOWN_SEC: float = 30.0   # then one probe call decides
+
+    # Mock LLM provider ("mock") for offline benchmarks – see agents/utils/mock_llm.py
+    MOCK_LLM_ENABLED: bool = False          # allow "mock" / "replay" credentials via /settings/llm
+    MOCK_LLM_MODE: str = "echo"             # echo | canned
+    MOCK_LLM_LATENCY_MS: float = 250.0
+    MOCK_LLM_LATENCY_DIST: str = "lognormal"  # fixed | uniform | exponential | lognormal
+    MOCK_LLM_TOKENS_PER_SEC: float = 0.0    # 0 = instant generation
+    MOCK_LLM_ERROR_RATE: float = 0.0
+    MOCK_LLM_THROTTLE_RATE: float = 0.0
+    MOCK_LLM_SEED: int = 0
+
+    # LLM fixtures – record every agent call / replay them (provider "replay")
+    LLM_FIXTURE_RECORD_DIR: str = ""        # record into this store when set
+    LLM_FIXTURE_REPLAY_DIR: str = ""        # default store for "replay" credentials
+    LLM_FIXTURE_REPLAY_SPEED: float = 1.0   # recorded latency multiplier, 0 = instant
+
+    # Token-aware re-chunking in parse_node (window per model, see model_registry)
+    CHUNK_TOKEN_SIZING: bool = True
+
+    # Packing of small chunks into one request (off by default, per-job override)
+    LLM_PACK_SMALL_CHUNKS: bool = False
+    LLM_PACK_TOKEN_BUDGET: int = 3000        # source tokens per packed request
+    LLM_PACK_SMALL_CHUNK_TOKENS: int = 400   # only chunks at or below this are packed
+    LLM_PACK_MAX_CHUNKS: int = 12
+
+    # Complexity-based model routing (per-user rules in /settings/routing)
+    MODEL_ROUTING_ENABLED: bool = True      # master switch; users without rules are never routed
+
+    # Deterministic fast path: chunks inside a known subset skip the LLM
+    # (SAS: agents/utils/sas_rules.py, SQL sources: agents/utils/sql_transpile.py),
+    # per-job override
+    RULE_FAST_PATH_ENABLED: bool = True
+
+    # Informatica exports reach the LLM as compact per-pipeline IR, not raw XML
+    # (agents/utils/informatica_ir.py)
+    INFORMATICA_COMPACT_IR: bool = True
+    # DataStage DSX/XML exports are parsed into stage-group chunks in link order
+    # (agents/utils/datastage_parser.py)
+    DATASTAGE_STAGE_CHUNKING: bool = True
+
+    # Chunk conversion cache
+    CHUNK_CACHE_ENABLED: bool = True
+    CHUNK_CACHE_MAX_BYTES_PER_TENANT: int = 256 * 1024 * 1024   # LRU-evicted above this
+
+    # Job / chunk checkpoints (services/job_checkpoint.py)
+    JOB_CHECKPOINT_ENABLED: bool = True
+    JOB_RESUME_ON_STARTUP: bool = True      # restart jobs left unfinished by a restart
+    JOB_CHECKPOINT_RETENTION_DAYS: int = 7
 
     # Add other config variables as needed
     class Config:
@@ -1,8 +1,10 @@
 # backend/db.py
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from config import settings
 from models.user import Base
+import models.llm_credential, models.chunk_cache, models.job_checkpoint, models.routing_rule  # noqa: F401  (register tables on Base)
 
 # Create Async engine
 engine = create_async_engine(settings.DATABASE_URL, echo=True)
@@ -12,10 +14,39 @@ async_session = sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
 )
 
+# Blocking twin of the engine for graph nodes: they run in worker threads,
+# off the event loop, so they cannot await the async engine.
+_SYNC_DRIVERS = {
+    "sqlite+aiosqlite":   "sqlite",
+    "postgresql+asyncpg": "postgresql+psycopg",
+    "mysql+aiomysql":     "mysql+pymysql",
+    "mysql+asyncmy":      "mysql+pymysql",
+}
+
+def _sync_url(url: str) -> str:
+    if settings.SYNC_DATABASE_URL:
+        return settings.SYNC_DATABASE_URL
+    scheme, sep, rest = url.partition("://")
+    if sep and scheme in _SYNC_DRIVERS:
+        return f"{_SYNC_DRIVERS[scheme]}://{rest}"
+    raise RuntimeError(f"no blocking driver known for {scheme!r}; set SYNC_DATABASE_URL")
+
+_sync = _sync_url(settings.DATABASE_URL)
+sync_engine = create_engine(
+    _sync,
+    # sqlite: wait on writer lock instead of failing
+    connect_args={"timeout": 30} if _sync.startswith("sqlite") else {},
+)
+SyncSession = sessionmaker(sync_engine, expire_on_commit=False)
+
+def init_sync_db():
+    Base.metadata.create_all(sync_engine)
+
 async def init_db():
     async with engine.begin() as conn:
         # "run_sync" allows you to run regular sync operations in an async engine
         await conn.run_sync(Base.metadata.create_all)
+    init_sync_db()
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
@@ -3,6 +3,8 @@ from langgraph.graph import StateGraph, END
 
 # ── node imports ───────────────────────────────────────────────
 from agents.parse_agent      import parse_node
+from agents.template_agent   import template_node
+from agents.routing_agent    import routing_node
 from agents.llm_rule_agent   import llm_rule_node
 from agents.validate_agent   import validate_node
 from agents.optimize_agent   import optimize_node
@@ -20,6 +22,11 @@ class GraphState(TypedDict, total=False):
     pyspark_chunks: List[Dict[str, Any]]
     failed_chunks: List[str]
     chunk_status: List[Dict[str, Any]]
+    cache_stats: Dict[str, Any]   # chunk-cache hits / misses / coalesced
+    cache_pending: Dict[str, Dict[str, Any]]     # fresh conversions stored once validated
+    chunk_templates: Dict[str, Dict[str, Any]]   # duplicate id → representative
+    routing_rules: Dict[str, Any]                # per-user model routing (settings/routing)
+    chunk_routes: Dict[str, Dict[str, Any]]      # chunk id → tier / score / model
 
     # ── optimizer outputs ──
     before_code: str          # merged pre-optimization
@@ -41,13 +48,23 @@ class GraphState(TypedDict, total=False):
     # ── misc / tracing ──
     llm_provider: str
     llm_cred: Dict[str, Any]
+    llm_pool: List[Dict[str, Any]]    # [{"provider", "cred"}] chunks are spread over
+    hedge_llm_provider: str
+    hedge_llm_cred: Dict[str, Any]    # optional second credential for hedged calls
+    max_concurrency: int      # per-job cap on parallel LLM calls
+    pack_chunks: bool         # pack tiny chunks into shared requests
+    rule_fast_path: bool      # convert known constructs without the LLM
+    incremental_from: str     # prior job whose validated chunks are reused
+    chunk_target_tokens: int  # override the per-model chunk window
+    user_id: int              # tenant for the chunk cache
+    job_id: str               # conversion_runner job – keys the SSE event bus
     logs: List[str]
     graph_trace: List[str]
     rule_csv: str
 
 # ── routers ────────────────────────────────────────────────────
-def route_after_parse(st: GraphState) -> Literal["llm_rule", "feedback"]:
-    return "llm_rule" if st.get("ast_blocks") else "feedback"
+def route_after_parse(st: GraphState) -> Literal["template", "feedback"]:
+    return "template" if st.get("ast_blocks") else "feedback"
 
 def route_after_llm_rule(st: GraphState) -> Literal["validate", "feedback"]:
     return "feedback" if st.get("failed_chunks") else "validate"
@@ -68,6 +85,8 @@ def build_graph() -> StateGraph:
     g = StateGraph(GraphState)
 
     g.add_node("parse",     parse_node)
+    g.add_node("template",  template_node)
+    g.add_node("route",     routing_node)
     g.add_node("llm_rule",  llm_rule_node)
     g.add_node("validate",  validate_node)
     g.add_node("optimize",  optimize_node)
@@ -77,8 +96,10 @@ def build_graph() -> StateGraph:
 
     g.add_conditional_edges(
         "parse", route_after_parse,
-        {"llm_rule": "llm_rule", "feedback": "feedback"}
+        {"template": "template", "feedback": "feedback"}
     )
+    g.add_edge("template", "route")
+    g.add_edge("route",    "llm_rule")
     g.add_conditional_edges(
         "llm_rule", route_after_llm_rule,
         {"validate": "validate", "feedback": "feedback"}
@@ -5,7 +5,13 @@ from starlette.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import settings
-from db import init_db
+from sqlalchemy import select
+
+from db import init_db, async_session
+from models.llm_credential import LLMCredential
+from agents.llm_rule_agent import warm_prompt_cache
+from agents.utils import llm_clients
+from tasks.conversion_runner import resume_unfinished
 from routers import auth, agent_manager, settings as settings_router
 
 
@@ -41,6 +47,12 @@ app = create_app()
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    print(f"Prompt cache warmed: {warm_prompt_cache()} templates")
+    async with async_session() as session:
+        rows = (await session.execute(select(LLMCredential))).scalars().all()
+    creds = [{"provider": r.provider, **llm_clients.credential_dict(r)} for r in rows]
+    print(f"LLM clients warmed: {llm_clients.warm(creds)}/{len(creds)} credentials")
+    print(f"Jobs resumed from checkpoint: {await resume_unfinished()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+# backend/models/chunk_cache.py
+from sqlalchemy import (Column, Integer, String, Text, DateTime, func,
+                        UniqueConstraint, Index)
+from .user import Base
+
+class ChunkCacheEntry(Base):
+    __tablename__ = "chunk_cache"
+
+    id             = Column(Integer, primary_key=True, index=True)
+    tenant         = Column(String, nullable=False)         # user id the entry belongs to
+    cache_key      = Column(String(64), nullable=False)     # sha256 of code + conversion settings
+
+    source         = Column(String)
+    target         = Column(String)
+    ddl_type       = Column(String)
+    model_name     = Column(String)
+    prompt_version = Column(String)
+
+    output         = Column(Text, nullable=False)
+    input_tokens   = Column(Integer, default=0)
+    output_tokens  = Column(Integer, default=0)
+    size_bytes     = Column(Integer, default=0)
+    hits           = Column(Integer, default=0)
+
+    created_at     = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at   = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (
+        UniqueConstraint("tenant", "cache_key", name="uq_chunk_cache_tenant_key"),
+        Index("ix_chunk_cache_tenant_last_used", "tenant", "last_used_at"),
+    )
@@ -0,0 +1,42 @@
+# backend/models/job_checkpoint.py
+from sqlalchemy import (Column, Integer, String, Text, Boolean, DateTime, func,
+                        UniqueConstraint)
+from .user import Base
+
+class ConversionJob(Base):
+    __tablename__ = "conversion_jobs"
+
+    job_id      = Column(String(32), primary_key=True)
+    user_id     = Column(Integer, index=True)
+    status      = Column(String, nullable=False, default="queued", index=True)
+    step        = Column(String, default="waiting")
+    error       = Column(Text, default="")
+
+    llm_cred_id = Column(Integer)                 # reloaded on resume (secrets stay in llm_credentials)
+    state_json  = Column(Text, nullable=False)    # input state without the credential
+    ast_json    = Column(Text)                    # parse output, so a resume skips parse
+
+    created_at  = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at  = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class JobChunk(Base):
+    __tablename__ = "job_chunks"
+
+    id            = Column(Integer, primary_key=True, index=True)
+    job_id        = Column(String(32), nullable=False, index=True)
+    chunk_id      = Column(String, nullable=False)
+
+    stage         = Column(String, nullable=False)   # converted | validated | invalid | fixed | manual
+    ok            = Column(Boolean, default=True)
+    code          = Column(Text)                     # converted code
+    fixed_code    = Column(Text)                     # feedback output
+    reason        = Column(Text)                     # last validation message
+    input_tokens  = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+
+    updated_at    = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "chunk_id", name="uq_job_chunks_job_chunk"),
+    )
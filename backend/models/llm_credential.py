@@ -8,7 +8,7 @@ class LLMCredential(Base):
 
     id           = Column(Integer, primary_key=True, index=True)
     user_id      = Column(Integer, ForeignKey("users.id"), nullable=False)
-    provider     = Column(String, nullable=False)           # "azureopenai" or "gemini"
+    provider     = Column(String, nullable=False)           # "azureopenai", "gemini", "mock" or "replay"
     name         = Column(String, nullable=False)           # Friendly label shown in UI
 
     # Azure fields
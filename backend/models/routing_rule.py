@@ -0,0 +1,12 @@
+# backend/models/routing_rule.py
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, func
+from .user import Base
+
+class RoutingRule(Base):
+    __tablename__ = "routing_rules"
+
+    id         = Column(Integer, primary_key=True, index=True)
+    user_id    = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
+    rules_json = Column(Text, nullable=False)     # see agents/utils/chunk_routing.py
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
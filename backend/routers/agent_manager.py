@@ -121,16 +121,29 @@
 # backend/routers/agent_manager.py
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Body, Request, Response
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from sse_starlette.sse import EventSourceResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-import tempfile, os, json, ast
+import tempfile, os, json, ast, asyncio
 from pathlib import Path
 import io
 
+from config import settings
 from db import get_session
 from models.llm_credential import LLMCredential
 from dependencies.auth_dependencies import get_current_user
-from tasks.conversion_runner import submit_job, get_job, stop_job
+from tasks.conversion_runner import (submit_job, get_job, stop_job, resume_job, rerun_chunk,
+                                     partial_chunks)
+from tasks.job_events import get_bus
+from agents.utils.rate_limiter import limiter_snapshots
+from agents.utils.hedging import hedge_snapshots
+from agents.utils.credential_pool import breaker_snapshots
+from agents.utils.llm_clients import credential_dict
+from agents.utils.chunk_routing import TIER_FIELDS, routed_cred
+from models.routing_rule import RoutingRule
+from services import job_checkpoint
+from agents.llm_rule_agent import get_prompt
+from agents.utils.model_registry import count_tokens, target_chunk_tokens
 
 router = APIRouter(tags=["Conversion"])
 PYTHON_TARGETS = {"pyspark", "snowpark","python"}
@@ -145,6 +158,12 @@ async def convert(
     source      : str   = Form(...),   # ▼ new
     ddl_type    : str   = Form(...),   # ▼ new
     target      : str   = Form(...),   # ▼ new
+    max_concurrency: int | None = Form(None),  # parallel LLM calls for this job
+    pack_chunks : bool | None = Form(None),    # pack tiny chunks into shared requests
+    rule_fast_path: bool | None = Form(None),  # convert known constructs without the LLM
+    hedge_cred_id: int | None = Form(None),    # second credential for hedged calls
+    pool_cred_ids: str | None = Form(None),    # "3,7": more credentials to spread chunks over
+    incremental_from: str | None = Form(None), # prior job id: reconvert changed chunks only
     session: AsyncSession = Depends(get_session),
     current_user          = Depends(get_current_user),
 ):
@@ -184,18 +203,64 @@ async def convert(
         "target":   target.lower(),
         "input_filename": orig_name,
         "input_basename": base_name,
+        "user_id":  current_user.id,
 
         "llm_provider": cred.provider,
-        "llm_cred": {
-            "openai_api_base":    cred.openai_api_base,
-            "openai_api_key":     cred.openai_api_key,
-            "openai_api_version": cred.openai_api_version,
-            "deployment_name":    cred.deployment_name,
-            "model_name":         cred.model_name,
-            "google_api_key":     cred.google_api_key,
-        },
+        "llm_cred": credential_dict(cred),
         "logs": [],
     }
+    if max_concurrency:
+        # more workers than the credential's shared semaphore would only queue
+        state["max_concurrency"] = min(max(1, max_concurrency),
+                                       settings.LLM_MAX_CONCURRENCY_PER_CREDENTIAL)
+    if pack_chunks is not None:
+        state["pack_chunks"] = pack_chunks
+    if rule_fast_path is not None:
+        state["rule_fast_path"] = rule_fast_path
+    if incremental_from:
+        if not settings.JOB_CHECKPOINT_ENABLED:
+            raise HTTPException(409, "Incremental runs need job checkpointing enabled")
+        prior = await asyncio.to_thread(job_checkpoint.get_job_row, incremental_from)
+        if not prior or prior["user_id"] != current_user.id:
+            raise HTTPException(404, "Prior job not found")
+        if not prior["has_ast"]:
+            raise HTTPException(409, "Prior job has no chunks to reuse")
+        if any((prior[k] or "").lower() != state[k] for k in ("source", "target", "ddl_type")):
+            raise HTTPException(409, "Prior job converted a different source/target/ddl_type")
+        state["incremental_from"] = incremental_from
+    if pool_cred_ids:
+        try:
+            ids = [int(i) for i in pool_cred_ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(400, "pool_cred_ids must be comma-separated ids")
+        ids = [i for i in dict.fromkeys(ids) if i != llm_cred_id]
+        pool = (await session.execute(
+            select(LLMCredential).where(
+                LLMCredential.id.in_(ids),
+                LLMCredential.user_id == current_user.id,
+            )
+        )).scalars().all()
+        if len(pool) != len(ids):
+            raise HTTPException(404, "Pool credential not found")
+        by_id = {c.id: c for c in pool}
+        state["llm_pool"] = [{"provider": c.provider, "cred": credential_dict(c)}
+                             for c in [cred] + [by_id[i] for i in ids]]
+    if hedge_cred_id is not None and hedge_cred_id != llm_cred_id:
+        hedge_cred = (await session.execute(
+            select(LLMCredential).where(
+                LLMCredential.id == hedge_cred_id,
+                LLMCredential.user_id == current_user.id,
+            )
+        )).scalar_one_or_none()
+        if not hedge_cred:
+            raise HTTPException(404, "Hedge credential not found")
+        state["hedge_llm_provider"] = hedge_cred.provider
+        state["hedge_llm_cred"] = credential_dict(hedge_cred)
+    rules = (await session.execute(
+        select(RoutingRule.rules_json).where(RoutingRule.user_id == current_user.id)
+    )).scalar_one_or_none()
+    if rules:
+        state["routing_rules"] = json.loads(rules)
     print("SOURCE/TARGET/DDL:", source, target, ddl_type)
     return {"job_id": submit_job(state)}
 
@@ -230,16 +295,18 @@ async def estimate_cost(
     if cred is None:
         raise HTTPException(404, "Credential not found")
 
-    # ---------- token maths (unchanged logic) -----------------------
+    # ---------- token maths ------------------------------------------
     model_name = cred.model_name.lower()
-    line_cnt   = code_text.count("\n") + 1
 
-    TOKENS_PER_LINE = 17.5
     LLM_OUT_RATIO   = 0.12
     OPT_IN_RATIO    = 0.04
     OPT_OUT_RATIO   = 0.60
 
-    est_llm_in  = int(line_cnt * TOKENS_PER_LINE)
+    # source tokens + one (cached) static prompt per expected chunk
+    code_tok    = count_tokens(model_name, code_text)
+    est_chunks  = max(1, -(-code_tok // target_chunk_tokens(model_name)))
+    static_tok  = get_prompt(source, target, ddl_type).static_tokens(model_name)
+    est_llm_in  = code_tok + est_chunks * static_tok
     est_llm_out = int(est_llm_in * LLM_OUT_RATIO)
     est_opt_in  = int(est_llm_in * OPT_IN_RATIO)
     est_opt_out = int(est_opt_in  * OPT_OUT_RATIO)
@@ -281,6 +348,74 @@ async def status(job_id: str):
         "error":   j["error"],
     }
 
+# ─────────────────────────── 3b. live events (SSE)
+@router.get("/events/{job_id}")
+async def events(
+    job_id: str,
+    request: Request,
+    tokens: bool = False,
+    current_user = Depends(get_current_user),
+):
+    """Stream status / per-chunk events; ``?tokens=true`` adds live LLM output.
+
+    Reconnecting clients resume via the standard ``Last-Event-ID`` header.
+    """
+    j   = get_job(job_id)
+    bus = get_bus(job_id)
+    if not j or not bus or j.get("user_id") != current_user.id:
+        raise HTTPException(404, "Job not found")
+    try:
+        last_id = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_id = 0
+
+    def _sse(ev: dict) -> dict:
+        msg = {"event": ev["event"], "data": json.dumps(ev["data"])}
+        if "id" in ev:
+            msg["id"] = str(ev["id"])
+        return msg
+
+    async def stream():
+        q, missed = bus.subscribe(last_id, tokens)
+        seen = last_id
+        try:
+            for ev in missed:
+                seen = ev["id"]
+                yield _sse(ev)
+                if ev["event"] == "end":
+                    return
+            while q is not None:
+                ev = await q.get()
+                if ev.get("id", seen + 1) <= seen:      # already sent from history
+                    continue
+                seen = ev.get("id", seen)
+                yield _sse(ev)
+                if ev["event"] == "end":
+                    return
+        finally:
+            if q is not None:
+                bus.unsubscribe(q)
+
+    return EventSourceResponse(stream(), ping=15)
+
+# ─────────────────────────── 3c. metrics
+@router.get("/metrics")
+async def metrics(
+    session: AsyncSession = Depends(get_session),
+    current_user          = Depends(get_current_user),
+):
+    """Rate-limiter state for the caller's credentials."""
+    ids = (await session.execute(
+        select(LLMCredential.id).where(LLMCredential.user_id == current_user.id)
+    )).scalars().all()
+    own = tuple(f"id:{i}" for i in ids)
+    snaps = limiter_snapshots()
+    # routed deployments are limited under "id:<cred>/<deployment>"
+    mine = lambda k: k in own or k.startswith(tuple(o + "/" for o in own))
+    return {"rate_limiters":    {k: v for k, v in snaps.items() if mine(k)},
+            "hedging":          {k: v for k, v in hedge_snapshots().items() if mine(k)},
+            "circuit_breakers": breaker_snapshots(own)}
+
 # ─────────────────────────── 4. download
 @router.get("/download/{fname}")
 async def download_file(fname: str):
@@ -318,6 +453,16 @@ async def force_stop(job_id: str):
     if stop_job(job_id): return {"stopped": True}
     raise HTTPException(404, "Job not running")
 
+# ─────────────────────────── 6b. resume from checkpoint
+@router.post("/resume/{job_id}")
+async def resume(job_id: str, current_user = Depends(get_current_user)):
+    """Restart a job lost with its instance; converted chunks are not re-billed."""
+    row = await asyncio.to_thread(job_checkpoint.get_job_row, job_id)
+    if not row or row["user_id"] != current_user.id:
+        raise HTTPException(404, "Job not found")
+    if await resume_job(job_id): return {"job_id": job_id, "resumed": True}
+    raise HTTPException(409, "Job is running, unknown, or its credential was removed")
+
 @router.get("/manual_review_chunks")
 async def get_manual_review_chunks():
     p = Path("rule_outputs/manual_review_chunks.json")
@@ -333,6 +478,46 @@ async def revalidate_chunk(payload: dict = Body(...)):
     except SyntaxError as e:
         return {"validated": False, "reason": f"SyntaxError: {e.msg} line {e.lineno}"}
     
+@router.post("/rerun_chunk/{job_id}")
+async def rerun_one_chunk(
+    job_id: str,
+    payload: dict = Body(...),       # {"chunk_id", "llm_cred_id"?, "model_name"?, "deployment_name"?}
+    session: AsyncSession = Depends(get_session),
+    current_user          = Depends(get_current_user),
+):
+    """Reconvert one chunk of a finished job and rebuild only the merged output."""
+    j = get_job(job_id)
+    if not j or j.get("user_id") != current_user.id:
+        raise HTTPException(404, "Job not found")
+    chunk_id = payload.get("chunk_id")
+    if not chunk_id:
+        raise HTTPException(400, "chunk_id is required")
+
+    provider, cred = None, None
+    if payload.get("llm_cred_id") is not None:
+        row = (await session.execute(
+            select(LLMCredential).where(
+                LLMCredential.id == payload["llm_cred_id"],
+                LLMCredential.user_id == current_user.id,
+            )
+        )).scalar_one_or_none()
+        if not row:
+            raise HTTPException(404, "Credential not found")
+        provider, cred = row.provider, credential_dict(row)
+    overrides = {k: payload[k] for k in TIER_FIELDS if payload.get(k)}
+    if overrides:                   # another deployment / model on the same credential
+        provider = provider or j["state"]["llm_provider"]
+        cred = routed_cred(cred or j["state"]["llm_cred"], overrides)
+
+    try:
+        res = await rerun_chunk(job_id, chunk_id, provider, cred)
+    except KeyError:
+        raise HTTPException(404, "Chunk not found")
+    if res is None:
+        raise HTTPException(409, "Job is not finished")
+    return {"job_id": job_id, "chunk_id": chunk_id, **res,
+            "download": j["download"], "report": j["report"]}
+
 @router.get("/rule_before_py")
 async def rule_before_py():
     src = Path("rule_outputs") / "before_optimization.src"
@@ -342,6 +527,42 @@ async def rule_before_py():
     return FileResponse(src, filename="before_optimization.py",
                         media_type="application/octet-stream")
 
+@router.get("/partial/{job_id}")
+async def download_partial(
+    job_id: str,
+    format: str = "text",            # text | json
+    current_user = Depends(get_current_user),
+):
+    """Validated chunks produced so far, in source order, with placeholders
+    for the rest – usable while the job is still running."""
+    j = get_job(job_id)
+    if not j or j.get("user_id") != current_user.id:
+        raise HTTPException(404, "Job not found")
+    rows = await asyncio.to_thread(partial_chunks, job_id)
+    if rows is None:
+        raise HTTPException(409, "Job has not been parsed yet")
+    ready = sum(r["ready"] for r in rows)
+    if format == "json":
+        return {"job_id": job_id, "status": j["status"], "ready": ready,
+                "total": len(rows), "chunks": rows}
+
+    target = ((j.get("state") or j.get("snapshot") or {}).get("target") or "pyspark").lower()
+    mark   = "#" if target in PYTHON_TARGETS | DBT_TARGETS else "--"
+
+    def _lines():
+        yield f"{mark} partial output of job {job_id}: {ready}/{len(rows)} chunks ready ({j['status']})\n\n"
+        for r in rows:
+            if r["ready"]:
+                yield r["code"].strip() + "\n\n"
+            else:
+                yield f"{mark} ⏳ {r['id']}: {r['state']}\n\n"
+
+    return StreamingResponse(
+        _lines(),
+        media_type="text/plain",
+        headers={"X-Chunks-Ready": str(ready), "X-Chunks-Total": str(len(rows))},
+    )
+
 @router.get("/download_final/{job_id}")
 async def download_final(job_id: str):
     j = get_job(job_id)
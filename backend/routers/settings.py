@@ -1,5 +1,8 @@
 # backend/routers/settings.py
 
+import asyncio
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
@@ -7,9 +10,12 @@ from db import get_session
 from models.llm_credential import LLMCredential
 from models.user import User
 from schemas.llm_schema import LLMCreate, LLMRead
+from schemas.routing_schema import RoutingRules
+from models.routing_rule import RoutingRule
 from dependencies.auth_dependencies import get_current_user
-from langchain.chat_models import AzureChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agents.utils import llm_clients
+from agents.utils.chunk_routing import normalize_rules, DEFAULT_WEIGHTS, TIERS, STANDARD
+from config import settings
 
 router = APIRouter()
 
@@ -39,30 +45,27 @@ async def add_llm_cred(
             delete(LLMCredential).where(LLMCredential.id == existing[0].id)
         )
         await db.commit()
+        llm_clients.invalidate(existing[0].id)
 
     # ---- Validate live by calling the LLM ---------------------
+    # the shared client is built here, so its connection pool is already warm
+    # when the first job runs on this credential
+    allowed = ("azureopenai", "gemini") + (("mock", "replay") if settings.MOCK_LLM_ENABLED else ())
+    if provider not in allowed:
+        raise HTTPException(400, "unsupported_provider")
+    fields = {
+        "openai_api_base":    payload.OPENAI_API_BASE,
+        "openai_api_key":     payload.OPENAI_API_KEY,
+        "openai_api_version": payload.OPENAI_API_VERSION,
+        "deployment_name":    payload.DEPLOYMENT_NAME,
+        "model_name":         payload.MODEL_NAME,
+        "google_api_key":     payload.GOOGLE_API_KEY,
+    }
     try:
-        if provider == "azureopenai":
-            _ = AzureChatOpenAI(
-                openai_api_base    = payload.OPENAI_API_BASE,
-                openai_api_key     = payload.OPENAI_API_KEY,
-                openai_api_version = payload.OPENAI_API_VERSION,
-                deployment_name    = payload.DEPLOYMENT_NAME,
-                model_name         = payload.MODEL_NAME,
-                temperature        = 0
-            ).invoke("hi")
-
-        elif provider == "gemini":
-            _ = ChatGoogleGenerativeAI(
-                model          = payload.MODEL_NAME,
-                google_api_key = payload.GOOGLE_API_KEY,
-                temperature    = 0
-            ).invoke("hi")
-
-        else:
-            raise HTTPException(400, "unsupported_provider")
-
+        client = llm_clients.get_client(provider, fields)
+        await asyncio.to_thread(client.invoke, "hi")
     except Exception as e:
+        llm_clients.forget(provider, fields)
         raise HTTPException(400, f"validation_error: {str(e)}")
 
     # ---- Save in database after validation --------------------
@@ -81,6 +84,7 @@ async def add_llm_cred(
     db.add(cred)
     await db.commit()
     await db.refresh(cred)
+    llm_clients.get_client(provider, llm_clients.credential_dict(cred))   # bind id → client
     return cred
 
 # ----- List All Saved Credentials --------------------
@@ -108,3 +112,49 @@ async def delete_llm_cred(
     if result.rowcount == 0:
         raise HTTPException(404, "not_found")
     await db.commit()
+    llm_clients.invalidate(cred_id)
+
+# ----- Model routing rules (one set per user) --------------------
+@router.get("/routing")
+async def get_routing(
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user)
+):
+    row = (await db.execute(
+        select(RoutingRule).where(RoutingRule.user_id == user.id)
+    )).scalar_one_or_none()
+    return normalize_rules(json.loads(row.rules_json) if row else None)
+
+@router.put("/routing")
+async def put_routing(
+    payload: RoutingRules,
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user)
+):
+    rules = payload.dict()
+    bad_tiers = [t for t in rules["tiers"] if t not in TIERS or t == STANDARD]
+    if bad_tiers:
+        raise HTTPException(400, f"unknown_tier: {', '.join(bad_tiers)}")
+    bad_weights = [w for w in rules["weights"] if w not in DEFAULT_WEIGHTS]
+    if bad_weights:
+        raise HTTPException(400, f"unknown_weight: {', '.join(bad_weights)}")
+    if rules["simple_max_score"] >= rules["complex_min_score"]:
+        raise HTTPException(400, "simple_max_score must be below complex_min_score")
+
+    row = (await db.execute(
+        select(RoutingRule).where(RoutingRule.user_id == user.id)
+    )).scalar_one_or_none()
+    if row is None:
+        row = RoutingRule(user_id=user.id, rules_json="")
+        db.add(row)
+    row.rules_json = json.dumps(rules)
+    await db.commit()
+    return normalize_rules(rules)
+
+@router.delete("/routing", status_code=204)
+async def delete_routing(
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user)
+):
+    await db.execute(delete(RoutingRule).where(RoutingRule.user_id == user.id))
+    await db.commit()
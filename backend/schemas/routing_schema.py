@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class RouteTarget(BaseModel):
+    deployment_name: Optional[str] = None   # e.g. a gpt-4o-mini deployment on the same resource
+    model_name: Optional[str] = None
+
+class RoutingRules(BaseModel):
+    enabled: bool = True
+    simple_max_score: float = 3.0
+    complex_min_score: float = 15.0
+    weights: Dict[str, float] = {}          # tokens / nesting / macro_refs / transformations
+    tiers: Dict[str, RouteTarget] = {}      # "simple" and/or "complex"
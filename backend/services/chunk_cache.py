@@ -0,0 +1,178 @@
+# backend/services/chunk_cache.py
+"""Persistent, content-addressed cache of chunk conversions.
+
+Entries are keyed by a hash of the normalised chunk code plus everything that
+changes the LLM answer (source, target, ddl_type, model, prompt version) and
+are scoped per tenant (user).  Each tenant is bounded in bytes; the least
+recently used entries are evicted first.
+
+Identical chunks requested concurrently (same tenant + key) are coalesced:
+only the first caller runs the conversion, the others wait for its result.
+
+A fresh conversion is not stored right away – one bad completion would be
+replayed to every later job.  The caller keeps the ``entry`` describing it
+and calls ``promote`` once the output passed validation (or was repaired by
+the feedback step).
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select, delete, update, func
+
+from config import settings
+from db import SyncSession, init_sync_db
+from models.chunk_cache import ChunkCacheEntry
+
+_INFLIGHT: Dict[Tuple[str, str], Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+_SCHEMA_READY = False
+
+
+# ───────────────────── keys ─────────────────────────────────────
+def normalize_code(code: str) -> str:
+    """Whitespace-insensitive form: unified newlines, no trailing blanks, no blank runs."""
+    lines = [ln.rstrip() for ln in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return re.sub(r"\n{2,}", "\n", "\n".join(lines)).strip()
+
+def cache_key(code: str, source: str, target: str, ddl_type: str,
+              model_name: str, prompt_version: str) -> str:
+    h = hashlib.sha256()
+    for part in (source, target, ddl_type, model_name, prompt_version):
+        h.update((part or "").lower().encode("utf-8"))
+        h.update(b"\x00")
+    h.update(normalize_code(code).encode("utf-8"))
+    return h.hexdigest()
+
+
+# ───────────────────── storage ──────────────────────────────────
+def _ensure_schema():
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    with _INFLIGHT_LOCK:
+        if not _SCHEMA_READY:
+            init_sync_db()
+            _SCHEMA_READY = True
+
+def lookup(tenant: str, key: str) -> Optional[Dict]:
+    _ensure_schema()
+    with SyncSession() as s:
+        row = s.execute(
+            select(ChunkCacheEntry).where(ChunkCacheEntry.tenant == tenant,
+                                          ChunkCacheEntry.cache_key == key)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        s.execute(
+            update(ChunkCacheEntry)
+            .where(ChunkCacheEntry.id == row.id)
+            .values(hits=ChunkCacheEntry.hits + 1,
+                    last_used_at=datetime.now(timezone.utc))
+        )
+        s.commit()
+        return {"code": row.output,
+                "input_tokens": row.input_tokens or 0,
+                "output_tokens": row.output_tokens or 0}
+
+def store(tenant: str, key: str, meta: Dict, output: str,
+          input_tokens: int, output_tokens: int) -> None:
+    _ensure_schema()
+    size = len(output.encode("utf-8"))
+    with SyncSession() as s:
+        exists = s.execute(
+            select(ChunkCacheEntry.id).where(ChunkCacheEntry.tenant == tenant,
+                                             ChunkCacheEntry.cache_key == key)
+        ).scalar_one_or_none()
+        if exists is not None:
+            return
+        s.add(ChunkCacheEntry(
+            tenant=tenant, cache_key=key, output=output,
+            input_tokens=input_tokens, output_tokens=output_tokens,
+            size_bytes=size, last_used_at=datetime.now(timezone.utc),
+            **{k: meta.get(k) for k in
+               ("source", "target", "ddl_type", "model_name", "prompt_version")},
+        ))
+        s.commit()
+        _evict(s, tenant)
+
+def _evict(s, tenant: str) -> None:
+    """Drop least-recently-used entries until the tenant is under its byte budget."""
+    budget = settings.CHUNK_CACHE_MAX_BYTES_PER_TENANT
+    used = s.execute(
+        select(func.coalesce(func.sum(ChunkCacheEntry.size_bytes), 0))
+        .where(ChunkCacheEntry.tenant == tenant)
+    ).scalar_one()
+    if used <= budget:
+        return
+    victims = []
+    for row_id, size in s.execute(
+        select(ChunkCacheEntry.id, ChunkCacheEntry.size_bytes)
+        .where(ChunkCacheEntry.tenant == tenant)
+        .order_by(ChunkCacheEntry.last_used_at.asc())
+    ):
+        if used <= budget:
+            break
+        victims.append(row_id)
+        used -= size or 0
+    if victims:
+        s.execute(delete(ChunkCacheEntry).where(ChunkCacheEntry.id.in_(victims)))
+        s.commit()
+
+
+# ───────────────────── get-or-convert ───────────────────────────
+def entry(tenant: str, key: str, meta: Dict, res: Dict) -> Dict:
+    """What ``promote`` needs to store the conversion *res* later."""
+    return {"tenant": tenant, "key": key, "meta": meta, "output": res["code"],
+            "input_tokens": res.get("input_tokens", 0),
+            "output_tokens": res.get("output_tokens", 0)}
+
+def promote(pending: Dict, output: Optional[str] = None) -> None:
+    """Store a validated conversion; *output* replaces a repaired one."""
+    try:
+        store(pending["tenant"], pending["key"], pending["meta"],
+              pending["output"] if output is None else output,
+              pending["input_tokens"], pending["output_tokens"])
+    except Exception as e:
+        print(f"⚠️  chunk cache store failed: {e}")
+
+def get_or_convert(tenant: str, key: str, meta: Dict,
+                   convert: Callable[[], Dict]) -> Tuple[Dict, str]:
+    """Return ``(result, outcome)`` where outcome is "hit", "coalesced" or "miss".
+
+    *convert* must return the ``_convert_chunk`` dict.  Nothing is stored
+    here (see ``promote``); cache errors never fail the conversion.
+    """
+    try:
+        hit = lookup(tenant, key)
+    except Exception as e:
+        print(f"⚠️  chunk cache lookup failed: {e}")
+        hit = None
+    if hit is not None:
+        return hit, "hit"
+
+    flight_key = (tenant, key)
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(flight_key)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT[flight_key] = Future()
+
+    if not leader:
+        return fut.result(), "coalesced"
+
+    try:
+        res = convert()
+        fut.set_result(res)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(flight_key, None)
+    return res, "miss"
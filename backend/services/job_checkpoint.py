@@ -0,0 +1,241 @@
+# backend/services/job_checkpoint.py
+"""Durable job and chunk checkpoints, so a restart does not lose paid-for work.
+
+``conversion_runner`` records every job with its input state (credentials by
+id only – secrets stay in ``llm_credentials``) and the parse output.  The
+graph nodes record each chunk as it passes a stage:
+
+    converted   – llm_rule_node, as soon as the LLM answer is back
+    validated / invalid – validate_node
+    fixed / manual      – feedback_node
+
+``resume_state`` rebuilds the state of an unfinished job; fed back into the
+graph, parse is skipped (``ast_blocks`` present), converted chunks are taken
+from here instead of the LLM and feedback reuses earlier fixes.
+
+Checkpoint errors are logged and never fail a conversion.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, delete
+
+from config import settings
+from db import SyncSession, init_sync_db
+from models.job_checkpoint import ConversionJob, JobChunk
+
+_SECRET_FIELDS = ("openai_api_key", "google_api_key")
+_LOCK = threading.Lock()
+_SCHEMA_READY = False
+
+UNFINISHED = ("queued", "running")
+
+
+def _ensure_schema():
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    with _LOCK:
+        if not _SCHEMA_READY:
+            init_sync_db()
+            _SCHEMA_READY = True
+
+def enabled(job_id: Optional[str]) -> bool:
+    return bool(job_id) and settings.JOB_CHECKPOINT_ENABLED
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# ───────────────────── jobs ─────────────────────────────────────
+def create_job(job_id: str, state: Dict) -> None:
+    _ensure_schema()
+    cred = dict(state.get("llm_cred") or {})
+    cred_id = cred.get("id")
+    inputs = {k: v for k, v in state.items() if k not in ("llm_cred", "job_id")}
+    # credentials without an id (mock / replay runs) are kept, minus any secret
+    inputs["llm_cred"] = ({"model_name": cred.get("model_name")} if cred_id is not None else
+                          {k: v for k, v in cred.items() if k not in _SECRET_FIELDS})
+    if inputs.get("llm_pool"):
+        inputs["llm_pool"] = [
+            {"provider": m["provider"],
+             "cred": ({"id": m["cred"]["id"]} if m["cred"].get("id") is not None else
+                      {k: v for k, v in m["cred"].items() if k not in _SECRET_FIELDS})}
+            for m in inputs["llm_pool"]]
+    if inputs.get("hedge_llm_cred"):
+        hedge = inputs["hedge_llm_cred"]
+        inputs["hedge_llm_cred"] = ({"id": hedge["id"]} if hedge.get("id") is not None else
+                                    {k: v for k, v in hedge.items() if k not in _SECRET_FIELDS})
+    with SyncSession() as s:
+        s.add(ConversionJob(job_id=job_id, user_id=state.get("user_id"),
+                            status="queued", llm_cred_id=cred_id,
+                            state_json=json.dumps(inputs), updated_at=_now()))
+        s.commit()
+
+def update_job(job_id: str, *, ast_blocks: Optional[List[Dict]] = None, **fields) -> None:
+    """Set ``status`` / ``step`` / ``error`` and optionally the parse output."""
+    _ensure_schema()
+    values = {k: v for k, v in fields.items() if k in ("status", "step", "error")}
+    if ast_blocks is not None:
+        values["ast_json"] = json.dumps(ast_blocks)
+    values["updated_at"] = _now()
+    with SyncSession() as s:
+        s.execute(update(ConversionJob).where(ConversionJob.job_id == job_id).values(**values))
+        s.commit()
+
+def get_job_row(job_id: str) -> Optional[Dict]:
+    _ensure_schema()
+    with SyncSession() as s:
+        row = s.get(ConversionJob, job_id)
+        if row is None:
+            return None
+        inputs = json.loads(row.state_json or "{}")
+        return {"job_id": row.job_id, "user_id": row.user_id, "status": row.status,
+                "step": row.step, "error": row.error, "llm_cred_id": row.llm_cred_id,
+                "has_ast": row.ast_json is not None,
+                **{k: inputs.get(k) for k in ("source", "target", "ddl_type")}}
+
+def job_blocks(job_id: str) -> Optional[List[Dict]]:
+    """Parse output of a job, ``None`` before parse finished."""
+    _ensure_schema()
+    with SyncSession() as s:
+        row = s.get(ConversionJob, job_id)
+        return json.loads(row.ast_json) if row is not None and row.ast_json else None
+
+def unfinished_jobs() -> List[str]:
+    _ensure_schema()
+    with SyncSession() as s:
+        return list(s.execute(
+            select(ConversionJob.job_id)
+            .where(ConversionJob.status.in_(UNFINISHED))
+            .order_by(ConversionJob.created_at.asc())
+        ).scalars())
+
+def resume_state(job_id: str) -> Optional[Dict]:
+    """Input state of a recorded job plus its parse output; ``None`` if unknown
+    or its credential is gone."""
+    from models.llm_credential import LLMCredential
+    from agents.utils.llm_clients import credential_dict
+
+    _ensure_schema()
+    with SyncSession() as s:
+        row = s.get(ConversionJob, job_id)
+        if row is None:
+            return None
+        state = json.loads(row.state_json)
+        if row.llm_cred_id is not None:
+            cred = s.get(LLMCredential, row.llm_cred_id)
+            if cred is None:
+                return None
+            state["llm_provider"] = cred.provider
+            state["llm_cred"] = credential_dict(cred)
+        if state.get("llm_pool"):        # pool members that were removed are dropped
+            pool = []
+            for m in state["llm_pool"]:
+                if m["cred"].get("id") is None:
+                    pool.append(m)
+                elif (pc := s.get(LLMCredential, m["cred"]["id"])) is not None:
+                    pool.append({"provider": pc.provider, "cred": credential_dict(pc)})
+            state["llm_pool"] = pool
+        hedge_id = (state.get("hedge_llm_cred") or {}).get("id")
+        if hedge_id is not None:         # a removed hedge credential just disables hedging to it
+            hedge = s.get(LLMCredential, hedge_id)
+            state.pop("hedge_llm_cred")
+            if hedge is not None:
+                state["hedge_llm_provider"] = hedge.provider
+                state["hedge_llm_cred"] = credential_dict(hedge)
+        if row.ast_json:
+            state["ast_blocks"] = json.loads(row.ast_json)
+    state["logs"] = list(state.get("logs") or []) + [f"Resumed job {job_id} from checkpoint"]
+    return state
+
+def prior_job(job_id: str) -> Optional[Dict]:
+    """Inputs, parse output and chunks of a recorded job, for incremental runs."""
+    _ensure_schema()
+    with SyncSession() as s:
+        row = s.get(ConversionJob, job_id)
+        if row is None or not row.ast_json:
+            return None
+        inputs = json.loads(row.state_json)
+        blocks = json.loads(row.ast_json)
+        status = row.status
+        user_id = row.user_id
+    chunks = load_chunks(job_id)
+    return {"job_id": job_id, "status": status, "user_id": user_id,
+            **{k: inputs.get(k) for k in ("source", "target", "ddl_type")},
+            "ast_blocks": blocks, "chunks": chunks}
+
+def prune(days: Optional[int] = None) -> int:
+    """Drop jobs (and their chunks) not touched for *days*; returns how many."""
+    _ensure_schema()
+    days = settings.JOB_CHECKPOINT_RETENTION_DAYS if days is None else days
+    cutoff = _now() - timedelta(days=days)
+    with SyncSession() as s:
+        old = list(s.execute(select(ConversionJob.job_id)
+                             .where(ConversionJob.updated_at < cutoff)).scalars())
+        if old:
+            s.execute(delete(JobChunk).where(JobChunk.job_id.in_(old)))
+            s.execute(delete(ConversionJob).where(ConversionJob.job_id.in_(old)))
+            s.commit()
+    return len(old)
+
+
+# ───────────────────── chunks ───────────────────────────────────
+_CHUNK_FIELDS = ("stage", "ok", "code", "fixed_code", "reason",
+                 "input_tokens", "output_tokens")
+
+def save_chunks(job_id: Optional[str], rows: Iterable[Dict]) -> None:
+    """Upsert ``{"chunk_id", "stage", ...}`` rows in one transaction.
+
+    Fields not given keep their stored value, so a later stage does not wipe
+    the converted code.
+    """
+    if not enabled(job_id):
+        return
+    rows = list(rows)
+    if not rows:
+        return
+    try:
+        _ensure_schema()
+        with SyncSession() as s:
+            ids = [r["chunk_id"] for r in rows]
+            existing = {c.chunk_id: c for c in s.execute(
+                select(JobChunk).where(JobChunk.job_id == job_id,
+                                       JobChunk.chunk_id.in_(ids))).scalars()}
+            for r in rows:
+                values = {k: r[k] for k in _CHUNK_FIELDS if k in r}
+                row = existing.get(r["chunk_id"])
+                if row is None:
+                    s.add(JobChunk(job_id=job_id, chunk_id=r["chunk_id"],
+                                   updated_at=_now(), **values))
+                else:
+                    for k, v in values.items():
+                        setattr(row, k, v)
+                    row.updated_at = _now()
+            s.execute(update(ConversionJob).where(ConversionJob.job_id == job_id)
+                      .values(updated_at=_now()))
+            s.commit()
+    except Exception as e:
+        print(f"⚠️  checkpoint write failed for job {job_id}: {e}")
+
+def save_chunk(job_id: Optional[str], chunk_id: str, stage: str, **fields) -> None:
+    save_chunks(job_id, [{"chunk_id": chunk_id, "stage": stage, **fields}])
+
+def load_chunks(job_id: Optional[str]) -> Dict[str, Dict]:
+    """Checkpointed chunks of a job by chunk id (empty when there are none)."""
+    if not enabled(job_id):
+        return {}
+    try:
+        _ensure_schema()
+        with SyncSession() as s:
+            return {c.chunk_id: {"chunk_id": c.chunk_id,
+                                 **{k: getattr(c, k) for k in _CHUNK_FIELDS}}
+                    for c in s.execute(select(JobChunk)
+                                       .where(JobChunk.job_id == job_id)).scalars()}
+    except Exception as e:
+        print(f"⚠️  checkpoint read failed for job {job_id}: {e}")
+        return {}
@@ -1,8 +1,18 @@
 # backend/tasks/conversion_runner.py
-import uuid, asyncio, tempfile, os, traceback
+import uuid, asyncio, tempfile, os, traceback, copy
 from pathlib import Path
 from time import perf_counter
 from graph.main_graph import build_graph
+from agents.llm_rule_agent import _convert_chunk
+from agents.validate_agent import validate_chunk
+from agents.feedback_agent import fix_chunk, _prompt
+from agents.optimize_agent import optimize_node
+from agents.utils.llm_clients import get_client
+from agents.utils.concurrency import credential_key
+from agents.utils.llm_usage import add_usage
+from tasks.job_events import open_bus, emit
+from services import job_checkpoint
+from config import settings
 from langgraph.errors import GraphRecursionError
 
 JOBS: dict[str, dict] = {}
@@ -21,14 +31,71 @@ def _init(job_id: str):
         "success": None,
         "error":   "",
         "force_stop": False,
+        "user_id": None,
+        "snapshot": {},     # latest node output, for partial downloads
     }
+    open_bus(job_id)
+
+def _checkpoint(fn, *args, **kw):
+    """Checkpoint call that can never fail the job."""
+    if not job_checkpoint.enabled(args[0] if args else None):
+        return
+    try:
+        fn(*args, **kw)
+    except Exception as e:
+        print(f"⚠️  job checkpoint failed: {e}")
 
 def submit_job(state_in: dict) -> str:
     job_id = uuid.uuid4().hex
     _init(job_id)
+    JOBS[job_id]["user_id"] = state_in.get("user_id")
+    _checkpoint(job_checkpoint.create_job, job_id, state_in)
     asyncio.create_task(_run_job(job_id, {**state_in, "job_id": job_id}))
     return job_id
 
+async def resume_job(job_id: str) -> bool:
+    """Restart a checkpointed job that is not running in this process.
+
+    Parse is skipped and chunks converted before the restart are not sent to
+    the LLM again (see services/job_checkpoint.py).
+    """
+    if job_id in JOBS and JOBS[job_id]["status"] in ("queued", "running"):
+        return False
+    try:
+        state = await asyncio.to_thread(job_checkpoint.resume_state, job_id)
+    except Exception as e:
+        print(f"⚠️  resume of job {job_id} failed: {e}")
+        return False
+    if state is None:
+        return False
+    _init(job_id)
+    JOBS[job_id].update(logs=list(state["logs"]), user_id=state.get("user_id"))
+    asyncio.create_task(_run_job(job_id, {**state, "job_id": job_id}))
+    return True
+
+async def resume_unfinished() -> int:
+    """Resume every job a previous process left queued/running (startup hook).
+
+    Assumes one backend instance owns the job table, as with the in-memory
+    ``JOBS`` dict itself.
+    """
+    if not (settings.JOB_CHECKPOINT_ENABLED and settings.JOB_RESUME_ON_STARTUP):
+        return 0
+    try:
+        await asyncio.to_thread(job_checkpoint.prune)
+        pending = await asyncio.to_thread(job_checkpoint.unfinished_jobs)
+    except Exception as e:
+        print(f"⚠️  job checkpoint scan failed: {e}")
+        return 0
+    resumed = 0
+    for job_id in pending:
+        if await resume_job(job_id):
+            resumed += 1
+        else:
+            _checkpoint(job_checkpoint.update_job, job_id, status="failed",
+                        error="could not resume (credential removed?)")
+    return resumed
+
 def get_job(job_id: str) -> dict | None:
     return JOBS.get(job_id)
 
@@ -37,9 +104,233 @@ def stop_job(job_id: str) -> bool:
     if j and j["status"] == "running":
         j.update(force_stop=True, status="stopped", step="stopped")
         j["logs"].append("❌ force-stop requested")
+        _checkpoint(job_checkpoint.update_job, job_id, status="stopped", step="stopped")
+        emit(job_id, "status", status="stopped", step="stopped", progress=j["progress"])
         return True
     return False
 
+def _write_outputs(job_id: str, state: dict) -> str:
+    """Write the downloadable file and record the report; returns the file name."""
+    job = JOBS[job_id]
+    # ───────────────────────────────────────────────────────
+    # choose proper file-extension based on target type
+    # ───────────────────────────────────────────────────────
+    target = (state.get("target") or "pyspark").lower()
+    ext_map = {
+        "pyspark":    ".py",
+        "snowpark":   ".py",
+        "python"  :   ".py",
+        "databricks": ".sql",
+        "snowflake":  ".sql",
+        "bigquery":   ".sql",
+        "matillion":  ".json",
+        "dbt"      :  ".yml",
+    }
+    ext       = ext_map.get(target, ".txt")
+    file_name = f"{target}_{job_id}{ext}"
+    file_path = os.path.join(tempfile.gettempdir(), file_name)
+
+    # ── merged code string (same fallback logic) ------------
+    code_str = state.get("final_code") or state.get("pyspark_code") or ""
+    if not code_str:
+        csv_fallback = Path("rule_outputs/final_optimized_pyspark.csv")
+        if csv_fallback.exists():
+            try:
+                import pandas as pd
+                df = pd.read_csv(csv_fallback)
+                code_str = "\n".join(df.iloc[:, 0].astype(str).tolist())
+            except Exception:
+                code_str = "# (unable to load fallback CSV)"
+
+    with open(file_path, "w", encoding="utf-8") as fh:
+        fh.write(code_str)
+
+    # ── ensure report path ---------------------------------
+    rpt_path = state.get("report_file") or ""
+    if not rpt_path or not Path(rpt_path).exists():
+        default_path = Path("rule_outputs/optimization_report.json").resolve()
+        if default_path.exists():
+            rpt_path = str(default_path)
+    if not Path(rpt_path).exists():
+        raise RuntimeError("optimisation report not written")
+
+    job["report_path"] = rpt_path
+    job["report"]      = f"/agent/report/{job_id}"
+    return file_name
+
+# ── partial results ───────────────────────────────────────────
+_PENDING_STATES = {None: "pending", "converted": "awaiting validation",
+                   "invalid": "awaiting feedback", "manual": "needs manual review"}
+
+def partial_chunks(job_id: str) -> list[dict] | None:
+    """Every chunk of a job in source order as ``{"id", "ready", "state", "code"}``.
+
+    Chunks count as ready once validated (or fixed by feedback).  While the
+    job runs they come from the chunk checkpoints, written as each chunk
+    lands – converted chunks are put through the (local, cheap) validator
+    right here rather than waiting for validate_node; the in-memory node
+    output fills in when checkpoints are off.  ``None`` until parsed.
+    """
+    job = JOBS.get(job_id) or {}
+    if (job.get("status") == "finished" and job.get("state")
+            and not job_checkpoint.enabled(job_id)):
+        final = job["state"]
+        ready = {c["id"]: c["code"] for c in final.get("pyspark_chunks") or []}
+        return [{"id": b["id"], "ready": b["id"] in ready,
+                 "state": "validated" if b["id"] in ready else "failed",
+                 "code": ready.get(b["id"], "")}
+                for b in final.get("ast_blocks") or []]
+
+    snap   = job.get("snapshot") or {}
+    blocks = snap.get("ast_blocks")
+    if not blocks and job_checkpoint.enabled(job_id):
+        blocks = job_checkpoint.job_blocks(job_id)
+    if not blocks:
+        return None
+    cps = job_checkpoint.load_chunks(job_id)
+    # node-level fallback: validate_node has passed → its chunks are validated
+    failed = set(snap.get("failed_chunks") or [])
+    validated = ({c["id"]: c["code"] for c in snap.get("pyspark_chunks") or []
+                  if c["id"] not in failed}
+                 if "validate" in (snap.get("graph_trace") or []) else {})
+
+    rows = []
+    for b in blocks:
+        cp = cps.get(b["id"]) or {}
+        stage = cp.get("stage")
+        if stage == "fixed" and cp.get("fixed_code"):
+            rows.append({"id": b["id"], "ready": True, "state": "fixed", "code": cp["fixed_code"]})
+        elif stage == "validated" and cp.get("code") is not None:
+            rows.append({"id": b["id"], "ready": True, "state": "validated", "code": cp["code"]})
+        elif stage == "converted" and cp.get("code") is not None and validate_chunk(
+                cp["code"], (snap.get("target") or "pyspark").lower())[0]:
+            rows.append({"id": b["id"], "ready": True, "state": "validated", "code": cp["code"]})
+        elif b["id"] in validated and not stage:
+            rows.append({"id": b["id"], "ready": True, "state": "validated",
+                         "code": validated[b["id"]]})
+        else:
+            rows.append({"id": b["id"], "ready": False,
+                         "state": _PENDING_STATES.get(stage, stage), "code": ""})
+    return rows
+
+# ── single-chunk re-run ───────────────────────────────────────
+def _rerun_chunk(state: dict, chunk_id: str, provider: str, cred: dict) -> dict:
+    """Convert → validate → feedback one chunk, splice it in and re-optimize.
+
+    Returns ``{"validated", "reason", "fixed", "code", "state", "usage"}``;
+    ``state`` is only set when the chunk passed and the job output was
+    rebuilt, ``usage`` is the job's ``token_usage["rerun"]`` either way.
+    """
+    blk = next((b for b in state.get("ast_blocks") or [] if b["id"] == chunk_id), None)
+    if blk is None:
+        raise KeyError(chunk_id)
+    job_id = state.get("job_id")
+    source, target = state["source"].lower(), state["target"].lower()
+    ddl_type   = state["ddl_type"].lower()
+    model_name = cred.get("model_name", "").lower()
+    cred_key   = credential_key(cred)
+    llm        = get_client(provider, cred)
+
+    # the finished job's usage is shared with ``state``; it takes this copy
+    # with the spliced state once the chunk passed, only the rerun entry otherwise
+    tok   = copy.deepcopy(state.get("token_usage") or {})
+    rerun = tok.setdefault("rerun", add_usage({"model": model_name, "chunks": []}, 0, 0))
+    rerun["chunks"].append(chunk_id)
+
+    res = _convert_chunk(llm, blk, model_name, source, target, ddl_type, job_id, cred_key)
+    add_usage(rerun, res["input_tokens"], res["output_tokens"], res.get("cached_tokens", 0))
+    if not res["ok"]:
+        return {"validated": False, "reason": res["code"], "fixed": False,
+                "code": "", "state": None, "usage": rerun}
+
+    code, fixed = res["code"], False
+    ok, reason = validate_chunk(code, target)
+    if not ok:
+        ch = {"id": chunk_id, "reason": reason, "source_code": blk["code"],
+              "generated_code": code}
+        try:
+            ok, new_code, reason, usage = fix_chunk(
+                llm, _prompt(source, target, ddl_type), ch, target=target,
+                model_name=model_name, cred_key=cred_key, job_id=job_id)
+            add_usage(rerun, usage["input"], usage["output"], usage["cached"])
+            code, fixed = new_code, ok
+        except Exception as e:
+            reason = f"LLM error: {e}"
+    emit(job_id, "chunk", id=chunk_id, state="validated" if ok else "failed", reason=reason)
+    if not ok:
+        return {"validated": False, "reason": reason, "fixed": False,
+                "code": code, "state": None, "usage": rerun}
+
+    job_checkpoint.save_chunk(job_id, chunk_id, "fixed" if fixed else "validated",
+                              ok=True, reason=reason,
+                              **({"fixed_code": code} if fixed else {"code": code}),
+                              input_tokens=res["input_tokens"],
+                              output_tokens=res["output_tokens"])
+
+    # splice into the job's chunk set, in source order
+    order  = {b["id"]: i for i, b in enumerate(state["ast_blocks"])}
+    chunks = [c for c in state.get("pyspark_chunks") or [] if c["id"] != chunk_id]
+    chunks.append({"id": chunk_id, "code": code})
+    state["pyspark_chunks"] = sorted(chunks, key=lambda c: order.get(c["id"], len(order)))
+    state["failed_chunks"]  = [c for c in state.get("failed_chunks") or [] if c != chunk_id]
+
+    rule_csv = Path(state.get("rule_csv") or "")
+    if rule_csv.is_file():
+        import pandas as pd
+        df  = pd.read_csv(rule_csv)
+        col = "output_pyspark_code" if target == "pyspark" else f"output_{target}_code"
+        hit = df["id"] == chunk_id
+        df.loc[hit, [col, "success"]] = [code, True]
+        for k, v in (("provider", provider), ("model", model_name),
+                     ("validated", True), ("reason", reason)):
+            if k in df.columns:
+                df.loc[hit, k] = v
+        df.to_csv(rule_csv, index=False)
+
+    # the earlier optimize call stays billed; optimize_node overwrites its entry
+    if "optimize" in tok:
+        earlier = tok.setdefault("optimize_earlier",
+                                 add_usage({"model": tok["optimize"].get("model")}, 0, 0))
+        add_usage(earlier, tok["optimize"]["input"], tok["optimize"]["output"],
+                  tok["optimize"].get("cached_input", 0))
+    state["token_usage"] = tok
+    state["logs"] = list(state.get("logs") or []) + [
+        f"Re-ran chunk {chunk_id} on {model_name or provider}"
+        + (" (fixed by feedback)" if fixed else "")]
+    out = optimize_node(state)
+    return {"validated": True, "reason": reason, "fixed": fixed, "code": code, "state": out,
+            "usage": rerun}
+
+async def rerun_chunk(job_id: str, chunk_id: str, provider: str | None = None,
+                      cred: dict | None = None) -> dict | None:
+    """Re-run one chunk of a finished job (optionally on another credential /
+    model) and rebuild only the merged, optimized output."""
+    job = JOBS.get(job_id)
+    if not job or job["status"] != "finished" or not job.get("state"):
+        return None
+    state = dict(job["state"])
+    open_bus(job_id)                      # the job's end event closed the previous one
+    job.update(status="running", step=f"rerun {chunk_id}", current_agent="rerun")
+    emit(job_id, "status", status="running", step=job["step"], progress=job["progress"])
+    try:
+        res = await asyncio.to_thread(_rerun_chunk, state, chunk_id,
+                                      provider or state["llm_provider"],
+                                      cred or state["llm_cred"])
+        if res["state"] is None:           # a failed rerun is still billed
+            tok = {**(job["state"].get("token_usage") or {}), "rerun": res["usage"]}
+            job["state"] = {**job["state"], "token_usage": tok}
+        else:
+            job["state"] = res["state"]
+            job["logs"]  = res["state"].get("logs", job["logs"])
+            file_name = await asyncio.to_thread(_write_outputs, job_id, res["state"])
+            job.update(download=f"/agent/download/{file_name}",
+                       success=res["state"].get("validation_passed", True))
+        return {k: v for k, v in res.items() if k not in ("state", "usage")}
+    finally:
+        job.update(status="finished", step="done", current_agent="done")
+        emit(job_id, "end", status=job["status"], success=job["success"],
+             error=job["error"], download=job["download"], report=job["report"])
+
 # ── main runner ───────────────────────────────────────────────
 async def _run_job(job_id: str, state: dict):
     print("DEBUG state keys:", state.keys())
@@ -48,6 +339,9 @@ async def _run_job(job_id: str, state: dict):
     job["status"] = "running"
     total_steps = 6  # keeps old progress logic
     cur = 0
+    parsed = bool(state.get("ast_blocks"))       # resumed: parse output already stored
+    await asyncio.to_thread(_checkpoint, job_checkpoint.update_job, job_id,
+                            status="running", step="starting")
 
     try:
         graph = build_graph().with_config(recursion_limit=50)
@@ -56,13 +350,27 @@ async def _run_job(job_id: str, state: dict):
             if job["force_stop"]:
                 raise RuntimeError("Force-stop")
             cur += 1
-            step = st.get("graph_trace", ["-"])[-1]
+            # astream yields {node: update}; unwrap it to reach the node's state
+            out = st
+            if len(st) == 1 and isinstance(next(iter(st.values())), dict):
+                out = next(iter(st.values()))
+            step = out.get("graph_trace", ["-"])[-1]
             job.update(
                 step=step,
                 current_agent=step,
                 progress=min(99, int(cur / total_steps * 100)),
-                logs=st.get("logs", job["logs"]),
+                logs=out.get("logs", job["logs"]),
             )
+            emit(job_id, "status", status="running", step=step,
+                 progress=job["progress"])
+            job["snapshot"] = out
+            if step == "parse" and not parsed:
+                await asyncio.to_thread(_checkpoint, job_checkpoint.update_job, job_id,
+                                        step=step, ast_blocks=out.get("ast_blocks") or [])
+                parsed = True
+            else:
+                await asyncio.to_thread(_checkpoint, job_checkpoint.update_job, job_id,
+                                        step=step)
             state = st
 
         # ✅ Unwrap if graph returned { "optimize": {...} }
@@ -74,50 +382,7 @@ async def _run_job(job_id: str, state: dict):
         
         job["state"] = state
 
-        # ───────────────────────────────────────────────────────
-        # choose proper file-extension based on target type
-        # ───────────────────────────────────────────────────────
-        target = (state.get("target") or "pyspark").lower()
-        ext_map = {
-            "pyspark":    ".py",
-            "snowpark":   ".py",
-            "python"  :   ".py",
-            "databricks": ".sql",
-            "snowflake":  ".sql",
-            "bigquery":   ".sql",
-            "matillion":  ".json",
-            "dbt"      :  ".yml",
-        }
-        ext       = ext_map.get(target, ".txt")
-        file_name = f"{target}_{job_id}{ext}"
-        file_path = os.path.join(tempfile.gettempdir(), file_name)
-
-        # ── merged code string (same fallback logic) ------------
-        code_str = state.get("final_code") or state.get("pyspark_code") or ""
-        if not code_str:
-            csv_fallback = Path("rule_outputs/final_optimized_pyspark.csv")
-            if csv_fallback.exists():
-                try:
-                    import pandas as pd
-                    df = pd.read_csv(csv_fallback)
-                    code_str = "\n".join(df.iloc[:, 0].astype(str).tolist())
-                except Exception:
-                    code_str = "# (unable to load fallback CSV)"
-
-        with open(file_path, "w", encoding="utf-8") as fh:
-            fh.write(code_str)
-
-        # ── ensure report path ---------------------------------
-        rpt_path = state.get("report_file") or ""
-        if not rpt_path or not Path(rpt_path).exists():
-            default_path = Path("rule_outputs/optimization_report.json").resolve()
-            if default_path.exists():
-                rpt_path = str(default_path)
-        if not Path(rpt_path).exists():
-            raise RuntimeError("optimisation report not written")
-
-        job["report_path"] = rpt_path
-        job["report"]      = f"/agent/report/{job_id}"
+        file_name = _write_outputs(job_id, state)
 
         # ── final success update -------------------------------
         job.update(
@@ -135,3 +400,8 @@ async def _run_job(job_id: str, state: dict):
     except Exception as exc:
         tb = traceback.format_exc(limit=4).splitlines()[-1]
         job.update(status="failed", error=f"{exc} | {tb}", progress=100)
+    finally:
+        await asyncio.to_thread(_checkpoint, job_checkpoint.update_job, job_id,
+                                status=job["status"], step=job["step"], error=job["error"])
+        emit(job_id, "end", status=job["status"], success=job["success"],
+             error=job["error"], download=job["download"], report=job["report"])
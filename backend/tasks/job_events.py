@@ -0,0 +1,113 @@
+# backend/tasks/job_events.py
+"""Per-job event bus behind ``/agent/events/{job_id}`` (Server-Sent Events).
+
+Graph nodes run in worker threads, so ``emit`` is thread-safe and hands each
+event to the job's event loop.  Lifecycle events are numbered and kept in a
+bounded history so a reconnecting client can resume with ``Last-Event-ID``;
+``token`` events are live only and are produced solely while at least one
+subscriber asked for them (see ``wants_tokens``).
+
+Event names: ``status`` (node / progress), ``chunk`` (per-chunk lifecycle:
+queued, converting, converted, cached, validated, failed), ``token`` (LLM
+output fragments) and ``end`` (job finished, failed or stopped).  A bus is
+dropped ``END_TTL`` seconds after its ``end`` event, long enough for clients
+to drain the history.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+HISTORY_LIMIT = 5_000
+QUEUE_LIMIT   = 10_000
+END_TTL       = 300          # seconds a finished job's history stays available
+
+_BUSES: Dict[str, "JobEvents"] = {}
+
+
+class JobEvents:
+    def __init__(self, loop: asyncio.AbstractEventLoop, job_id: str = ""):
+        self.loop    = loop
+        self.job_id  = job_id
+        self.seq     = 0
+        self.closed  = False
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self._subs: List[Tuple[asyncio.Queue, bool]] = []
+        self._lock   = threading.Lock()
+
+    # ── producers (any thread) ────────────────────────────────
+    def publish(self, event: str, data: Dict) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            if event == "token":
+                ev, targets = {"event": event, "data": data}, [q for q, t in self._subs if t]
+            else:
+                self.seq += 1
+                ev = {"id": self.seq, "event": event, "data": data}
+                self.history.append(ev)
+                targets = [q for q, _ in self._subs]
+            if event == "end":
+                self.closed, self._subs = True, []
+        for q in targets:
+            self.loop.call_soon_threadsafe(_offer, q, ev)
+        if event == "end":
+            self.loop.call_soon_threadsafe(self.loop.call_later, END_TTL, _drop, self)
+
+    def wants_tokens(self) -> bool:
+        with self._lock:
+            return any(t for _, t in self._subs)
+
+    # ── consumers (event loop) ────────────────────────────────
+    def subscribe(self, last_id: int = 0,
+                  tokens: bool = False) -> Tuple[Optional[asyncio.Queue], List[Dict]]:
+        """Register a subscriber; returns its queue and the events it missed.
+
+        The queue is ``None`` once the job has ended – the history is all there is.
+        """
+        with self._lock:
+            missed = [ev for ev in self.history if ev["id"] > last_id]
+            if self.closed:
+                return None, missed
+            q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_LIMIT)
+            self._subs.append((q, tokens))
+        return q, missed
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        with self._lock:
+            self._subs = [(s, t) for s, t in self._subs if s is not q]
+
+
+def _offer(q: asyncio.Queue, ev: Dict) -> None:
+    try:
+        q.put_nowait(ev)
+    except asyncio.QueueFull:                     # slow client – drop rather than block the job
+        if ev["event"] != "token":
+            print(f"⚠️  SSE queue full, dropped {ev['event']} event")
+
+
+def _drop(bus: JobEvents) -> None:
+    if _BUSES.get(bus.job_id) is bus:             # not replaced by a resumed run
+        del _BUSES[bus.job_id]
+
+
+# ── module API ────────────────────────────────────────────────
+def open_bus(job_id: str) -> JobEvents:
+    """Create the bus for a job; must be called from the event loop."""
+    bus = _BUSES[job_id] = JobEvents(asyncio.get_running_loop(), job_id)
+    return bus
+
+def get_bus(job_id: str) -> Optional[JobEvents]:
+    return _BUSES.get(job_id)
+
+def emit(job_id: Optional[str], event: str, **data) -> None:
+    """Publish an event for *job_id*; a no-op outside a submitted job."""
+    bus = _BUSES.get(job_id) if job_id else None
+    if bus is not None:
+        bus.publish(event, data)
+
+def wants_tokens(job_id: Optional[str]) -> bool:
+    bus = _BUSES.get(job_id) if job_id else None
+    return bus is not None and bus.wants_tokens()
@@ -0,0 +1,44 @@
+# backend/test_chunk_packing.py
+
+from agents.utils.chunk_packing import build_batch_message, pack_chunks, split_batch_response
+
+words = lambda s: len(s.split())
+
+
+def _blk(i, n):
+    return {"id": f"c{i}", "code": " ".join(["x"] * n)}
+
+
+def _ids(bins):
+    return [[b["id"] for b in bin_] for bin_ in bins]
+
+
+def test_pack_by_budget_in_source_order():
+    blocks = [_blk(1, 4), _blk(2, 4), _blk(3, 4), _blk(4, 4)]
+    bins = pack_chunks(blocks, words, budget=10, small_limit=5, max_per_batch=8)
+    assert _ids(bins) == [["c1", "c2"], ["c3", "c4"]]
+
+
+def test_large_chunks_get_their_own_bin():
+    blocks = [_blk(1, 2), _blk(2, 50), _blk(3, 2), _blk(4, 2)]
+    bins = pack_chunks(blocks, words, budget=100, small_limit=10, max_per_batch=8)
+    assert _ids(bins) == [["c1"], ["c2"], ["c3", "c4"]]
+
+
+def test_max_per_batch():
+    blocks = [_blk(i, 1) for i in range(5)]
+    bins = pack_chunks(blocks, words, budget=100, small_limit=10, max_per_batch=2)
+    assert [len(b) for b in bins] == [2, 2, 1]
+
+
+def test_split_round_trip():
+    blocks = [{"id": "c1", "code": "%let a = 1;"}, {"id": "c2", "code": "%let b = 2;"}]
+    msg = build_batch_message(blocks, "sas", "pyspark")
+    assert "<<<CHUNK c1>>>" in msg and "<<<END c2>>>" in msg
+    answer = "<<<CHUNK c1>>>\na = 1\n<<<END c1>>>\n\n<<<CHUNK c2>>>\nb = 2\n<<<END c2>>>"
+    assert split_batch_response(answer, ["c1", "c2"]) == {"c1": "a = 1", "c2": "b = 2"}
+
+
+def test_split_requires_every_chunk():
+    assert split_batch_response("<<<CHUNK c1>>>\na = 1\n<<<END c1>>>", ["c1", "c2"]) is None
+    assert split_batch_response("<<<CHUNK c1>>>\n\n<<<END c1>>>", ["c1"]) is None
@@ -0,0 +1,57 @@
+# backend/test_chunk_templating.py
+
+from agents.utils.chunk_templating import canonicalize, group_equivalent, instantiate
+
+
+def test_canonical_form_ignores_names_and_literals():
+    a, a_slots = canonicalize("data sales_2020; set raw.sales; where amt > 100; run;")
+    b, b_slots = canonicalize("DATA refunds_2021;  SET raw.refunds;\nWHERE amt > 250; RUN;")
+    assert a == b
+    assert a_slots == [("ident", "sales_2020"), ("ident", "raw"), ("ident", "sales"),
+                       ("ident", "amt"), ("num", "100")]
+    assert b_slots[-1] == ("num", "250")
+
+
+def test_proc_name_is_structural():
+    assert canonicalize("proc sort data=a; run;")[0] != canonicalize("proc means data=a; run;")[0]
+
+
+def test_group_equivalent():
+    blocks = [
+        {"id": "c1", "code": "data out_a; set in_a; run;"},
+        {"id": "c2", "code": "proc sort data=x; by k; run;"},
+        {"id": "c3", "code": "data out_b; set in_b; run;"},
+        {"id": "c4", "code": "run;"},                       # no slots
+        {"id": "c5", "code": "run;"},
+    ]
+    plan = group_equivalent(blocks)
+    assert set(plan) == {"c3"}
+    assert plan["c3"]["rep"] == "c1"
+
+
+def test_instantiate_renames_in_one_pass():
+    rep_code = "data sales_out; set sales; where amt > 100; run;"
+    mem_code = "data sales; set sales_out; where amt > 100; run;"      # names swapped
+    rep_out = ('df = spark.table("sales")\n'
+               'df = df.filter(col("amt") > 100)\n'
+               'df.write.saveAsTable("sales_out")')
+    out = instantiate(rep_out, rep_code, canonicalize(rep_code)[1], canonicalize(mem_code)[1])
+    assert out == ('df = spark.table("sales_out")\n'
+                   'df = df.filter(col("amt") > 100)\n'
+                   'df.write.saveAsTable("sales")')
+
+
+def test_instantiate_refuses_unsafe_renames():
+    def go(rep_code, mem_code, rep_out):
+        return instantiate(rep_out, rep_code, canonicalize(rep_code)[1], canonicalize(mem_code)[1])
+
+    # short names are too ambiguous to rewrite
+    assert go("data ab; set cd; run;", "data ef; set gh; run;", "ab = cd") is None
+    # a name that does not appear in the output cannot be traced
+    assert go("data sales; set orders; run;", "data costs; set orders; run;",
+              "df = spark.table('orders')") is None
+    # the number also appears where the source does not have it
+    assert go("data sales; x = 100; run;", "data sales; x = 200; run;",
+              "x = 100  # 100 rows") is None
+    # nothing to rename: the output is reused as is
+    assert go("data sales; run;", "DATA SALES; RUN;", "spark.table('sales')") == "spark.table('sales')"
@@ -0,0 +1,230 @@
+# backend/test_datastage_parser.py
+
+from agents.utils.datastage_parser import HEADER, iter_jobs, process_datastage_string
+
+DSX = r"""BEGIN HEADER
+   CharacterSet "CP1252"
+   ServerVersion "11.7"
+END HEADER
+BEGIN DSJOB
+   Identifier "LoadOrders"
+   BEGIN DSRECORD
+      Identifier "ROOT"
+      OLEType "CJobDefn"
+      Name "LoadOrders"
+      JobType "3"
+      Parameters "CParameters"
+      BEGIN DSSUBRECORD
+         Name "pRunDate"
+         ParamType "0"
+         Default "2024-01-01"
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S1"
+      OLEType "CCustomStage"
+      Name "src_orders"
+      StageType "OracleConnectorPX"
+      OutputPins "V0S1P1"
+      StageXPos "48"
+      Properties "CCustomProperty"
+      BEGIN DSSUBRECORD
+         Name "XMLProperties"
+         Value =+=+=+=
+<Properties><Usage><SQL><SelectStatement><![CDATA[SELECT ORDER_ID, AMT
+FROM ORDERS WHERE DT = '#pRunDate#']]></SelectStatement></SQL></Usage></Properties>
+=+=+=+=
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S1P1"
+      OLEType "CCustomOutput"
+      Name "lnk_src"
+      Partner "V0S2|V0S2P1"
+      Columns "COutputColumn"
+      BEGIN DSSUBRECORD
+         Name "ORDER_ID"
+         SqlType "4"
+         KeyPosition "1"
+      END DSSUBRECORD
+      BEGIN DSSUBRECORD
+         Name "AMT"
+         SqlType "3"
+         Precision "12"
+         Scale "2"
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S2"
+      OLEType "CTransformerStage"
+      Name "xfm_clean"
+      InputPins "V0S2P1"
+      OutputPins "V0S2P2|V0S2P3"
+      StageVars "CStageVar"
+      BEGIN DSSUBRECORD
+         Name "svBig"
+         Expression "lnk_src.AMT > 1000"
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S2P1"
+      OLEType "CTrxInput"
+      Name "lnk_src"
+      Partner "V0S1|V0S1P1"
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S2P2"
+      OLEType "CTrxOutput"
+      Name "lnk_big"
+      Partner "V0S3|V0S3P1"
+      Constraint "svBig"
+      Columns "COutputColumn"
+      BEGIN DSSUBRECORD
+         Name "ORDER_ID"
+         SqlType "4"
+         Derivation "lnk_src.ORDER_ID"
+      END DSSUBRECORD
+      BEGIN DSSUBRECORD
+         Name "AMT_EUR"
+         SqlType "3"
+         Derivation "lnk_src.AMT * 0.9"
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S2P3"
+      OLEType "CTrxOutput"
+      Name "lnk_small"
+      Partner "V0S4|V0S4P1"
+      Constraint "Not(svBig)"
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S3"
+      OLEType "CCustomStage"
+      Name "tgt_big"
+      StageType "PxSequentialFile"
+      InputPins "V0S3P1"
+      Properties "CCustomProperty"
+      BEGIN DSSUBRECORD
+         Name "file"
+         Value "/out/big.txt"
+      END DSSUBRECORD
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S3P1"
+      OLEType "CCustomInput"
+      Name "lnk_big"
+      Partner "V0S2|V0S2P2"
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S4"
+      OLEType "CCustomStage"
+      Name "tgt_small"
+      StageType "PxDataSet"
+      InputPins "V0S4P1"
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S4P1"
+      OLEType "CCustomInput"
+      Name "lnk_small"
+      Partner "V0S2|V0S2P3"
+   END DSRECORD
+   BEGIN DSRECORD
+      Identifier "V0S9"
+      OLEType "CCustomStage"
+      Name "peek_other"
+      StageType "PxPeek"
+   END DSRECORD
+END DSJOB
+BEGIN DSJOB
+   Identifier "Second"
+   BEGIN DSRECORD
+      Identifier "V0S1"
+      OLEType "CCustomStage"
+      Name "only"
+      StageType "PxRowGenerator"
+   END DSRECORD
+END DSJOB
+"""
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<DSExport>
+  <Job Identifier="CopyCust">
+    <Record Identifier="ROOT" Type="JobDefn"><Property Name="JobType">3</Property></Record>
+    <Record Identifier="V1S1" Type="CustomStage">
+      <Property Name="Name">src_cust</Property>
+      <Property Name="StageType">PxSequentialFile</Property>
+      <Property Name="OutputPins">V1S1P1</Property>
+    </Record>
+    <Record Identifier="V1S1P1" Type="CustomOutput">
+      <Property Name="Name">lnk_cust</Property>
+      <Property Name="Partner">V1S2|V1S2P1</Property>
+      <Collection Name="Columns" Type="OutputColumn">
+        <SubRecord><Property Name="Name">CID</Property><Property Name="SqlType">12</Property>
+          <Property Name="Precision">20</Property></SubRecord>
+      </Collection>
+    </Record>
+    <Record Identifier="V1S2" Type="CustomStage">
+      <Property Name="Name">tgt_cust</Property>
+      <Property Name="StageType">PxDataSet</Property>
+      <Property Name="InputPins">V1S2P1</Property>
+    </Record>
+    <Record Identifier="V1S2P1" Type="CustomInput">
+      <Property Name="Name">lnk_cust</Property>
+      <Property Name="Partner">V1S1|V1S1P1</Property>
+    </Record>
+  </Job>
+</DSExport>
+"""
+
+
+def test_iter_jobs_reads_both_formats():
+    assert [j["name"] for j in iter_jobs(DSX)] == ["LoadOrders", "Second"]
+    assert [j["name"] for j in iter_jobs(XML)] == ["CopyCust"]
+
+
+def test_one_chunk_per_flow_in_link_order():
+    chunks = process_datastage_string(DSX)
+    assert [c["id"] for c in chunks] == ["blk_001", "blk_002", "blk_003"]
+    main = chunks[0]["code"]
+    assert main.startswith(HEADER)
+    assert "JOB LoadOrders (parallel, group 1/2)" in main
+    assert "pRunDate string = 2024-01-01" in main
+    assert main.index("STAGE src_orders") < main.index("STAGE xfm_clean") \
+        < main.index("STAGE tgt_big") < main.index("STAGE tgt_small")
+    # the unlinked peek stage is a flow of its own
+    assert "peek_other" not in main and "STAGE peek_other : PxPeek" in chunks[1]["code"]
+    assert "JOB Second (group 1/1)" in chunks[2]["code"]
+
+
+def test_logic_kept_layout_dropped():
+    main = process_datastage_string(DSX)[0]["code"]
+    assert "SelectStatement: SELECT ORDER_ID, AMT FROM ORDERS WHERE DT = '#pRunDate#'" in main
+    assert "svBig = lnk_src.AMT > 1000" in main
+    assert "OUT lnk_big -> tgt_big (constraint: svBig)" in main
+    assert "AMT_EUR decimal = lnk_src.AMT * 0.9" in main
+    assert "    ORDER_ID integer\n" in main           # pass-through derivation elided
+    assert "ORDER_ID integer key" in main
+    assert "StageXPos" not in main and "XMLProperties" not in main
+
+
+def test_large_flow_cut_into_groups_with_interfaces():
+    chunks = process_datastage_string(DSX, max_tokens=20)
+    load = [c["code"] for c in chunks if "JOB LoadOrders" in c["code"]]
+    assert len(load) > 2
+    cut = next(c for c in load if "STAGE xfm_clean" in c and "STAGE src_orders" not in c)
+    # the incoming link is rendered with its columns on the far side of the cut
+    assert "IN lnk_src <- src_orders (from another group)" in cut
+    assert "    AMT decimal(12,2)" in cut
+
+
+def test_xml_export():
+    [chunk] = process_datastage_string(XML)
+    assert "STAGE src_cust : PxSequentialFile" in chunk["code"]
+    assert "OUT lnk_cust -> tgt_cust" in chunk["code"]
+    assert "CID varchar(20)" in chunk["code"]
+
+
+def test_other_documents_fall_back_to_raw():
+    for doc in ("just some text", "<DSExport><Job>"):
+        chunks = process_datastage_string(doc)
+        assert chunks and not chunks[0]["code"].startswith(HEADER)
@@ -0,0 +1,46 @@
+# backend/test_incremental.py
+
+from agents.utils.incremental import chunk_hash, plan_reuse, reusable_output
+
+
+def _ok(code, stage="validated", **kw):
+    return {"ok": True, "stage": stage, "code": code, "input_tokens": 10, "output_tokens": 5, **kw}
+
+
+def test_hash_ignores_whitespace_padding():
+    assert chunk_hash("a;\nb;") == chunk_hash("\n\na;   \nb;\t\n\n")
+    assert chunk_hash("a;\nb;") != chunk_hash("a;\n  b;")
+
+
+def test_reusable_output():
+    assert reusable_output(_ok("x")) == "x"
+    assert reusable_output(_ok("x", stage="fixed", fixed_code="y")) == "y"
+    assert reusable_output(_ok("x", stage="converted")) is None
+    assert reusable_output({**_ok("x"), "ok": False}) is None
+
+
+def test_plan_reuse_diff():
+    prior  = [{"id": f"p{i}", "code": c} for i, c in enumerate("ABCD", 1)]
+    chunks = {b["id"]: _ok(b["code"].lower()) for b in prior}
+    new    = [{"id": f"n{i}", "code": c} for i, c in enumerate(["A  ", "B2", "C", "D", "E"], 1)]
+
+    reuse, diff = plan_reuse(prior, chunks, new)
+    assert diff == {"unchanged": 3, "changed": 1, "added": 1, "removed": 0}
+    assert reuse == {"n1": {"code": "a", "from": "p1", "tokens": 15},
+                     "n3": {"code": "c", "from": "p3", "tokens": 15},
+                     "n4": {"code": "d", "from": "p4", "tokens": 15}}
+
+
+def test_moved_chunks_are_reused_but_failed_ones_are_not():
+    prior  = [{"id": "p1", "code": "A"}, {"id": "p2", "code": "B"}]
+    chunks = {"p1": _ok("a"), "p2": {**_ok("b"), "ok": False}}
+    new    = [{"id": "n1", "code": "B"}, {"id": "n2", "code": "X"}, {"id": "n3", "code": "A"}]
+
+    reuse, _ = plan_reuse(prior, chunks, new)
+    assert reuse == {"n3": {"code": "a", "from": "p1", "tokens": 15}}
+
+
+def test_plan_reuse_without_prior_output():
+    reuse, diff = plan_reuse([{"id": "p1", "code": "A"}], {}, [{"id": "n1", "code": "A"}])
+    assert reuse == {}
+    assert diff == {"unchanged": 1, "changed": 0, "added": 0, "removed": 0}
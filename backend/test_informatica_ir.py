@@ -0,0 +1,84 @@
+# backend/test_informatica_ir.py
+
+from agents.utils.informatica_ir import HEADER, iter_mappings, process_informatica_string
+
+EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<POWERMART><REPOSITORY NAME="rep"><FOLDER NAME="SALES">
+  <SOURCE NAME="ORDERS" DATABASETYPE="Oracle" OWNERNAME="APP">
+    <SOURCEFIELD NAME="ID" DATATYPE="number" PRECISION="10" SCALE="0" KEYTYPE="PRIMARY KEY"
+                 OFFSET="0" PHYSICALLENGTH="10" DESCRIPTION="noise"/>
+    <SOURCEFIELD NAME="AMT" DATATYPE="decimal" PRECISION="12" SCALE="2"/>
+  </SOURCE>
+  <SOURCE NAME="CUSTOMERS" DATABASETYPE="Oracle" OWNERNAME="APP">
+    <SOURCEFIELD NAME="CID" DATATYPE="number" PRECISION="10" SCALE="0"/>
+  </SOURCE>
+  <TARGET NAME="BIG_ORDERS" DATABASETYPE="Snowflake">
+    <TARGETFIELD NAME="ID" DATATYPE="number" PRECISION="10" SCALE="0"/>
+  </TARGET>
+  <TARGET NAME="CUST_COPY" DATABASETYPE="Snowflake">
+    <TARGETFIELD NAME="CID" DATATYPE="number" PRECISION="10" SCALE="0"/>
+  </TARGET>
+  <MAPPING NAME="m_orders">
+    <TRANSFORMATION NAME="FIL_BIG" TYPE="Filter">
+      <TRANSFORMFIELD NAME="ID" DATATYPE="decimal" PRECISION="10" SCALE="0" PORTTYPE="INPUT/OUTPUT"/>
+      <TRANSFORMFIELD NAME="AMT2" DATATYPE="decimal" PRECISION="12" SCALE="2" PORTTYPE="OUTPUT"
+                      EXPRESSION="AMT *  2"/>
+      <TABLEATTRIBUTE NAME="Filter Condition" VALUE="AMT &gt; 100"/>
+      <TABLEATTRIBUTE NAME="Tracing Level" VALUE="Normal"/>
+    </TRANSFORMATION>
+    <TRANSFORMATION NAME="LKP_RATE" TYPE="Lookup Procedure">
+      <TABLEATTRIBUTE NAME="Lookup table name" VALUE="RATES"/>
+    </TRANSFORMATION>
+    <INSTANCE NAME="SQ_ORDERS" TRANSFORMATION_NAME="SQ_ORDERS" TYPE="TRANSFORMATION">
+      <ASSOCIATED_SOURCE_INSTANCE NAME="ORDERS"/>
+    </INSTANCE>
+    <INSTANCE NAME="ORDERS" TRANSFORMATION_NAME="ORDERS" TYPE="SOURCE"/>
+    <INSTANCE NAME="FIL_BIG" TRANSFORMATION_NAME="FIL_BIG" TYPE="TRANSFORMATION"/>
+    <INSTANCE NAME="BIG_ORDERS" TRANSFORMATION_NAME="BIG_ORDERS" TYPE="TARGET"/>
+    <INSTANCE NAME="CUSTOMERS" TRANSFORMATION_NAME="CUSTOMERS" TYPE="SOURCE"/>
+    <INSTANCE NAME="CUST_COPY" TRANSFORMATION_NAME="CUST_COPY" TYPE="TARGET"/>
+    <INSTANCE NAME="LKP_RATE" TRANSFORMATION_NAME="LKP_RATE" TYPE="TRANSFORMATION"/>
+    <CONNECTOR FROMINSTANCE="SQ_ORDERS" FROMFIELD="ID" TOINSTANCE="FIL_BIG" TOFIELD="ID"/>
+    <CONNECTOR FROMINSTANCE="FIL_BIG" FROMFIELD="ID" TOINSTANCE="BIG_ORDERS" TOFIELD="ID"/>
+    <CONNECTOR FROMINSTANCE="CUSTOMERS" FROMFIELD="CID" TOINSTANCE="CUST_COPY" TOFIELD="CID"/>
+  </MAPPING>
+</FOLDER></REPOSITORY></POWERMART>
+"""
+
+
+def test_one_slice_per_pipeline():
+    slices = list(iter_mappings(EXPORT))
+    assert [(s["mapping"], s["pipeline"], s["pipelines"]) for s in slices] == \
+        [("m_orders", 1, 2), ("m_orders", 2, 2)]
+    orders = next(s["ir"] for s in slices if "FIL_BIG" in s["ir"])
+    assert "CUSTOMERS" not in orders
+    assert "CUST_COPY" in next(s["ir"] for s in slices if s["ir"] != orders)
+
+
+def test_ir_keeps_logic_and_drops_noise():
+    ir = next(s["ir"] for s in iter_mappings(EXPORT) if "FIL_BIG" in s["ir"])
+    assert ir.startswith(HEADER)
+    assert "Filter Condition: AMT > 100" in ir
+    assert "AMT2 decimal(12,2) O = AMT * 2" in ir
+    assert "ID number(10,0) PK" in ir
+    assert "Tracing Level" not in ir and "noise" not in ir and "OFFSET" not in ir
+    # link order: source qualifier before the filter before the target
+    assert ir.index("ORDERS -> SQ_ORDERS") < ir.index("SQ_ORDERS -> FIL_BIG: ID") \
+        < ir.index("FIL_BIG -> BIG_ORDERS: ID")
+
+
+def test_unconnected_lookup_goes_with_every_pipeline():
+    assert all("LKP_RATE" in s["ir"] and "Lookup table name: RATES" in s["ir"]
+               for s in iter_mappings(EXPORT))
+
+
+def test_process_informatica_string():
+    chunks = process_informatica_string(EXPORT)
+    assert [c["id"] for c in chunks] == ["blk_001", "blk_002"]
+    assert all(c["code"].startswith(HEADER) for c in chunks)
+
+
+def test_non_powercenter_documents_fall_back_to_raw():
+    for doc in ("<ROOT><X/></ROOT>", "<ROOT><unclosed></ROOT>"):
+        chunks = process_informatica_string(doc)
+        assert chunks and not chunks[0]["code"].startswith(HEADER)
@@ -0,0 +1,93 @@
+# backend/test_sas_rules.py
+
+import pytest
+
+from agents.utils.sas_rules import convert_sas
+
+
+# ── accepted ───────────────────────────────────────────────────
+def test_let_statements():
+    assert convert_sas('%let cutoff = 2020;\n%let region = "EAST";', "pyspark") == \
+        "cutoff = 2020\nregion = 'EAST'"
+    assert convert_sas("%let cutoff = 2020;", "snowflake") == "SET cutoff = 2020;"
+
+
+def test_data_step_where_keep_rename():
+    code = ("data work.out; set lib.cust; "
+            "where age ge 18 and (state in ('NY', \"CA\") or name like 'A%'); "
+            "keep id age name; rename name=full_name; run;")
+    assert convert_sas(code, "snowflake") == (
+        "CREATE OR REPLACE TABLE out AS\n"
+        "SELECT id, age, name AS full_name\n"
+        "FROM lib.cust\n"
+        "WHERE age >= 18 AND (state IN ('NY', 'CA') OR name LIKE 'A%');")
+    py = convert_sas(code, "pyspark")
+    assert 'df = spark.table("lib.cust")' in py
+    assert "df.write.mode(\"overwrite\").saveAsTable(\"out\")" in py
+
+
+def test_literal_on_the_left():
+    out = convert_sas("data o; set i; where 10 <= amt; run;", "databricks")
+    assert "WHERE 10 <= amt" in out
+
+
+def test_proc_sort():
+    out = convert_sas("proc sort data=a out=b; by id descending dt; run;", "bigquery")
+    assert out == "CREATE OR REPLACE TABLE b AS\nSELECT *\nFROM a\nORDER BY id, dt DESC;"
+
+
+def test_proc_sql_passthrough():
+    code = ("proc sql; create table x as select a, count(*) as n from work.y "
+            "where s = \"a\" group by a; drop table z; quit;")
+    out = convert_sas(code, "snowflake")
+    assert "select a, count(*) as n from y where s = 'a' group by a;" in out
+    assert "DROP TABLE IF EXISTS z;" in out
+
+
+# ── rejected (left to the LLM) ─────────────────────────────────
+@pytest.mark.parametrize("code", [
+    # SAS literals with a type suffix
+    "data o; set i; where dt >= '01JAN2020'd; run;",
+    "data o; set i; where ts > '01JAN2020:00:00'dt; run;",
+    "proc sql; create table x as select * from y where dt >= '01JAN2020'd; quit;",
+    # functions outside the allow-list / row-wise aggregates
+    "proc sql; create table x as select intck('month', a, b) as m from y; quit;",
+    "proc sql; create table x as select sum(a, b) as s from y; quit;",
+    "data o; set i; where upcase(x) = 'A'; run;",
+    # comparisons that keep missing values in SAS but drop NULL in SQL
+    "data o; set i; where amt < 10; run;",
+    "data o; set i; where amt ne 10; run;",
+    "data o; set i; where not (amt > 10); run;",
+    "data o; set i; where a = b; run;",
+    "data o; set i; where name = ''; run;",
+    # SAS missing also matches blank strings, SQL NULL does not
+    "data o; set i; where name is missing; run;",
+    "data o; set i; where name is not missing; run;",
+    "data o; set i; where name is null; run;",
+    "proc sql; create table x as select * from y where name is not null; quit;",
+    # the first row of each BY group depends on input order
+    "proc sort data=a out=b nodupkey; by id; run;",
+    "proc sort data=a out=b nodup; by id; run;",
+    "proc sql; create table x as select * from y where amt < 10; quit;",
+    "proc sql; create table x as select * from a join b on a.id = b.id; quit;",
+    # SAS-only syntax
+    "data o; set i; where x = .; run;",
+    "data o; set i; where x = &cut; run;",
+    "data o; set i; y = x + 1; run;",
+    "proc sql; select a into :m from y; quit;",
+    "proc sql; create table x as select a, calculated b from y; quit;",
+])
+def test_rejected(code):
+    assert convert_sas(code, "snowflake") is None
+    assert convert_sas(code, "pyspark") is None
+
+
+def test_bigquery_let_rejected():
+    # DECLARE is only valid at the start of the merged BigQuery script
+    assert convert_sas("%let cutoff = 2020;", "bigquery") is None
+    assert convert_sas("data o; set i; run;\n%let cutoff = 2020;", "bigquery") is None
+    assert convert_sas("data o; set i; run;", "bigquery").startswith("CREATE OR REPLACE TABLE o")
+
+
+def test_unknown_target():
+    assert convert_sas("%let a = 1;", "dbt") is None
@@ -0,0 +1,50 @@
+# backend/test_sql_transpile.py
+
+import importlib.util
+
+import pytest
+
+from agents.utils.sql_transpile import plan_chunk, stitch, supported
+
+needs_sqlglot = pytest.mark.skipif(importlib.util.find_spec("sqlglot") is None,
+                                   reason="sqlglot not installed")
+
+
+def test_unknown_pairs_go_to_the_llm():
+    assert plan_chunk("select 1;", "sas", "snowflake") is None
+    assert plan_chunk("select 1;", "snowflake", "snowflake") is None
+    assert not supported("oracle", "pyspark")
+
+
+def test_stitch_keeps_statement_order():
+    plan = {"head": ["SELECT 1"], "llm": "...", "tail": ["SELECT 3;"]}
+    assert stitch(plan, "  SELECT 2;\n") == "SELECT 1;\n\nSELECT 2;\n\nSELECT 3;"
+    assert stitch({"head": [], "llm": "...", "tail": []}, "SELECT 2;") == "SELECT 2;"
+
+
+@needs_sqlglot
+def test_fully_transpiled_chunk():
+    plan = plan_chunk("SELECT TOP 5 a FROM t;\nDELETE FROM t WHERE a = 1;",
+                      "MS SQL Server", "snowflake")
+    assert plan["llm"] is None
+    assert "LIMIT 5" in plan["code"]
+    assert plan["code"].count(";") == 2
+    assert [s["via"] for s in plan["statements"]] == ["sqlglot", "sqlglot"]
+
+
+@needs_sqlglot
+def test_unknown_function_span_goes_to_the_llm():
+    code = ("SELECT TOP 1 a FROM t1;\n"
+            "SELECT my_udf(a) FROM t2;\n"
+            "SELECT TOP 2 b FROM t3;")
+    plan = plan_chunk(code, "ms sql server", "databricks")
+    assert "LIMIT 1" in plan["head"][0]
+    assert "my_udf" in plan["llm"]
+    assert "LIMIT 2" in plan["tail"][0]
+    assert [s["via"] for s in plan["statements"]] == ["sqlglot", "llm", "sqlglot"]
+    assert stitch(plan, "-- converted").index("-- converted") > 0
+
+
+@needs_sqlglot
+def test_nothing_transpiled():
+    assert plan_chunk("SELECT my_udf(a) FROM t;", "teradata", "bigquery") is None
@@ -0,0 +1,54 @@
+# backend/test_token_chunker.py
+
+import pytest
+
+from agents.utils import token_chunker
+from agents.utils.token_chunker import boundary_kind, resize_chunks
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # one token per word, independent of tiktoken being installed
+    monkeypatch.setattr(token_chunker, "count_tokens", lambda model, text: len(text.split()))
+
+
+def _step(i, n=8):
+    return f"data t{i}; set s{i};\n" + " ".join(["x"] * n) + ";\nrun;"
+
+
+def test_boundary_kind():
+    assert boundary_kind("SAS") == "sas"
+    assert boundary_kind("plsql") == "plsql"
+    assert boundary_kind("teradata") == "sql"
+    assert boundary_kind("informatica") is None
+
+
+def test_whole_document_sources_are_untouched():
+    chunks = [{"id": "m1", "code": "<MAPPING/>"}]
+    assert resize_chunks(chunks, "gpt-4o", "informatica", target_tokens=1) is chunks
+
+
+def test_large_chunk_split_at_run_boundaries():
+    code = "\n".join(_step(i) for i in range(6))
+    out = resize_chunks([{"id": "c1", "code": code}], "gpt-4o", "sas", target_tokens=25)
+    assert len(out) > 1
+    assert [c["id"] for c in out] == [f"blk_{i+1:03}" for i in range(len(out))]
+    assert all(c["code"].rstrip().endswith("run;") for c in out)
+    assert "\n".join(c["code"] for c in out).split() == code.split()
+
+
+def test_tiny_chunks_are_merged():
+    chunks = [{"id": f"c{i}", "code": f"%let v{i} = {i};"} for i in range(10)]
+    out = resize_chunks(chunks, "gpt-4o", "sas", target_tokens=200)
+    assert len(out) == 1
+    assert out[0]["code"].count("%let") == 10
+
+
+def test_plsql_block_not_split_inside_begin_end():
+    # past the target but under the hard cap: statement ends inside the block are not cuts
+    body = "\n".join(f"  x{i} := {i};" for i in range(8))
+    tail = "\n".join(f"select {i} from dual;" for i in range(8))
+    code = f"BEGIN\n{body}\nEND;\n/\n{tail}"
+    out = resize_chunks([{"id": "c1", "code": code}], "gpt-4o", "plsql", target_tokens=20)
+    assert out[0]["code"].startswith("BEGIN") and out[0]["code"].endswith("END;")
+    assert "\n".join(c["code"] for c in out).split() == code.split()
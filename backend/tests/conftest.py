@@ -0,0 +1,21 @@
+# backend/tests/conftest.py
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import db
+from services import chunk_cache, job_checkpoint
+
+
+@pytest.fixture
+def sync_db(tmp_path, monkeypatch):
+    """Blocking session factory on a throw-away sqlite file for the services."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    db.Base.metadata.create_all(engine)
+    session = sessionmaker(engine, expire_on_commit=False)
+    for mod in (chunk_cache, job_checkpoint):
+        monkeypatch.setattr(mod, "SyncSession", session)
+        monkeypatch.setattr(mod, "_SCHEMA_READY", True)
+    yield session
+    engine.dispose()
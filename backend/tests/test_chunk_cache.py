@@ -0,0 +1,170 @@
+# backend/tests/test_chunk_cache.py
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agents import llm_rule_agent, validate_agent
+from services import chunk_cache
+
+META = {"source": "sas", "target": "pyspark", "ddl_type": "general",
+        "model_name": "gpt-4o", "prompt_version": "v1"}
+
+
+def _key(code="data a; set b; run;", **kw):
+    args = {**META, **kw}
+    return chunk_cache.cache_key(code, args["source"], args["target"], args["ddl_type"],
+                                 args["model_name"], args["prompt_version"])
+
+
+def _ok(code="df = spark.table('b')"):
+    return {"id": "c1", "ok": True, "code": code, "input_tokens": 7, "output_tokens": 3}
+
+
+# ── keys ───────────────────────────────────────────────────────
+def test_key_ignores_whitespace_only_changes():
+    assert _key("data a;\r\n\n\n  set b;   \nrun;") == _key("data a;\n  set b;\nrun;")
+    assert _key("data a;\nset b;\nrun;") != _key("data a;\n  set b;\nrun;")
+
+
+@pytest.mark.parametrize("field", ["source", "target", "ddl_type", "model_name", "prompt_version"])
+def test_key_covers_every_setting(field):
+    assert _key(**{field: "other"}) != _key()
+
+
+def test_key_is_case_insensitive_for_settings():
+    assert _key(target="PySpark", model_name="GPT-4o") == _key()
+
+
+# ── storage ────────────────────────────────────────────────────
+def test_tenants_are_isolated(sync_db):
+    chunk_cache.store("1", _key(), META, "out", 7, 3)
+    assert chunk_cache.lookup("1", _key()) == {"code": "out", "input_tokens": 7,
+                                               "output_tokens": 3}
+    assert chunk_cache.lookup("2", _key()) is None
+
+
+def test_lru_eviction_per_tenant(sync_db, monkeypatch):
+    monkeypatch.setattr(chunk_cache.settings, "CHUNK_CACHE_MAX_BYTES_PER_TENANT", 10)
+    chunk_cache.store("1", "a", META, "x" * 6, 0, 0)
+    chunk_cache.store("2", "a", META, "x" * 6, 0, 0)
+    chunk_cache.store("1", "b", META, "y" * 6, 0, 0)
+    assert chunk_cache.lookup("1", "a") is None
+    assert chunk_cache.lookup("1", "b")["code"] == "y" * 6
+    assert chunk_cache.lookup("2", "a") is not None
+
+
+# ── get-or-convert ─────────────────────────────────────────────
+def test_miss_is_not_stored_until_promoted(sync_db):
+    res, outcome = chunk_cache.get_or_convert("1", _key(), META, _ok)
+    assert outcome == "miss"
+    assert chunk_cache.lookup("1", _key()) is None
+
+    chunk_cache.promote(chunk_cache.entry("1", _key(), META, res))
+    res, outcome = chunk_cache.get_or_convert("1", _key(), META, lambda: pytest.fail("called"))
+    assert (outcome, res["code"], res["input_tokens"]) == ("hit", _ok()["code"], 7)
+
+
+def test_promote_with_repaired_output(sync_db):
+    chunk_cache.promote(chunk_cache.entry("1", _key(), META, _ok("broken(")), "fixed()")
+    assert chunk_cache.lookup("1", _key())["code"] == "fixed()"
+
+
+class _WatchedFuture(Future):
+    """Future that reports when somebody starts waiting on it."""
+    waiting = None
+
+    def result(self, timeout=None):
+        type(self).waiting.set()
+        return super().result(timeout)
+
+
+@pytest.fixture
+def follower_waiting(monkeypatch):
+    _WatchedFuture.waiting = threading.Event()
+    monkeypatch.setattr(chunk_cache, "Future", _WatchedFuture)
+    return _WatchedFuture.waiting
+
+
+def _race(convert):
+    """Two identical requests at once; whichever opens the flight leads."""
+    out = {}
+    def run(name):
+        try:
+            out[name] = chunk_cache.get_or_convert("1", _key(), META, convert)
+        except RuntimeError as e:
+            out[name] = e
+    threads = [threading.Thread(target=run, args=(n,)) for n in ("leader", "follower")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return out
+
+
+def test_concurrent_identical_requests_are_coalesced(sync_db, follower_waiting):
+    calls = []
+    def convert():
+        calls.append(1)
+        assert follower_waiting.wait(5)
+        return _ok()
+
+    out = _race(convert)
+    assert len(calls) == 1
+    assert sorted(outcome for _, outcome in out.values()) == ["coalesced", "miss"]
+    assert out["follower"][0]["code"] == out["leader"][0]["code"]
+    assert not chunk_cache._INFLIGHT
+
+
+def test_leader_failure_reaches_waiters_and_clears_the_flight(sync_db, follower_waiting):
+    def boom():
+        assert follower_waiting.wait(5)
+        raise RuntimeError("provider down")
+
+    out = _race(boom)
+    assert str(out["leader"]) == str(out["follower"]) == "provider down"
+    assert not chunk_cache._INFLIGHT
+    assert chunk_cache.get_or_convert("1", _key(), META, _ok)[1] == "miss"
+
+
+def test_cache_errors_do_not_fail_the_conversion(monkeypatch):
+    def broken(*a):
+        raise RuntimeError("db gone")
+    monkeypatch.setattr(chunk_cache, "lookup", broken)
+    monkeypatch.setattr(chunk_cache, "store", broken)
+    res, outcome = chunk_cache.get_or_convert("1", _key(), META, _ok)
+    assert outcome == "miss" and res["ok"]
+    chunk_cache.promote(chunk_cache.entry("1", _key(), META, res))
+
+
+# ── only validated output is stored ────────────────────────────
+class _EmptyLLM:
+    def invoke(self, messages):
+        return AIMessage(content="   ")
+
+
+def test_empty_reply_is_a_failure():
+    blk = {"id": "c1", "type": "DATA", "code": "data a; set b; run;"}
+    res = llm_rule_agent._convert_chunk(_EmptyLLM(), blk, "gpt-4o", "sas", "pyspark", "general")
+    assert res["ok"] is False
+    assert res["code"] == "# LLM returned empty"
+
+
+def test_validate_node_promotes_only_valid_chunks(sync_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    good, bad = _key("data good; run;"), _key("data bad; run;")
+    state = {
+        "target": "pyspark", "rule_csv": str(tmp_path / "rules.csv"), "logs": [],
+        "ast_blocks": [{"id": "c1", "code": "data good; run;"},
+                       {"id": "c2", "code": "data bad; run;"}],
+        "pyspark_chunks": [{"id": "c1", "code": "x = 1"}, {"id": "c2", "code": "x = ("}],
+        "cache_pending": {
+            "c1": {**chunk_cache.entry("1", good, META, _ok("x = 1")), "split": False},
+            "c2": {**chunk_cache.entry("1", bad, META, _ok("x = (")), "split": False},
+        },
+    }
+    validate_agent.validate_node(state)
+    assert chunk_cache.lookup("1", good)["code"] == "x = 1"
+    assert chunk_cache.lookup("1", bad) is None
@@ -0,0 +1,93 @@
+# backend/tests/test_concurrency.py
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from agents import llm_rule_agent
+from agents.parse_agent import parse_node
+from agents.utils import concurrency, credential_pool
+from agents.utils.concurrency import bounded_map, credential_key, credential_slot
+from benchmarks.corpus import generate
+from config import settings
+
+
+class _Gauge:
+    """Highest number of concurrent holders, overall and per key."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.now, self.peak = defaultdict(int), defaultdict(int)
+
+    def hold(self, key, sec=0.02):
+        with self.lock:
+            self.now[key] += 1
+            self.now["*"] += 1
+            for k in (key, "*"):
+                self.peak[k] = max(self.peak[k], self.now[k])
+        time.sleep(sec)
+        with self.lock:
+            self.now[key] -= 1
+            self.now["*"] -= 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphores(monkeypatch):
+    monkeypatch.setattr(concurrency, "_CRED_SEMAPHORES", {})
+
+
+def test_bounded_map_keeps_order_within_the_job_limit():
+    gauge = _Gauge()
+    def work(i):
+        gauge.hold("job")
+        return i * i
+    assert bounded_map(work, list(range(12)), max_workers=3) == [i * i for i in range(12)]
+    assert gauge.peak["job"] == 3
+
+
+def test_credential_slot_caps_each_key_separately():
+    gauge = _Gauge()
+    def call(key):
+        with credential_slot(key, 2):
+            gauge.hold(key)
+        return key
+    bounded_map(call, ["a", "b"] * 8, max_workers=8)
+    assert gauge.peak["a"] == 2 and gauge.peak["b"] == 2
+    assert gauge.peak["*"] == 4                  # one key's cap does not hold up the other
+    with credential_slot(None, 1), credential_slot(None, 1):
+        pass                                     # no key, no limit
+
+
+def test_pooled_job_is_capped_per_member_credential(monkeypatch, tmp_path):
+    # two pool members, one slot each: a job with 4 workers runs 2 calls at a time
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm_rule_agent, "RULE_DIR", tmp_path)
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY_PER_CREDENTIAL", 1)
+    monkeypatch.setattr(settings, "CHUNK_CACHE_ENABLED", False)
+    turns = itertools.cycle([0, 1])             # alternate members instead of a weighted draw
+    monkeypatch.setattr(credential_pool, "pick",
+                        lambda keys, exclude=(): keys[next(turns)] if not exclude else None)
+    gauge, real = _Gauge(), llm_rule_agent.invoke_llm
+    def gauged(llm, messages, *, cred_key=None, **kw):
+        gauge.hold(cred_key)
+        return real(llm, messages, cred_key=cred_key, **kw)
+    monkeypatch.setattr(llm_rule_agent, "invoke_llm", gauged)
+
+    members = [{"provider": "mock",
+                "cred": {"model_name": "gpt-4o", "mock": {"latency_ms": 1, "seed": s}}}
+               for s in (1, 2)]
+    state = {"sas_code": generate("sas", 600), "source": "sas", "target": "pyspark",
+             "ddl_type": "general", "logs": [], "chunk_target_tokens": 200,
+             "llm_provider": "mock", "llm_cred": members[0]["cred"], "llm_pool": members,
+             "max_concurrency": 4, "pack_chunks": False, "rule_fast_path": False}
+    state = parse_node(state)
+    out = llm_rule_agent.llm_rule_node(state)
+
+    keys = {credential_key(m["cred"]) for m in members}
+    assert len(state["ast_blocks"]) > 4 and not out.get("failed_chunks")
+    assert {k for k in gauge.peak if k != "*"} == keys
+    assert all(gauge.peak[k] == 1 for k in keys)
+    assert gauge.peak["*"] == 2                 # not held to the job credential's one slot
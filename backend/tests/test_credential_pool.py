@@ -0,0 +1,135 @@
+# backend/tests/test_credential_pool.py
+
+import pytest
+
+from agents.utils import credential_pool as pool
+from config import settings
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SEC", 30.0)
+    monkeypatch.setattr(pool, "_HEALTH", {})
+    clock = _Clock()
+    monkeypatch.setattr(pool, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def draws(monkeypatch):
+    """Replaces the weighted draw: records ``{key: weight}`` and takes the heaviest."""
+    seen = []
+    def choices(population, weights):
+        seen.append({h.key: w for h, w in zip(population, weights)})
+        return [max(zip(population, weights), key=lambda p: p[1])[0]]
+    monkeypatch.setattr(pool.random, "choices", choices)
+    return seen
+
+
+def _trip(key, n=3):
+    for _ in range(n):
+        pool.record(key, ok=False)
+
+
+def _state(key):
+    return pool.breaker_snapshots([key])[key]["state"]
+
+
+# ── breaker ────────────────────────────────────────────────────
+def test_consecutive_failures_open_the_breaker(clock, draws):
+    _trip("a", 2)
+    pool.record("a", ok=True)                  # a success resets the streak
+    _trip("a", 2)
+    assert _state("a") == pool.CLOSED
+    pool.record("a", ok=False)
+    assert _state("a") == pool.OPEN
+    assert pool.breaker_snapshots()["a"]["trips"] == 1
+    assert pool.pick(["a", "b"]) == "b"
+
+
+def test_open_breaker_waits_out_the_cooldown(clock, draws):
+    _trip("a")
+    clock.now = 1029.9
+    assert pool.pick(["a", "b"]) == "b"
+    assert set(draws[-1]) == {"b"}
+    assert pool.breaker_snapshots()["a"]["reopens_in_sec"] == pytest.approx(0.1)
+    clock.now = 1030.0
+    pool.pick(["a", "b"])
+    assert set(draws[-1]) == {"a", "b"}        # "a" is a candidate again
+    assert _state("a") == pool.HALF_OPEN
+
+
+def test_half_open_lets_one_probe_through(clock, draws):
+    _trip("a")
+    clock.now += 30
+    assert pool.pick(["a"]) == "a"             # the probe
+    draws.clear()
+    pool.pick(["a"])                           # no second probe: all-open fallback
+    assert draws == []
+
+
+def test_probe_success_closes_the_breaker(clock, draws):
+    _trip("a")
+    clock.now += 30
+    pool.pick(["a"])
+    pool.record("a", ok=True, slowness=1.0)
+    assert _state("a") == pool.CLOSED
+    assert pool.pick(["a", "b"]) in ("a", "b") and len(draws[-1]) == 2
+
+
+def test_probe_failure_reopens_the_breaker(clock, draws):
+    _trip("a")
+    clock.now += 30
+    pool.pick(["a"])
+    pool.record("a", ok=False)                 # one failure is enough when half-open
+    assert _state("a") == pool.OPEN
+    assert pool.breaker_snapshots()["a"]["trips"] == 2
+    assert pool.breaker_snapshots()["a"]["reopens_in_sec"] == 30.0
+
+
+def test_release_frees_the_probe_after_a_cache_hit(clock, draws):
+    _trip("a")
+    clock.now += 30
+    pool.pick(["a", "b"], exclude=["b"])
+    pool.release("a")                          # no call was made
+    draws.clear()
+    assert pool.pick(["a"]) == "a" and draws   # drawn again, not the fallback
+    assert _state("a") == pool.HALF_OPEN
+    pool.release("unknown")                    # harmless for keys never picked
+
+
+def test_all_open_falls_back_to_the_first_to_reopen(clock, draws):
+    _trip("a")
+    clock.now += 10
+    _trip("b")
+    assert pool.pick(["b", "a"]) == "a"
+    assert draws == []
+    assert pool.pick(["a"], exclude=["a"]) is None
+
+
+# ── weighting ──────────────────────────────────────────────────
+def test_pick_weights_by_errors_and_slowness(clock, draws):
+    pool.record("fast", ok=True, slowness=0.5)
+    pool.record("slow", ok=True, slowness=3.0)
+    pool.record("flaky", ok=False)
+    assert pool.pick(["fast", "slow", "flaky"]) == "fast"
+    w = draws[-1]
+    assert w["fast"] == pytest.approx(1 / 0.9)           # slowness 0.8·1 + 0.2·0.5
+    assert w["slow"] == pytest.approx(1 / 1.4)           # slowness 0.8·1 + 0.2·3
+    assert w["flaky"] == pytest.approx(0.8)              # error_rate 0.2
+
+
+def test_pool_members_defaults_to_the_job_credential():
+    own = {"llm_provider": "mock", "llm_cred": {"model_name": "m"}}
+    assert pool.pool_members(own) == [{"provider": "mock", "cred": {"model_name": "m"}}]
+    member = {"provider": "azure", "cred": {"id": 2}}
+    assert pool.pool_members({**own, "llm_pool": [member, {"provider": "x"}]}) == [member]
@@ -0,0 +1,118 @@
+# backend/tests/test_hedging.py
+
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agents.utils import hedging, llm_stream
+from agents.utils.hedging import CallCancelled, ChunkDeadlineExceeded, hedged_call
+from config import Settings, settings
+
+KEY = "cred-a"
+
+
+@pytest.fixture(autouse=True)
+def fast_prior(monkeypatch):
+    """p95 ≈ 50 ms, hedging on, no deadline; fresh counters per test."""
+    for name, value in (("LLM_HEDGE_ENABLED", True), ("LLM_HEDGE_MAX_RATE", 1.0),
+                        ("LLM_EXPECTED_BASE_SEC", 0.05), ("LLM_EXPECTED_TOKENS_PER_SEC", 1e9),
+                        ("LLM_CHUNK_DEADLINE_FACTOR", 0.0)):
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(hedging, "_KEYS", {})
+    monkeypatch.setattr(hedging, "_JOBS", {})
+
+
+def _answer(text):
+    return lambda cancel: text
+
+
+def _stuck(cancelled: threading.Event, partial="x" * 40):
+    """An attempt that only stops once it is cancelled (2 s safety net)."""
+    def run(cancel):
+        if cancel.wait(2):
+            cancelled.set()
+            raise CallCancelled(partial)
+        return "late"
+    return run
+
+
+def _never(cancel):
+    raise AssertionError("backup must not be called")
+
+
+def test_fast_primary_is_not_hedged():
+    assert hedged_call(_answer("a"), _never, key=KEY, out_tokens=1, job_id="j") == "a"
+    stats = hedging.take_job_stats("j")
+    assert (stats["calls"], stats["hedged"]) == (1, 0)
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    lost = threading.Event()
+    out = hedged_call(_stuck(lost), _answer("b"), key=KEY, out_tokens=1,
+                      in_tokens=100, job_id="j")
+    assert out == "b"
+    assert lost.wait(1)                      # the losing primary was told to stop
+    stats = hedging.take_job_stats("j")
+    assert (stats["hedged"], stats["backup_wins"]) == (1, 1)
+    assert stats["wasted_input"] == 100 and stats["wasted_output"] == 10
+
+
+@pytest.mark.parametrize("setting, value", [("LLM_HEDGE_ENABLED", False),
+                                            ("LLM_HEDGE_MAX_RATE", 0.0)])
+def test_hedge_off_or_over_budget(monkeypatch, setting, value):
+    monkeypatch.setattr(settings, setting, value)
+    def slow(cancel):
+        cancel.wait(0.2)
+        return "a"
+    assert hedged_call(slow, _never, key=KEY, out_tokens=1) == "a"
+
+
+def test_failed_primary_fails_over_to_backup():
+    def broken(cancel):
+        raise RuntimeError("boom")
+    assert hedged_call(broken, _answer("b"), key=KEY, out_tokens=1, failover=True) == "b"
+    with pytest.raises(RuntimeError, match="boom"):
+        hedged_call(broken, None, key=KEY, out_tokens=1, failover=True)
+
+
+def test_deadline_cancels_every_attempt(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_DEADLINE_FACTOR", 2.0)
+    monkeypatch.setattr(settings, "LLM_CHUNK_DEADLINE_MIN_SEC", 0.2)
+    first, second = threading.Event(), threading.Event()
+    with pytest.raises(ChunkDeadlineExceeded):
+        hedged_call(_stuck(first), _stuck(second), key=KEY, out_tokens=1, job_id="j")
+    assert first.wait(1) and second.wait(1)
+    stats = hedging.take_job_stats("j")
+    assert (stats["hedged"], stats["deadline_exceeded"]) == (1, 1)
+
+
+def test_hedging_and_deadlines_are_opt_in():
+    fields = Settings.model_fields
+    assert fields["LLM_HEDGE_ENABLED"].default is False
+    assert fields["LLM_CHUNK_DEADLINE_FACTOR"].default == 0
+    assert hedging.chunk_deadline(KEY, 1) is None
+
+
+# ── invoke_llm ─────────────────────────────────────────────────
+class _LLM:
+    def __init__(self, text, delay=0.0):
+        self.text, self.delay, self.calls = text, delay, 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        threading.Event().wait(self.delay)
+        return AIMessage(content=self.text)
+
+
+def test_no_hedge_onto_the_same_credential():
+    slow, dup = _LLM("a", delay=0.2), _LLM("b")
+    out = llm_stream.invoke_llm(slow, [], cred_key=KEY, out_tokens=1, hedge=(dup, KEY))
+    assert out.content == "a" and dup.calls == 0
+    assert hedging.hedge_snapshots().get(KEY) is None     # not routed through hedged_call
+
+
+def test_hedge_onto_another_credential():
+    slow, other = _LLM("a", delay=1.0), _LLM("b")
+    out = llm_stream.invoke_llm(slow, [], cred_key=KEY, out_tokens=1, hedge=(other, "cred-b"))
+    assert out.content == "b" and other.calls == 1
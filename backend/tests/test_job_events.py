@@ -0,0 +1,96 @@
+# backend/tests/test_job_events.py
+
+import asyncio
+import threading
+
+import pytest
+
+from tasks import job_events
+from tasks.job_events import emit, get_bus, open_bus, wants_tokens
+
+
+@pytest.fixture(autouse=True)
+def buses(monkeypatch):
+    monkeypatch.setattr(job_events, "_BUSES", {})
+    monkeypatch.setattr(job_events, "END_TTL", 0.05)
+
+
+async def _drain(q, n):
+    return [await asyncio.wait_for(q.get(), 1) for _ in range(n)]
+
+
+def test_late_subscriber_gets_the_history():
+    async def main():
+        open_bus("j")
+        emit("j", "status", step="parse")
+        emit("j", "chunk", id="c1", state="converted")
+        q, missed = get_bus("j").subscribe()
+        emit("j", "chunk", id="c2", state="converted")
+        live = await _drain(q, 1)
+        _, resumed = get_bus("j").subscribe(last_id=1)     # reconnect with Last-Event-ID
+        return missed, live, resumed
+    missed, live, resumed = asyncio.run(main())
+    assert [(e["id"], e["event"]) for e in missed] == [(1, "status"), (2, "chunk")]
+    assert live[0]["id"] == 3 and live[0]["data"]["id"] == "c2"
+    assert [e["id"] for e in resumed] == [2, 3]
+
+
+def test_tokens_are_live_only_and_only_when_asked_for():
+    async def main():
+        bus = open_bus("j")
+        plain, _ = bus.subscribe()
+        assert not wants_tokens("j")
+        tokens, _ = bus.subscribe(tokens=True)
+        assert wants_tokens("j")
+        emit("j", "token", text="df")
+        emit("j", "status", step="llm_rule")
+        got = await _drain(tokens, 2)
+        first_plain = await _drain(plain, 1)
+        bus.unsubscribe(tokens)
+        return bus, got, first_plain
+    bus, got, first_plain = asyncio.run(main())
+    assert [e["event"] for e in got] == ["token", "status"]
+    assert first_plain[0]["event"] == "status"
+    assert [e["event"] for e in bus.history] == ["status"]
+    assert not wants_tokens("j")
+
+
+def test_publish_after_end_is_ignored():
+    async def main():
+        bus = open_bus("j")
+        q, _ = bus.subscribe()
+        emit("j", "end", status="finished")
+        emit("j", "status", step="late")
+        got = await _drain(q, 1)
+        await asyncio.sleep(0.01)
+        return bus, got, q
+    bus, got, q = asyncio.run(main())
+    assert [e["event"] for e in got] == ["end"] and q.empty()
+    assert [e["event"] for e in bus.history] == ["end"]
+    assert bus.subscribe() == (None, list(bus.history))    # history only after the end
+
+
+def test_bus_is_dropped_after_end_ttl():
+    async def main():
+        open_bus("j")
+        # the end event may come from a worker thread
+        threading.Thread(target=emit, args=("j", "end"), kwargs={"status": "failed"}).start()
+        await asyncio.sleep(0.02)
+        kept = get_bus("j") is not None
+        await asyncio.sleep(0.1)
+        return kept
+    assert asyncio.run(main()) is True
+    assert get_bus("j") is None
+
+
+def test_reopened_bus_survives_the_old_ttl():
+    async def main():
+        old = open_bus("j")
+        emit("j", "end", status="finished")
+        new = open_bus("j")                   # resumed / re-run job
+        await asyncio.sleep(0.1)
+        return old, new
+    old, new = asyncio.run(main())
+    assert get_bus("j") is new and new is not old
+    emit("nope", "status")                    # unknown jobs are a no-op
+    emit(None, "status")
@@ -0,0 +1,96 @@
+# backend/tests/test_job_resume.py
+
+import asyncio
+import re
+
+import pytest
+
+from agents import llm_rule_agent
+from agents.parse_agent import parse_node
+from agents.utils.mock_llm import MockChatModel
+from benchmarks.corpus import generate
+from config import settings
+from services import job_checkpoint
+from tasks import conversion_runner as cr
+
+
+@pytest.fixture
+def runner(sync_db, tmp_path, monkeypatch):
+    """Checkpointing on, chunk cache off, outputs under *tmp_path*; records
+    which chunk ids reached the (mock) LLM."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rule_outputs").mkdir()
+    monkeypatch.setattr(llm_rule_agent, "RULE_DIR", tmp_path / "rule_outputs")
+    for name, value in (("JOB_CHECKPOINT_ENABLED", True), ("JOB_RESUME_ON_STARTUP", True),
+                        ("CHUNK_CACHE_ENABLED", False)):
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(cr, "JOBS", {})
+    converted = []
+    stub = MockChatModel._stub
+    def recording_stub(self, shape, chunk_id, code):
+        converted.append(chunk_id)
+        return stub(self, shape, chunk_id, code)
+    monkeypatch.setattr(MockChatModel, "_stub", recording_stub)
+    return converted
+
+
+def _state(**extra):
+    return {"sas_code": generate("sas", 200), "source": "sas", "ddl_type": "general",
+            "target": "pyspark", "input_filename": "x.sas", "input_basename": "x",
+            "user_id": 1, "llm_provider": "mock", "logs": [], "chunk_target_tokens": 300,
+            "llm_cred": {"model_name": "gpt-4o",
+                         "mock": {"latency_ms": 1, "latency_dist": "fixed"}}, **extra}
+
+
+async def _wait(job_id):
+    while cr.JOBS[job_id]["status"] in ("queued", "running"):
+        await asyncio.sleep(0.05)
+    return cr.JOBS[job_id]
+
+
+def test_interrupted_job_resumes_without_reconverting(runner):
+    # a process died mid-llm_rule: parse is recorded, half the chunks converted
+    state  = _state()
+    blocks = parse_node(state)["ast_blocks"]
+    job_checkpoint.create_job("j1", state)
+    job_checkpoint.update_job("j1", status="running", step="llm_rule", ast_blocks=blocks)
+    done = [b["id"] for b in blocks[: len(blocks) // 2]]
+    job_checkpoint.save_chunks("j1", [
+        {"chunk_id": cid, "stage": "converted", "ok": True,
+         "code": "resumed_" + re.sub(r"\W", "_", cid) + " = 1",
+         "input_tokens": 5, "output_tokens": 2}
+        for cid in done])
+
+    async def main():
+        assert await cr.resume_unfinished() == 1
+        return await _wait("j1")
+    job = asyncio.run(main())
+
+    assert job["status"] == "finished"
+    assert not set(done) & set(runner)                  # none went back to the LLM
+    assert set(runner) >= {b["id"] for b in blocks} - set(done)
+    codes = {c["id"]: c["code"] for c in job["state"]["pyspark_chunks"]}
+    assert all(codes[cid].startswith("resumed_") for cid in done)
+    assert job_checkpoint.get_job_row("j1")["status"] == "finished"
+
+
+def test_resume_fails_job_whose_credential_is_gone(runner):
+    state = _state(llm_cred={"id": 999, "model_name": "gpt-4o"})
+    job_checkpoint.create_job("j2", state)
+    assert asyncio.run(cr.resume_unfinished()) == 0
+    row = job_checkpoint.get_job_row("j2")
+    assert row["status"] == "failed" and "could not resume" in row["error"]
+
+
+def test_checkpoints_disabled(runner, monkeypatch):
+    job_checkpoint.save_chunk("j3", "c1", "converted", ok=True, code="a = 1")
+    assert job_checkpoint.load_chunks("j3")["c1"]["code"] == "a = 1"
+
+    monkeypatch.setattr(settings, "JOB_CHECKPOINT_ENABLED", False)
+    assert job_checkpoint.load_chunks("j3") == {}       # stored rows are not used
+    job_checkpoint.save_chunk("j3", "c2", "converted", ok=True, code="b = 2")
+    assert asyncio.run(cr.resume_unfinished()) == 0
+
+    monkeypatch.setattr(settings, "JOB_CHECKPOINT_ENABLED", True)
+    assert set(job_checkpoint.load_chunks("j3")) == {"c1"}   # nothing was written
+    assert job_checkpoint.load_chunks(None) == {}
@@ -0,0 +1,117 @@
+# backend/tests/test_rate_limiter.py
+
+import pytest
+
+from agents.utils import rate_limiter
+from agents.utils.mock_llm import MockError, MockRateLimitError
+from agents.utils.rate_limiter import CredentialLimiter, call_with_limits
+from config import settings
+
+
+class _Clock:
+    """Stands in for the ``time`` module: ``sleep`` only advances ``monotonic``."""
+
+    def __init__(self):
+        self.now, self.sleeps = 1000.0, []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.sleeps.append(sec)
+        self.now += sec
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    for name, value in (("LLM_RATE_LIMIT_RPM", 0), ("LLM_RATE_LIMIT_TPM", 0),
+                        ("LLM_MAX_CONCURRENCY_PER_CREDENTIAL", 8), ("LLM_MAX_RETRIES", 3),
+                        ("LLM_RETRY_BASE_SEC", 1.0), ("LLM_RETRY_MAX_SEC", 30.0),
+                        ("LLM_LATENCY_TARGET_SEC", 60.0)):
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(rate_limiter, "_LIMITERS", {})
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda lo, hi: hi)   # worst-case jitter
+    return clock
+
+
+def _flaky(*errors, result="ok"):
+    """A call that raises *errors* in turn, then returns *result*."""
+    calls = []
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fn, calls
+
+
+# ── AIMD window ────────────────────────────────────────────────
+def test_success_grows_window_additively(clock):
+    lim = CredentialLimiter("k", 0, 0, max_concurrency=8)
+    lim.limit = 4.0
+    lim.acquire(0)
+    lim.release(latency=1.0)
+    assert lim.limit == pytest.approx(4.25)            # +1 per window of successes
+    for _ in range(100):
+        lim.acquire(0)
+        lim.release(latency=1.0)
+    assert lim.limit == 8.0                            # capped at the configured maximum
+
+
+def test_slow_success_trims_window(clock):
+    lim = CredentialLimiter("k", 0, 0, max_concurrency=8)
+    lim.acquire(0)
+    lim.release(latency=120.0)
+    assert lim.limit == pytest.approx(7.2)
+
+
+def test_throttle_halves_window_and_pauses(clock):
+    lim = CredentialLimiter("k", 0, 0, max_concurrency=8)
+    lim.acquire(0)
+    lim.release(outcome="throttled", retry_after=5.0)
+    assert lim.limit == 4.0
+    assert lim.paused_until == clock.now + 5.0
+    for _ in range(5):
+        clock.now = lim.paused_until                   # wait out the pause
+        lim.acquire(0)
+        lim.release(outcome="throttled")
+    assert lim.limit == 1.0                            # never below one call
+
+
+# ── retries ────────────────────────────────────────────────────
+def test_retry_after_is_honoured(clock):
+    fn, calls = _flaky(MockRateLimitError(7.5))
+    assert call_with_limits("k", fn, est_tokens=10) == "ok"
+    assert len(calls) == 2
+    assert clock.sleeps == [7.5]                       # longer than the 1 s backoff
+    stats = rate_limiter.get_limiter("k").stats
+    assert (stats["throttled"], stats["retries"], stats["succeeded"]) == (1, 1, 1)
+
+
+def test_transient_errors_back_off_exponentially(clock):
+    fn, calls = _flaky(MockError("503"), MockError("503"), MockError("503"))
+    assert call_with_limits("k", fn, est_tokens=10) == "ok"
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+
+def test_gives_up_after_max_retries(clock):
+    fn, calls = _flaky(*[MockError("503")] * 10)
+    with pytest.raises(MockError):
+        call_with_limits("k", fn, est_tokens=10)
+    assert len(calls) == settings.LLM_MAX_RETRIES + 1
+    stats = rate_limiter.get_limiter("k").stats
+    assert (stats["retries"], stats["failed"]) == (3, 1)
+    assert rate_limiter.get_limiter("k").in_flight == 0
+
+
+def test_other_errors_are_not_retried(clock):
+    fn, calls = _flaky(ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        call_with_limits("k", fn, est_tokens=10)
+    assert len(calls) == 1 and clock.sleeps == []
+
+
+def test_backoff_is_capped(clock):
+    assert rate_limiter.backoff_delay(10) == settings.LLM_RETRY_MAX_SEC